@@ -1,15 +1,21 @@
+import queue
+import threading
+import time
 import customtkinter as ctk
-import json
-import secrets
 from tkinter import messagebox
 
 # Existing backend imports
-from core import encryption
-from core import storage_handler
-from core import storage_compression
+from core import vault_store
+from core import save_worker
 from core import data_handler
 from core import password_generator
+from core import search_index
+from core import storage_handler
+from core import breach_check
+from core import vault_audit
 from localization.language_manager import LanguageManager
+from UI.virtual_list import VirtualList
+from UI.view_cache import ViewCache, ViewHooks
 
 # --- Main Application ---
 ctk.set_appearance_mode("Dark")
@@ -18,8 +24,39 @@ ctk.set_default_color_theme("blue")
 COLOR_SUCCESS = "#2ECC71"
 COLOR_DANGER = "#E74C3C"
 COLOR_BG_CARD = "#2B2B2B"
+COLOR_MUTED = "gray60"
+
+ANIMATION_DURATION = 0.8 # seconds
+SAVE_POLL_INTERVAL = 100 # ms
+AUDIT_POLL_INTERVAL = 50 # ms
 
-ANIMATION_DURATION = 1.2 # seconds
+GENERATOR_POLICIES = { # localization key under "generator" -> policy
+    "hex": password_generator.HEX_POLICY,
+    "strong": password_generator.STRONG_POLICY,
+    "passphrase": password_generator.PASSPHRASE_POLICY,
+}
+
+def password_animation_frames(target, policy):
+    """
+    Every frame of the "decryption" animation, built once from one batch of random noise.
+    Phase 1 (first half): every character is scrambled.
+    Phase 2 (second half): characters lock in from left to right.
+    Separators never move.
+    """
+    separated = policy.words or policy.group_size
+    positions = [i for i, char in enumerate(target) if not (separated and char == policy.separator)]
+    count = len(positions)
+    noise_policy = password_generator.PasswordPolicy(length=max(count, 1), alphabet=password_generator.alphabet(policy),
+                                                     exclude_look_alikes=False)
+    noise = password_generator.generate_batch(2 * count, noise_policy).passwords
+    frames = []
+    for step in range(2 * count):
+        locked = max(0, step - count + 1) # Positions already showing the target
+        frame = list(target)
+        for i in range(locked, count):
+            frame[positions[i]] = noise[step][i]
+        frames.append("".join(frame))
+    return frames or [target]
 
 class PasswordManagerGUI(ctk.CTk):
     def __init__(self):
@@ -35,11 +72,27 @@ class PasswordManagerGUI(ctk.CTk):
         self.geometry("480x480")
         
         self.master_password = ""
+        self.store = vault_store.VaultStore()
+        self.saver = save_worker.SaveWorker(self.store)
+        self.save_polling = False
         self.vault_data = {}
+        self.search = search_index.SearchIndex()
+        self.search_query = ""
+        self.gen_frames = None # the generator animation currently playing
+        self.breach_corpus = None # opened on first use; None while there is no corpus file
+        self.audit = None # results of the last health audit, so the next one only re-scores changes
+        self.audit_running = False
+        self.audit_done = None # callback of the screen waiting for the running audit
+        
+        # Lives outside the container so it survives screen changes
+        self.save_status = ctk.CTkLabel(self, text="", height=18, text_color=COLOR_MUTED, font=("Arial", 11))
+        self.save_status.pack(side="bottom", fill="x")
         
         self.container = ctk.CTkFrame(self)
         self.container.pack(fill="both", expand=True)
+        self.views = ViewCache(self.container) # Built screens, swapped in and out on navigation
         
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
         self.show_auth_screen()
 
     def t(self, key, **kwargs):
@@ -49,6 +102,7 @@ class PasswordManagerGUI(ctk.CTk):
     def change_language(self, new_lang):
         """Refresh the current screen with the new language."""
         self.current_lang = new_lang
+        self.views.invalidate() # Every cached screen holds text in the old language
         # Real-time UI refresh based on state
         view_map = {
             "auth": self.show_auth_screen,
@@ -57,240 +111,459 @@ class PasswordManagerGUI(ctk.CTk):
             "modify": lambda: self.show_add_screen(self.active_service),
             "details": lambda: self.show_details(self.active_service),
             "list_all": self.show_list_all,
-            "generator": self.show_gen_pass_screen
+            "generator": self.show_gen_pass_screen,
+            "audit": self.show_audit
         }
         view_map[self.current_view]()
 
-    def clear_screen(self):
-        for widget in self.container.winfo_children():
-            widget.destroy()
-
-    def save_vault(self):
+    def save_vault(self, service=None):
+        """
+        Hands a single changed service (or a full snapshot when none is given)
+        to the background writer. Failures are reported by poll_saves.
+        """
+        if service is not None:
+            self.search.sync(self.vault_data, service)
+        self.views.invalidate("dashboard", "list_all") # Their account lists are stale
         try:
-            json_data = json.dumps(self.vault_data)
-            compressed = storage_compression.compress_data(json_data)
-            encrypted = encryption.encrypt_data(compressed, self.master_password)
-            storage_handler.write_vault(encrypted)
-            return True
+            self.saver.submit(self.vault_data, service)
         except Exception as e:
-            messagebox.showerror("Error", f"Save failed: {e}")
+            messagebox.showerror("Error", self.t("status.save_failed", error=e))
             return False
+        if not self.save_polling:
+            self.poll_saves()
+        return True
+
+    def poll_saves(self):
+        """Reports finished writes and keeps the save indicator up to date."""
+        while not self.saver.results.empty():
+            ok, error = self.saver.results.get_nowait()
+            if not ok:
+                messagebox.showerror("Error", self.t("status.save_failed", error=error))
+        self.save_polling = self.saver.busy or self.saver.pending > 0
+        if self.save_polling:
+            self.save_status.configure(text=self.t("status.saving", pending=self.saver.pending))
+            self.after(SAVE_POLL_INTERVAL, self.poll_saves)
+        else:
+            self.save_status.configure(text="")
+
+    def get_breach_corpus(self):
+        """The local breach corpus, opened on first use; None when there is none."""
+        if self.breach_corpus is None:
+            try:
+                self.breach_corpus = breach_check.open_corpus()
+            except (OSError, ValueError):
+                return None # An unreadable corpus must not block the screens using it
+        return self.breach_corpus
+
+    def breach_count(self, password):
+        """Times `password` was seen in the local breach corpus; 0 without a corpus."""
+        corpus = self.get_breach_corpus()
+        return corpus.count(password) if corpus is not None and password else 0
+
+    def on_close(self):
+        self.saver.close() # Flush queued writes before exiting
+        self.store.close()
+        if self.breach_corpus is not None:
+            self.breach_corpus.close()
+        self.poll_saves()
+        self.destroy()
 
     # --- Screen 1: Authentication ---
     def show_auth_screen(self):
         self.current_view = "auth"
-        self.clear_screen()
-        
+        self.views.show("auth", self.build_auth_screen)
+
+    def build_auth_screen(self, screen):
         # Dynamically fetch languages from the JSON file
-        available_langs = self.lang_manager.get_supported_languages() 
-        
+        available_langs = self.lang_manager.get_supported_languages()
+
         lang_menu = ctk.CTkOptionMenu(
-            self.container, 
+            screen,
             values=available_langs, # No longer hardcoded
-            command=self.change_language, 
+            command=self.change_language,
             width=70
         )
         lang_menu.set(self.current_lang)
         lang_menu.place(relx=0.98, rely=0.02, anchor="ne")
 
-        frame = ctk.CTkFrame(self.container, fg_color="transparent")
+        formats = {self.t(f"formats.{name}"): name for name in vault_store.FORMATS}
+        format_menu = ctk.CTkOptionMenu(screen, values=list(formats), width=150,
+                                        command=lambda label: self.store.set_format(formats[label]))
+        format_menu.set(self.t(f"formats.{self.configured_format()}"))
+        format_menu.place(relx=0.02, rely=0.02, anchor="nw")
+
+        frame = ctk.CTkFrame(screen, fg_color="transparent")
         frame.place(relx=0.5, rely=0.4, anchor="center")
-        
+
         ctk.CTkLabel(frame, text=self.t("auth.title"), font=("Arial", 28, "bold")).pack(pady=20)
         self.pass_entry = ctk.CTkEntry(frame, placeholder_text=self.t("auth.placeholder"), show="*", width=250)
         self.pass_entry.pack(pady=10)
-        
+
         self.status_label = ctk.CTkLabel(frame, text="")
         self.status_label.pack()
         ctk.CTkButton(frame, text=self.t("auth.login_btn"), command=self.attempt_login).pack(pady=20)
 
+    def configured_format(self):
+        """The format the vault is written in after login: the saved choice, else its current one."""
+        try:
+            vault_format = self.store.desired_format()
+        except storage_handler.SettingsError:
+            vault_format = None # attempt_login() reports it
+        if vault_format is None and self.store.exists():
+            vault_format = vault_store.detect_format(self.store.path)
+        return vault_format or vault_store.DEFAULT_FORMAT
+
     def attempt_login(self):
         pwd = self.pass_entry.get()
-        raw_blob = storage_handler.read_vault()
-        if not raw_blob:
-            self.master_password = pwd
-            self.vault_data = {}
-            self.show_dashboard()
-            return
         try:
-            decrypted = encryption.decrypt_data(raw_blob, pwd)
-            decompressed = storage_compression.decompress_data(decrypted)
-            self.vault_data = json.loads(decompressed)
+            if not self.store.exists():
+                self.master_password = pwd
+                self.open_vault(self.store.create(pwd))
+                self.show_dashboard()
+                return
+            self.open_vault(self.store.unlock(pwd))
             self.master_password = pwd
             self.status_label.configure(text=self.t("auth.correct"), text_color=COLOR_SUCCESS)
             self.after(500, self.show_dashboard)
+        except storage_handler.SettingsError as e:
+            self.status_label.configure(text=self.t("auth.settings_error", error=e), text_color=COLOR_DANGER)
         except Exception:
             self.status_label.configure(text=self.t("auth.wrong"), text_color=COLOR_DANGER)
 
+    def open_vault(self, vault_data):
+        self.vault_data = vault_data
+        self.search = search_index.SearchIndex(vault_data) # Built on the first search
+        self.search_query = ""
+        self.views.invalidate("dashboard", "list_all")
+
     # --- Screen 2 & 3: Dashboard ---
     def show_dashboard(self):
         self.current_view = "dashboard"
-        self.clear_screen()
-        
-        header = ctk.CTkFrame(self.container, height=60, fg_color="transparent")
+        self.views.show("dashboard", self.build_dashboard)
+        self.views.invalidate("auth") # Never shown again; drops the typed master password
+
+    def build_dashboard(self, screen):
+        header = ctk.CTkFrame(screen, height=60, fg_color="transparent")
         header.pack(fill="x", pady=10)
+        if self.vault_data:
+            ctk.CTkButton(header, text=self.t("dashboard.audit"), width=80, fg_color=COLOR_BG_CARD,
+                          command=self.show_audit).pack(side="right", padx=20)
         ctk.CTkLabel(header, text=self.t("dashboard.title"), font=("Arial", 22, "bold")).pack(expand=True)
-        
-        scroll = ctk.CTkScrollableFrame(self.container)
-        scroll.pack(fill="both", expand=True, padx=20, pady=10)
-        
-        if not self.vault_data:
-            ctk.CTkLabel(scroll, text=self.t("dashboard.no_accounts"), font=("Arial", 16)).pack(pady=100)
-            ctk.CTkButton(scroll, text=self.t("dashboard.add_btn").upper(), fg_color=COLOR_SUCCESS, 
-                          command=self.show_add_screen).pack()
+
+        if self.vault_data:
+            search_var = ctk.StringVar(value=self.search_query)
+            search_entry = ctk.CTkEntry(screen, textvariable=search_var,
+                                        placeholder_text=self.t("dashboard.search"))
+            search_entry.pack(fill="x", padx=30)
+            # Only the results are redrawn per keystroke, not the whole screen
+            search_var.trace_add("write", lambda *_: self.render_results(search_var.get()))
+
+            self.results_list = VirtualList(screen, [], self.show_details, columns=2, row_height=100,
+                                            empty_text=self.t("dashboard.no_results"),
+                                            button_kwargs={"fg_color": COLOR_BG_CARD})
+            self.results_list.pack(fill="both", expand=True, padx=20, pady=10)
+            self.render_results(self.search_query)
         else:
-            scroll.grid_columnconfigure((0, 1), weight=1)
-            for i, service in enumerate(self.vault_data.keys()):
-                btn = ctk.CTkButton(scroll, text=service, height=80,
-                                   fg_color=COLOR_BG_CARD,
-                                   command=lambda s=service: self.show_details(s))
-                btn.grid(row=i//2, column=i%2, padx=10, pady=10, sticky="ew")
-
-        footer = ctk.CTkFrame(self.container, fg_color="transparent")
+            empty = ctk.CTkFrame(screen)
+            empty.pack(fill="both", expand=True, padx=20, pady=10)
+            ctk.CTkLabel(empty, text=self.t("dashboard.no_accounts"), font=("Arial", 16)).pack(pady=100)
+            ctk.CTkButton(empty, text=self.t("dashboard.add_btn").upper(), fg_color=COLOR_SUCCESS,
+                          command=self.show_add_screen).pack()
+
+        footer = ctk.CTkFrame(screen, fg_color="transparent")
         footer.pack(fill="x", side="bottom", pady=20, padx=20)
         ctk.CTkButton(footer, text=self.t("dashboard.add_btn"), command=self.show_add_screen).pack(side="left", expand=True, padx=5)
         ctk.CTkButton(footer, text=self.t("dashboard.list_all"), command=self.show_list_all).pack(side="left", expand=True, padx=5)
         ctk.CTkButton(footer, text=self.t("dashboard.gen_pass"), command=self.show_gen_pass_screen).pack(side="left", expand=True, padx=5)
 
+    def render_results(self, query):
+        """Shows every account, or the search matches for `query`, in the dashboard grid."""
+        self.search_query = query
+        services = self.search.search(query) if query.strip() else list(self.vault_data)
+        self.results_list.set_items(services)
+
     # --- Screen 4: Add/Modify ---
     def show_add_screen(self, edit_service=None):
         self.active_service = edit_service
         self.current_view = "modify" if edit_service else "add"
-        self.clear_screen()
-        title = self.t("forms.new_title") if not edit_service else self.t("forms.modify_title", service=edit_service)
-        
-        ctk.CTkButton(self.container, text="←", width=30, command=self.show_dashboard).pack(anchor="nw", padx=10, pady=10)
-        ctk.CTkLabel(self.container, text=title, font=("Arial", 22, "bold")).pack(pady=10)
-        
-        form = ctk.CTkFrame(self.container, fg_color="transparent")
+        self.views.show("form", self.build_add_screen, edit_service)
+
+    def build_add_screen(self, screen):
+        ctk.CTkButton(screen, text="←", width=30, command=self.show_dashboard).pack(anchor="nw", padx=10, pady=10)
+        title_label = ctk.CTkLabel(screen, text="", font=("Arial", 22, "bold"))
+        title_label.pack(pady=10)
+
+        form = ctk.CTkFrame(screen, fg_color="transparent")
         form.pack(pady=20, padx=40, fill="x")
-        
+
         ctk.CTkLabel(form, text=self.t("forms.account")).pack(anchor="w")
         acc_entry = ctk.CTkEntry(form)
         acc_entry.pack(fill="x", pady=(0, 15))
-        if edit_service: acc_entry.insert(0, edit_service); acc_entry.configure(state="disabled")
 
         ctk.CTkLabel(form, text=self.t("forms.username")).pack(anchor="w")
         user_entry = ctk.CTkEntry(form)
         user_entry.pack(fill="x", pady=(0, 15))
-        if edit_service: user_entry.insert(0, self.vault_data[edit_service]['user'])
 
         ctk.CTkLabel(form, text=self.t("forms.password")).pack(anchor="w")
         pwd_frame = ctk.CTkFrame(form, fg_color="transparent")
         pwd_frame.pack(fill="x")
         pwd_entry = ctk.CTkEntry(pwd_frame)
         pwd_entry.pack(side="left", fill="x", expand=True)
-        if edit_service: pwd_entry.insert(0, self.vault_data[edit_service]['pass'])
-        
-        ctk.CTkButton(pwd_frame, text=self.t("forms.generate"), width=80, 
+
+        ctk.CTkButton(pwd_frame, text=self.t("forms.generate"), width=80,
                       command=lambda: [pwd_entry.delete(0, 'end'), pwd_entry.insert(0, password_generator.generate_secure_password())]).pack(side="right", padx=(5, 0))
 
+        editing = {"service": None}
+
         def save_action():
             service = acc_entry.get()
             if not service: return
-            self.vault_data[service] = {"user": user_entry.get(), "pass": pwd_entry.get()}
-            if self.save_vault(): self.show_dashboard()
+            user, password = user_entry.get(), pwd_entry.get()
+            if editing["service"]:
+                # Only the fields that changed, so "modified" and any other fields survive an untouched save
+                entry = self.vault_data[service]
+                new_user = user if user != entry.get('user') else None
+                new_pass = password if password != entry.get('pass') else None
+                if not (new_user or new_pass):
+                    self.show_dashboard()
+                    return
+                data_handler.modify_entry(self.vault_data, service, new_user, new_pass)
+            else:
+                data_handler.add_entry(self.vault_data, service, user, password)
+            if self.save_vault(service): self.show_dashboard()
+
+        ctk.CTkButton(screen, text=self.t("forms.save"), fg_color=COLOR_SUCCESS, command=save_action).pack(pady=30)
+
+        def clear():
+            acc_entry.configure(state="normal")
+            for field in (acc_entry, user_entry, pwd_entry):
+                field.delete(0, "end")
 
-        ctk.CTkButton(self.container, text=self.t("forms.save"), fg_color=COLOR_SUCCESS, command=save_action).pack(pady=30)
+        def update(edit_service):
+            clear()
+            editing["service"] = edit_service
+            title = self.t("forms.new_title") if not edit_service else self.t("forms.modify_title", service=edit_service)
+            title_label.configure(text=title)
+            if edit_service:
+                entry = self.vault_data[edit_service]
+                acc_entry.insert(0, edit_service); acc_entry.configure(state="disabled")
+                user_entry.insert(0, entry['user'])
+                pwd_entry.insert(0, entry['pass'])
+
+        return ViewHooks(update=update, hide=clear)
 
     # --- Screen 5: Account Detail ---
     def show_details(self, service):
         self.active_service = service
         self.current_view = "details"
-        self.clear_screen()
-        ctk.CTkButton(self.container, text="←", width=30, command=self.show_dashboard).pack(anchor="nw", padx=10, pady=10)
-        ctk.CTkLabel(self.container, text=service, font=("Arial", 22, "bold")).pack(pady=20)
-        
-        detail_frame = ctk.CTkFrame(self.container, fg_color="transparent")
+        self.views.show("details", self.build_details, service)
+
+    def build_details(self, screen):
+        ctk.CTkButton(screen, text="←", width=30, command=self.show_dashboard).pack(anchor="nw", padx=10, pady=10)
+        title_label = ctk.CTkLabel(screen, text="", font=("Arial", 22, "bold"))
+        title_label.pack(pady=20)
+
+        detail_frame = ctk.CTkFrame(screen, fg_color="transparent")
         detail_frame.pack(padx=40, fill="x")
-        
+
         ctk.CTkLabel(detail_frame, text=self.t("details.username_label"), font=("Arial", 12, "bold")).pack(anchor="w")
         user_disp = ctk.CTkEntry(detail_frame, fg_color="transparent", border_width=0)
-        user_disp.insert(0, self.vault_data[service]['user'])
-        user_disp.configure(state="readonly")
         user_disp.pack(anchor="w", fill="x", pady=(0, 20))
-        
+
         ctk.CTkLabel(detail_frame, text=self.t("details.password_label"), font=("Arial", 12, "bold")).pack(anchor="w")
         pass_disp = ctk.CTkEntry(detail_frame, fg_color="transparent", border_width=0)
-        pass_disp.insert(0, self.vault_data[service]['pass'])
-        pass_disp.configure(state="readonly")
         pass_disp.pack(anchor="w", fill="x")
+        breach_label = ctk.CTkLabel(detail_frame, text="", text_color=COLOR_DANGER, font=("Arial", 12, "bold"))
+        breach_label.pack(anchor="w")
 
-        btn_frame = ctk.CTkFrame(self.container, fg_color="transparent")
+        btn_frame = ctk.CTkFrame(screen, fg_color="transparent")
         btn_frame.pack(side="bottom", pady=40)
-        ctk.CTkButton(btn_frame, text=self.t("details.modify"), fg_color=COLOR_SUCCESS, 
-                      command=lambda: self.show_add_screen(service)).pack(side="left", padx=10)
-        
+        ctk.CTkButton(btn_frame, text=self.t("details.modify"), fg_color=COLOR_SUCCESS,
+                      command=lambda: self.show_add_screen(self.active_service)).pack(side="left", padx=10)
+
         def delete_action():
+            service = self.active_service
             if messagebox.askyesno("Confirm", self.t("details.delete_confirm", service=service)):
                 if data_handler.delete_entry(self.vault_data, service):
-                    self.save_vault()
+                    self.save_vault(service)
                     self.show_dashboard()
         ctk.CTkButton(btn_frame, text=self.t("details.delete"), fg_color=COLOR_DANGER, command=delete_action).pack(side="left", padx=10)
 
+        def fill(user, password):
+            for field, value in ((user_disp, user), (pass_disp, password)):
+                field.configure(state="normal")
+                field.delete(0, "end")
+                field.insert(0, value)
+                field.configure(state="readonly")
+
+        def update(service):
+            entry = self.vault_data[service] # Decrypted on demand for indexed vaults
+            title_label.configure(text=service)
+            fill(entry['user'], entry['pass'])
+            count = self.breach_count(entry['pass']) # Offline: a binary search in the mapped corpus
+            breach_label.configure(text=self.t("details.breached", count=f"{count:,}") if count else "")
+
+        def hide():
+            fill("", "")
+            breach_label.configure(text="")
+
+        return ViewHooks(update=update, hide=hide)
+
     # --- Screen 6: All Accounts List ---
     def show_list_all(self):
         self.current_view = "list_all"
-        self.clear_screen()
-        ctk.CTkButton(self.container, text="←", width=30, command=self.show_dashboard).pack(anchor="nw", padx=10, pady=10)
-        ctk.CTkLabel(self.container, text=self.t("list_all.title"), font=("Arial", 22, "bold")).pack(pady=10)
-        scroll = ctk.CTkScrollableFrame(self.container)
-        scroll.pack(fill="both", expand=True, padx=20, pady=10)
-        for service in self.vault_data.keys():
-            ctk.CTkButton(scroll, text=service, anchor="w", fg_color=COLOR_BG_CARD,
-                         command=lambda s=service: self.show_details(s)).pack(fill="x", pady=5)
+        self.views.show("list_all", self.build_list_all)
+
+    def build_list_all(self, screen):
+        ctk.CTkButton(screen, text="←", width=30, command=self.show_dashboard).pack(anchor="nw", padx=10, pady=10)
+        ctk.CTkLabel(screen, text=self.t("list_all.title"), font=("Arial", 22, "bold")).pack(pady=10)
+        # Only the rows in view exist as widgets; scrolling rebinds them
+        self.accounts_list = VirtualList(screen, list(self.vault_data), self.show_details, row_height=38,
+                                         button_kwargs={"anchor": "w", "fg_color": COLOR_BG_CARD})
+        self.accounts_list.pack(fill="both", expand=True, padx=20, pady=10)
 
     # --- Screen 7: Animated Password Generator ---
     def show_gen_pass_screen(self):
         self.current_view = "generator"
-        self.clear_screen()
-        ctk.CTkButton(self.container, text="←", width=30, command=self.show_dashboard).pack(anchor="nw", padx=10, pady=10)
-        
-        frame = ctk.CTkFrame(self.container, fg_color="transparent")
+        self.views.show("generator", self.build_gen_pass_screen)
+
+    def build_gen_pass_screen(self, screen):
+        ctk.CTkButton(screen, text="←", width=30, command=self.show_dashboard).pack(anchor="nw", padx=10, pady=10)
+
+        frame = ctk.CTkFrame(screen, fg_color="transparent")
         frame.place(relx=0.5, rely=0.4, anchor="center")
         ctk.CTkLabel(frame, text=self.t("generator.title"), font=("Arial", 22, "bold")).pack(pady=20)
-        
+
         self.gen_display = ctk.CTkEntry(frame, font=("Courier", 24), width=320, justify="center")
-        self.gen_display.pack(pady=20)
-        
-        final_password = password_generator.generate_secure_password()
-        self.animate_password(final_password, 0)
-
-    def animate_password(self, target, step):
-            # Configuration - using 0.8s as the standard duration
-            ANIMATION_DURATION = 0.8 
-            hex_indices = [i for i, char in enumerate(target) if char != '-']
-            total_hex = len(hex_indices)
-            
-            # Double the steps: Phase 1 (Jumble) takes total_hex steps, 
-            # Phase 2 (Lock) takes total_hex steps.
-            total_animation_steps = total_hex * 2 
-            interval = int((ANIMATION_DURATION / total_animation_steps) * 1000)
-
-            current_view = list(target)
-
-            if step < total_hex:
-                # PHASE 1: First half of duration - All characters animate randomly
-                for idx in hex_indices:
-                    current_view[idx] = secrets.choice("0123456789abcdef")
-            else:
-                # PHASE 2: Second half of duration - Locking begins from left to right
-                lock_index = step - total_hex
-                for i, idx in enumerate(hex_indices):
-                    if i <= lock_index:
-                        current_view[idx] = target[idx]
-                    else:
-                        current_view[idx] = secrets.choice("0123456789abcdef")
-
-            # Update Display
-            self.gen_display.delete(0, 'end')
-            self.gen_display.insert(0, "".join(current_view))
-            
-            if step < total_animation_steps - 1:
-                # Schedule next frame
-                self.after(interval, lambda: self.animate_password(target, step + 1))
-            else:
-                # Finalize: ensure target is perfectly set and make selectable
-                self.gen_display.delete(0, 'end')
-                self.gen_display.insert(0, target)
-                self.gen_display.configure(state="readonly")
\ No newline at end of file
+        self.gen_display.pack(pady=(20, 5))
+        entropy_label = ctk.CTkLabel(frame, text="", text_color=COLOR_MUTED)
+        entropy_label.pack()
+
+        policies = {self.t(f"generator.{name}"): policy for name, policy in GENERATOR_POLICIES.items()}
+        mode = ctk.CTkSegmentedButton(frame, values=list(policies), command=lambda _: generate())
+        mode.set(next(iter(policies)))
+        mode.pack(pady=15)
+
+        def generate():
+            result = password_generator.generate(policies[mode.get()])
+            entropy_label.configure(text=self.t("generator.entropy", bits=f"{result.entropy_bits:.0f}"))
+            self.gen_display.configure(font=("Courier", 24 if len(result.password) <= 22 else 14))
+            self.animate_password(password_animation_frames(result.password, policies[mode.get()]))
+
+        ctk.CTkButton(frame, text=self.t("generator.generate"), command=generate).pack()
+
+        # A fresh password on every visit
+        return ViewHooks(update=generate)
+
+    # --- Screen 8: Vault Health ---
+    def show_audit(self):
+        self.current_view = "audit"
+        self.views.show("audit", self.build_audit)
+
+    def run_audit(self, on_done):
+        """
+        Audits a snapshot of the vault on a worker thread, so the screen stays responsive;
+        only entries changed since the last audit are re-read. `on_done(report, elapsed_ms,
+        error)` is called on the UI thread; an audit already running reports to it instead.
+        """
+        self.audit_done = on_done
+        if self.audit_running:
+            return
+        self.audit_running = True
+        audit, session, path = self.audit, self.store.session, self.store.path
+        snapshot = self.store.read_snapshot(self.vault_data)
+        corpus = self.get_breach_corpus()
+        finished = queue.Queue()
+
+        def work():
+            nonlocal audit
+            start = time.perf_counter()
+            try:
+                if audit is None or audit.session is not session:
+                    audit = vault_audit.VaultAudit.load(path, session)
+                report = audit.run(snapshot, corpus=corpus)
+            except Exception as e:
+                finished.put((None, 0, e))
+                return
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            try:
+                audit.save(path)
+            except OSError:
+                pass # The next audit just re-reads everything
+            finished.put((report, elapsed_ms, None))
+
+        def poll():
+            if finished.empty():
+                self.after(AUDIT_POLL_INTERVAL, poll)
+                return
+            report, elapsed_ms, error = finished.get_nowait()
+            self.audit_running = False
+            if error is None:
+                self.audit = audit
+            self.audit_done(report, elapsed_ms, error)
+
+        threading.Thread(target=work, daemon=True).start()
+        self.after(AUDIT_POLL_INTERVAL, poll)
+
+    def build_audit(self, screen):
+        ctk.CTkButton(screen, text="←", width=30, command=self.show_dashboard).pack(anchor="nw", padx=10, pady=10)
+        ctk.CTkLabel(screen, text=self.t("audit.title"), font=("Arial", 22, "bold")).pack(pady=(0, 5))
+        summary = ctk.CTkLabel(screen, text="", text_color=COLOR_MUTED, font=("Arial", 11))
+        summary.pack()
+
+        sections = ["reused", "weak", "stale"] + (["breached"] if self.get_breach_corpus() else [])
+        names = {self.t(f"audit.{name}"): name for name in sections}
+        mode = ctk.CTkSegmentedButton(screen, values=list(names), command=lambda _: show_section())
+        mode.set(next(iter(names)))
+        mode.pack(pady=10)
+        results = VirtualList(screen, [], self.show_details, row_height=38, empty_text=self.t("audit.nothing"),
+                              button_kwargs={"anchor": "w", "fg_color": COLOR_BG_CARD})
+        results.pack(fill="both", expand=True, padx=20, pady=(0, 10))
+        rows = {} # section -> (services, service -> button text)
+
+        def show_section():
+            services, labels = rows.get(names[mode.get()], ([], {})) # Empty until a report arrives
+            results.set_items(services, label=labels.get)
+
+        def show_report(report, elapsed_ms, error):
+            if not summary.winfo_exists():
+                return # The screen was rebuilt meanwhile, e.g. for a language change
+            if error is not None:
+                summary.configure(text=self.t("audit.failed", error=error))
+                rows.clear()
+                show_section()
+                return
+            reused = {service: self.t("audit.shared_with", service=service, count=len(group) - 1)
+                      for group in report.reused for service in group}
+            rows["reused"] = (list(reused), reused)
+            weak = {service: self.t("audit.bits", service=service, bits=f"{bits:.0f}") for service, _, bits in report.weak}
+            rows["weak"] = (list(weak), weak)
+            stale = {service: self.t("audit.days", service=service, days=days) for service, days in report.stale}
+            rows["stale"] = (list(stale), stale)
+            breached = {service: self.t("audit.seen", service=service, count=f"{count:,}")
+                        for service, count in sorted(report.breached.items(), key=lambda item: item[1], reverse=True)}
+            rows["breached"] = (list(breached), breached)
+            summary.configure(text=self.t("audit.summary", entries=report.entries, ms=f"{elapsed_ms:.0f}",
+                                          rescored=report.rescored, undated=len(report.undated)))
+            show_section()
+
+        def update():
+            summary.configure(text=self.t("audit.running"))
+            self.run_audit(show_report)
+
+        return ViewHooks(update=update)
+
+    def animate_password(self, frames, step=0):
+        """Shows precomputed frames one per tick; a newer animation cancels this one."""
+        if step == 0:
+            self.gen_frames = frames
+        elif self.gen_frames is not frames:
+            return
+        self.gen_display.configure(state="normal")
+        self.gen_display.delete(0, 'end')
+        self.gen_display.insert(0, frames[step])
+        if step < len(frames) - 1:
+            interval = max(1, int(ANIMATION_DURATION * 1000 / len(frames)))
+            self.after(interval, lambda: self.animate_password(frames, step + 1))
+        else:
+            self.gen_display.configure(state="readonly") # Final password: selectable, not editable
\ No newline at end of file
@@ -0,0 +1,59 @@
+from collections import OrderedDict
+from typing import Callable, NamedTuple
+
+import customtkinter as ctk
+
+VIEW_CACHE_LIMIT = 5 # screens kept alive; the least recently shown is destroyed first
+
+class ViewHooks(NamedTuple):
+    update: Callable = None # called with the show() arguments on every visit
+    hide: Callable = None # called when another screen replaces this one, e.g. to wipe secrets
+
+class ViewCache:
+    """
+    Keeps built screens alive, so navigating swaps frames instead of rebuilding widgets.
+
+    `build(frame)` fills a fresh frame once and may return ViewHooks; later visits
+    only call its update hook. Callers invalidate screens whose content went stale
+    (language or vault changes); they are rebuilt on their next visit.
+    """
+    def __init__(self, container, limit: int = VIEW_CACHE_LIMIT):
+        self.container = container
+        self.limit = limit
+        self.views = OrderedDict() # name -> (frame, hooks), least recently shown first
+        self.current = None
+
+    def show(self, name: str, build, *args):
+        cached = self.views.get(name)
+        if cached is None:
+            frame = ctk.CTkFrame(self.container, fg_color="transparent")
+            cached = (frame, build(frame) or ViewHooks())
+            self.views[name] = cached
+        self.views.move_to_end(name)
+
+        if self.current != name and self.current in self.views:
+            previous, hooks = self.views[self.current]
+            previous.pack_forget()
+            if hooks.hide:
+                hooks.hide()
+        frame, hooks = cached
+        if self.current != name or not frame.winfo_manager():
+            frame.pack(fill="both", expand=True)
+        self.current = name
+        if hooks.update:
+            hooks.update(*args)
+        self._evict()
+
+    def invalidate(self, *names: str):
+        """Destroys the named screens, or every screen when none are named."""
+        for name in names or list(self.views):
+            cached = self.views.pop(name, None)
+            if cached is not None:
+                cached[0].destroy()
+
+    def _evict(self):
+        while len(self.views) > self.limit:
+            name = next(iter(self.views))
+            if name == self.current:
+                break
+            self.invalidate(name)
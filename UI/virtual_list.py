@@ -0,0 +1,136 @@
+import math
+import sys
+
+import customtkinter as ctk
+
+WHEEL_ROWS = 1 # rows scrolled per wheel notch
+MIN_THUMB = 0.05 # scrollbar thumb never shrinks below this fraction, so huge lists stay draggable
+
+class VirtualList(ctk.CTkFrame):
+    """
+    Scrollable list of services that only creates enough buttons to fill the viewport.
+    Scrolling rebinds those buttons to other services instead of creating new ones,
+    so opening and scrolling cost the same for ten accounts or a hundred thousand.
+
+    `items` is any indexable sequence of service names; `on_select` gets the clicked one.
+    `label` maps a service to its button text, the name itself by default.
+    Scrolling moves by whole rows of `row_height` pixels, `columns` buttons each.
+    """
+    def __init__(self, master, items, on_select, columns: int = 1, row_height: int = 40,
+                 empty_text: str = "", button_kwargs: dict = None, label=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.items = items
+        self.label = label
+        self.on_select = on_select
+        self.columns = columns
+        self.row_height = row_height
+        self.button_kwargs = button_kwargs or {}
+        self.first_row = 0
+        self.visible_rows = 1
+        self.pool = [] # recycled buttons, row-major
+        self.bound = [] # service currently shown by each pooled button
+
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y", padx=(0, 4), pady=4)
+        self.body = ctk.CTkFrame(self, fg_color="transparent")
+        self.body.pack(side="left", fill="both", expand=True, padx=4, pady=4)
+        self.body.grid_propagate(False) # The viewport decides the row count, never the buttons
+        self.body.grid_columnconfigure(tuple(range(columns)), weight=1, uniform="column")
+        self.empty_label = ctk.CTkLabel(self.body, text=empty_text, font=("Arial", 16))
+
+        self.body.bind("<Configure>", self.on_resize)
+        self.bind_wheel(self.body)
+        self.refresh()
+
+    def set_items(self, items, label=None):
+        """Shows a new sequence (e.g. search results) from the top, optionally with new button texts."""
+        if label is not None:
+            self.label = label
+            self.bound = [None] * len(self.bound) # Same services may need other texts
+        self.items = items
+        self.first_row = 0
+        self.refresh()
+
+    @property
+    def total_rows(self) -> int:
+        return math.ceil(len(self.items) / self.columns)
+
+    def bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self.on_wheel, add="+")
+        widget.bind("<Button-4>", self.on_wheel, add="+")
+        widget.bind("<Button-5>", self.on_wheel, add="+")
+
+    def on_wheel(self, event):
+        # Same platform split as CTkScrollbar's own wheel handling
+        if sys.platform.startswith("win"):
+            delta = -int(event.delta / 120) or (-1 if event.delta > 0 else 1)
+        elif sys.platform == "darwin":
+            delta = -event.delta
+        else:
+            delta = -1 if event.num == 4 else 1
+        self.scroll_to(self.first_row + delta * WHEEL_ROWS)
+
+    def on_scrollbar(self, action, value, unit=None):
+        if action == "moveto":
+            travel = 1.0 - self._thumb()
+            position = float(value) / travel if travel else 0.0
+            self.scroll_to(round(position * (self.total_rows - self.visible_rows)))
+        elif action == "scroll":
+            step = self.visible_rows if unit == "pages" else WHEEL_ROWS
+            self.scroll_to(self.first_row + int(value) * step)
+
+    def scroll_to(self, row: int):
+        row = max(0, min(row, self.total_rows - self.visible_rows))
+        if row != self.first_row:
+            self.first_row = row
+            self.refresh()
+
+    def on_resize(self, event):
+        rows = max(1, event.height // self.row_height)
+        if rows != self.visible_rows or not self.pool:
+            self.visible_rows = rows
+            self._grow_pool(rows * self.columns)
+            self.refresh()
+
+    def _grow_pool(self, size: int):
+        pad = 10 if self.columns > 1 else 0
+        while len(self.pool) < size:
+            slot = len(self.pool)
+            button = ctk.CTkButton(self.body, text="", height=self.row_height - 10,
+                                   command=lambda slot=slot: self.on_select(self.bound[slot]),
+                                   **self.button_kwargs)
+            button.grid(row=slot // self.columns, column=slot % self.columns, padx=pad, pady=5, sticky="ew")
+            button.grid_remove() # refresh() decides what is shown
+            self.bind_wheel(button)
+            self.pool.append(button)
+            self.bound.append(None)
+
+    def refresh(self):
+        """Rebinds the pooled buttons to the services in view."""
+        count = len(self.items)
+        self.first_row = max(0, min(self.first_row, self.total_rows - self.visible_rows))
+        start = self.first_row * self.columns
+        shown = min(self.visible_rows * self.columns, len(self.pool), max(0, count - start))
+        for slot, button in enumerate(self.pool):
+            if slot < shown:
+                service = self.items[start + slot]
+                if self.bound[slot] != service:
+                    button.configure(text=self.label(service) if self.label else service)
+                    self.bound[slot] = service
+                button.grid()
+            else:
+                button.grid_remove()
+
+        if count:
+            self.empty_label.place_forget()
+        else:
+            self.empty_label.place(relx=0.5, rely=0.3, anchor="center")
+        thumb = self._thumb()
+        hidden_rows = self.total_rows - self.visible_rows
+        thumb_start = (1.0 - thumb) * self.first_row / hidden_rows if hidden_rows > 0 else 0.0
+        self.scrollbar.set(thumb_start, thumb_start + thumb)
+
+    def _thumb(self) -> float:
+        if self.total_rows <= self.visible_rows:
+            return 1.0
+        return max(MIN_THUMB, self.visible_rows / self.total_rows)
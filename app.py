@@ -1,43 +1,73 @@
-import json
+import argparse
+import asyncio
+import getpass
+import os
+import sys
+import time
+
 from core import encryption
-from core import storage_handler
-from core import storage_compression
+from core import vault_store
+from core import breach_check
 from core import data_handler
+from core import import_export
 from core import password_generator
+from core import search_index
+from core import storage_handler
+from core import tracing
+from core import unlock_agent
+from core import vault_audit
+
+IMPORT_ERRORS_SHOWN = 20 # rejected rows listed after an import
+AUDIT_ROWS_SHOWN = 20 # services listed per section of the audit report
 
 class PasswordManagerApp:
     def __init__(self):
         self.master_password = ""
+        self.store = vault_store.VaultStore()
         self.vault_data = {}
+        self.search = search_index.SearchIndex()
 
     def start(self):
         print("--- Secure Vault CLI ---")
         self.master_password = input("Enter Master Password: ")
         
-        raw_blob = storage_handler.read_vault()
-        if raw_blob:
-            try:
-                decrypted = encryption.decrypt_data(raw_blob, self.master_password) # 
-                decompressed = storage_compression.decompress_data(decrypted)
-                self.vault_data = json.loads(decompressed)
-            except Exception:
-                print("Error: Invalid password or corrupted vault.")
-                return
-        else:
-            print("No vault found. Creating new vault.")
-            self.vault_data = {}
+        try:
+            if self.store.exists():
+                self.vault_data = self.store.unlock(self.master_password)
+            else:
+                print("No vault found. Creating new vault.")
+                self.vault_data = self.store.create(self.master_password)
+        except storage_handler.SettingsError as e:
+            print(f"Error: {e}")
+            return
+        except Exception:
+            print("Error: Invalid password or corrupted vault.")
+            return
+        self.search = search_index.SearchIndex(self.vault_data)
 
         self.menu()
+        self.store.close()
 
-    def save(self):
-        json_data = json.dumps(self.vault_data)
-        compressed = storage_compression.compress_data(json_data)
-        encrypted = encryption.encrypt_data(compressed, self.master_password) # 
-        storage_handler.write_vault(encrypted)
+    def save(self, service=None):
+        """Commits a single changed service, or writes a full snapshot when none is given."""
+        if service is None:
+            self.store.save(self.vault_data)
+        else:
+            self.store.commit(self.vault_data, service)
+            self.search.sync(self.vault_data, service)
+
+    def rotate_key(self):
+        # 7 used to be Exit: a stale habit must not re-encrypt the vault unasked
+        confirm = input("Re-encrypt the vault with a new salt and key? (yes/no): ")
+        if confirm.lower() != 'yes':
+            return
+        self.store.rotate_key(self.master_password, self.vault_data)
+        print(f"Vault re-encrypted with a new salt and key ({describe_kdf(self.store.session.kdf)}).")
 
     def menu(self):
         while True:
-            print("\n1. Add | 2. Get | 3. List | 4. Modify | 5. Delete | 6. Generate Pwd | 7. Exit")
+            print("\n1. Add | 2. Get | 3. List | 4. Modify | 5. Delete | 6. Generate Pwd | 7. Rotate Key | "
+                  "8. Audit | 9. Exit")
             choice = input("Choice: ")
             
             if choice == "1":
@@ -45,7 +75,7 @@ class PasswordManagerApp:
             elif choice == "2":
                 self.get_entry_flow()
             elif choice == "3":
-                for s in self.vault_data: print(f"- {s}")
+                self.list_entries_flow()
             elif choice == "4":
                 self.modify_entry_flow()
             elif choice == "5":
@@ -53,21 +83,65 @@ class PasswordManagerApp:
             elif choice == "6":
                 print(f"Generated: {password_generator.generate_secure_password()}")
             elif choice == "7":
+                self.rotate_key()
+            elif choice == "8":
+                self.audit_flow()
+            elif choice == "9":
                 break
 
+    def audit_flow(self):
+        start = time.perf_counter()
+        audit = vault_audit.VaultAudit.load(self.store.path, self.store.session)
+        corpus = breach_check.open_corpus()
+        try:
+            report = audit.run(self.vault_data, corpus=corpus)
+        finally:
+            if corpus is not None:
+                corpus.close()
+        audit.save(self.store.path)
+        elapsed = time.perf_counter() - start
+
+        def section(title, rows):
+            print(f"\n{title}: {len(rows)}")
+            for row in rows[:AUDIT_ROWS_SHOWN]:
+                print(f"  - {row}")
+            if len(rows) > AUDIT_ROWS_SHOWN:
+                print(f"  ... and {len(rows) - AUDIT_ROWS_SHOWN} more")
+
+        section("Reused passwords", [", ".join(group) for group in report.reused])
+        section("Weak passwords", [f"{service} (about {bits:.0f} bits)" for service, _, bits in report.weak])
+        section(f"Not changed in over {vault_audit.STALE_DAYS} days",
+                [f"{service} ({days} days)" for service, days in report.stale])
+        if corpus is not None:
+            section("Seen in data breaches", [f"{service} ({count:,} times)" for service, count in
+                                              sorted(report.breached.items(), key=lambda item: item[1], reverse=True)])
+        if report.undated:
+            print(f"\n{len(report.undated)} entries predate modification times and have no age.")
+        print(f"\nAudited {report.entries} entries in {elapsed * 1000:.0f} ms "
+              f"({report.rescored} scored, the rest unchanged since the last audit).")
+
     def add_entry_flow(self):
         service = input("Service: ")
         user = input("Username: ")
         use_gen = input("Generate random password? (y/n): ").lower()
         pwd = password_generator.generate_secure_password() if use_gen == 'y' else input("Password: ")
-        self.vault_data[service] = {"user": user, "pass": pwd}
-        self.save()
+        data_handler.add_entry(self.vault_data, service, user, pwd)
+        self.save(service)
 
     def get_entry_flow(self):
         service = input("Service: ")
         entry = self.vault_data.get(service)
         if entry: print(f"User: {entry['user']} | Pwd: {entry['pass']}")
-        else: print("Not found.")
+        else:
+            print("Not found.")
+            matches = self.search.search(service, limit=5)
+            if matches: print(f"Did you mean: {', '.join(matches)}?")
+
+    def list_entries_flow(self):
+        query = input("Filter (leave empty for all): ")
+        services = self.search.search(query) if query.strip() else self.vault_data
+        for s in services: print(f"- {s}")
+        if query.strip() and not services: print("No matches.")
 
     def modify_entry_flow(self):
         service = input("Enter service to modify: ")
@@ -86,7 +160,7 @@ class PasswordManagerApp:
             new_pass = password_generator.generate_secure_password() if use_gen == 'y' else input("New password: ")
 
         if data_handler.modify_entry(self.vault_data, service, new_user, new_pass):
-            self.save()
+            self.save(service)
             print("Account updated.")
 
     def delete_entry_flow(self):
@@ -94,7 +168,294 @@ class PasswordManagerApp:
         confirm = input(f"Are you sure you want to delete {service}? (yes/no): ")
         if confirm.lower() == 'yes':
             if data_handler.delete_entry(self.vault_data, service):
-                self.save()
+                self.save(service)
                 print("Account deleted.")
             else:
-                print("Service not found.")
\ No newline at end of file
+                print("Service not found.")
+
+def agent_command(args):
+    """`python app.py agent ...`: runs or queries the local unlock agent."""
+    if os.name != "posix":
+        sys.exit("The unlock agent needs Unix domain sockets and is not available on this platform.")
+    if args.action == "start":
+        start_agent(args)
+        return
+    try:
+        with unlock_agent.AgentClient() as client:
+            if args.action == "get":
+                entry = client.get(args.service)
+                if args.field: print(entry[args.field])
+                else: print(f"User: {entry['user']} | Pwd: {entry['pass']}")
+            elif args.action == "list":
+                for s in client.list(args.query): print(f"- {s}")
+            elif args.action == "search":
+                for s in client.search(args.query): print(f"- {s}")
+            elif args.action == "stats":
+                stats = client.stats()
+                print(f"{stats['entries']} entries | {stats['clients']} clients | "
+                      f"up {stats['uptime_s']:.0f}s | locks in {stats['locks_in_s']:.0f}s")
+                for op, s in stats["ops"].items():
+                    print(f"{op:>7}: {s['count']:>6} req | mean {s['mean_ms']:.3f} ms | "
+                          f"p50 {s['p50_ms']:.3f} ms | p95 {s['p95_ms']:.3f} ms | max {s['max_ms']:.3f} ms")
+            elif args.action == "lock":
+                client.lock()
+                print("Agent locked.")
+    except unlock_agent.AgentError as e:
+        sys.exit(f"Error: {e}")
+
+def start_agent(args):
+    if unlock_agent.agent_running():
+        sys.exit("An agent is already running.")
+    store = vault_store.VaultStore(read_only=True) # Shares the vault with the CLI and GUI
+    if not store.exists():
+        sys.exit("No vault found.")
+    try:
+        vault_data = store.unlock(getpass.getpass("Enter Master Password: "))
+    except Exception:
+        sys.exit("Error: Invalid password or corrupted vault.")
+    agent = unlock_agent.UnlockAgent(store, vault_data, idle_timeout=args.idle_timeout)
+    try:
+        agent.bind() # Before forking, so clients can connect as soon as the parent returns
+    except (OSError, unlock_agent.AgentError) as e:
+        sys.exit(f"Error: {e}")
+    print(f"Agent unlocked {len(vault_data)} entries; listening on {agent.path}")
+
+    if not args.foreground:
+        # Detach like ssh-agent: the parent returns to the shell, the child serves
+        if os.fork():
+            agent.listener.close() # The child's copy stays open
+            return
+        os.setsid()
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in (0, 1, 2):
+            os.dup2(devnull, fd)
+    asyncio.run(agent.serve())
+    print(f"Agent locked ({agent.lock_reason}).")
+
+def kdf_command(args):
+    """`python app.py kdf ...`: shows or calibrates the vault's key derivation."""
+    store = vault_store.VaultStore()
+    if args.action == "show":
+        try:
+            if store.exists():
+                print(f"Vault:      {describe_kdf(store.stored_kdf())}")
+            print(f"Configured: {describe_kdf(store.desired_kdf())}")
+        except ValueError as e:
+            sys.exit(f"Error: {e}")
+        return
+    print(f"Calibrating {args.algorithm} for {args.target_ms:.0f} ms...")
+    kdf = encryption.calibrate(args.algorithm, args.target_ms)
+    store.set_kdf(kdf)
+    print(f"Configured: {describe_kdf(kdf)}")
+    if store.exists():
+        print("The vault will be re-keyed the next time it is unlocked.")
+
+def format_command(args):
+    """`python app.py format ...`: shows or changes the vault's storage format."""
+    store = vault_store.VaultStore()
+    if args.action == "show":
+        try:
+            configured = store.desired_format()
+            if store.exists():
+                print(f"Vault:      {vault_store.detect_format(store.path)}")
+                print(f"Configured: {configured or 'none, the vault keeps its format'}")
+            else:
+                print(f"Configured: {configured or vault_store.DEFAULT_FORMAT}")
+        except ValueError as e:
+            sys.exit(f"Error: {e}")
+        return
+    store.set_format(args.format)
+    print(f"Configured: {args.format}")
+    if store.exists() and vault_store.detect_format(store.path) != args.format:
+        print("The vault will be converted the next time it is unlocked.")
+
+def open_vault_for(store):
+    """Unlocks the vault with a prompted password, or creates one if there is none."""
+    password = getpass.getpass("Enter Master Password: ")
+    try:
+        if not store.exists():
+            print("No vault found. Creating new vault.")
+            return store.create(password)
+        return store.unlock(password)
+    except storage_handler.SettingsError as e:
+        sys.exit(f"Error: {e}")
+    except Exception:
+        sys.exit("Error: Invalid password or corrupted vault.")
+
+def import_command(args):
+    """`python app.py import FILE`: merges a CSV or JSON export into the vault with a single save."""
+    try:
+        file_format = import_export.resolve_format(args.file, args.format) # Before asking for the password
+    except (OSError, ValueError) as e:
+        sys.exit(f"Error: {e}")
+    store = vault_store.VaultStore()
+    vault_data = open_vault_for(store)
+    start = time.perf_counter()
+    try:
+        rows = import_export.read_entries(args.file, file_format)
+        result = data_handler.apply_batch(vault_data, rows, args.on_conflict)
+    except (OSError, ValueError) as e:
+        sys.exit(f"Error: nothing imported: {e}")
+    parsed = time.perf_counter()
+    if result.changed and not args.dry_run:
+        store.save(vault_data) # One snapshot for the whole batch
+    store.close()
+    done = time.perf_counter()
+
+    print(f"{result.added} added | {result.updated} updated | {result.renamed} renamed | "
+          f"{result.unchanged} unchanged | {result.skipped} skipped | {len(result.rejected)} rejected")
+    for row, reason in result.rejected[:IMPORT_ERRORS_SHOWN]:
+        print(f"  row {row!r}: {reason}")
+    if len(result.rejected) > IMPORT_ERRORS_SHOWN:
+        print(f"  ... and {len(result.rejected) - IMPORT_ERRORS_SHOWN} more")
+    print(f"{result.rows} rows in {done - start:.2f}s: parsed at {result.rows / max(parsed - start, 1e-9):,.0f} rows/s, "
+          f"{result.rows / max(done - start, 1e-9):,.0f} rows/s including the save"
+          + (" (dry run, nothing saved)" if args.dry_run else ""))
+
+def export_command(args):
+    """`python app.py export FILE`: writes every entry, unencrypted, as CSV or JSON."""
+    store = vault_store.VaultStore(read_only=True)
+    if not store.exists():
+        sys.exit("No vault found.")
+    vault_data = open_vault_for(store)
+    start = time.perf_counter()
+    try:
+        count = import_export.write_entries(vault_data, args.file, args.format)
+    except OSError as e:
+        sys.exit(f"Error: {e}")
+    elapsed = time.perf_counter() - start
+    print(f"Exported {count} entries to {args.file} in {elapsed:.2f}s ({count / max(elapsed, 1e-9):,.0f} rows/s).")
+    print("Warning: the export is not encrypted. Delete it once it has been imported elsewhere.")
+
+def generate_command(args):
+    """`python app.py generate`: prints passwords following a policy built from the options, one per line."""
+    if args.words:
+        policy = password_generator.PasswordPolicy(words=args.words)
+    elif args.hex:
+        policy = password_generator.HEX_POLICY
+    else:
+        policy = password_generator.PasswordPolicy(
+            length=args.length, lowercase=not args.no_lowercase, uppercase=not args.no_uppercase,
+            digits=not args.no_digits, symbols=not args.no_symbols, exclude=args.exclude)
+    try:
+        batch = password_generator.generate_batch(args.count, policy)
+    except ValueError as e:
+        sys.exit(f"Error: {e}")
+    if batch.passwords:
+        print("\n".join(batch.passwords))
+    print(f"{batch.entropy_bits:.1f} bits of entropy each", file=sys.stderr) # Keeps stdout to the passwords
+
+def breach_command(args):
+    """`python app.py breach ...`: builds the offline breached-password corpus or checks the vault against it."""
+    if args.action == "build":
+        def progress(lines):
+            print(f"\r{lines:,} lines...", end="", file=sys.stderr, flush=True)
+        start = time.perf_counter()
+        try:
+            records = breach_check.build_corpus(args.dump, args.corpus, progress)
+        except (OSError, ValueError) as e:
+            sys.exit(f"\nError: {e}")
+        print(f"\rWrote {records:,} hashes to {args.corpus} in {time.perf_counter() - start:.1f}s.", file=sys.stderr)
+        return
+    try:
+        corpus = breach_check.BreachCorpus(args.corpus)
+    except (OSError, ValueError) as e:
+        sys.exit(f"Error: {e} (build the corpus with `python app.py breach build DUMP`)")
+    store = vault_store.VaultStore(read_only=True)
+    if not store.exists():
+        sys.exit("No vault found.")
+    vault_data = open_vault_for(store)
+    with corpus:
+        start = time.perf_counter()
+        breached = breach_check.audit(vault_data, corpus)
+        elapsed = time.perf_counter() - start
+    for service, count in sorted(breached.items(), key=lambda item: item[1], reverse=True):
+        print(f"- {service}: seen {count:,} times in breaches")
+    print(f"{len(breached)} of {len(vault_data)} passwords found among {corpus.records:,} breached hashes "
+          f"({elapsed * 1000:.1f} ms).")
+
+def describe_kdf(kdf):
+    if kdf.algorithm == encryption.KDF_SCRYPT:
+        return f"scrypt N={kdf.cost} r={kdf.block_size} p={kdf.parallelism}"
+    return f"{kdf.algorithm} {kdf.cost} iterations"
+
+def main():
+    parser = argparse.ArgumentParser(description="Secure Vault CLI. Without arguments, starts the interactive menu.")
+    tracing.add_arguments(parser)
+    commands = parser.add_subparsers(dest="command")
+    agent = commands.add_parser("agent", help="unlock once and serve lookups to scripts over a local socket")
+    actions = agent.add_subparsers(dest="action", required=True)
+    start = actions.add_parser("start", help="unlock the vault and start the agent")
+    start.add_argument("--idle-timeout", type=float, default=unlock_agent.DEFAULT_IDLE_TIMEOUT,
+                       help="seconds without a request before the agent locks itself")
+    start.add_argument("--foreground", action="store_true", help="do not detach from the terminal")
+    get = actions.add_parser("get", help="print one entry")
+    get.add_argument("service")
+    get.add_argument("--field", choices=("user", "pass"), help="print only this field, for scripts")
+    listing = actions.add_parser("list", help="list services, optionally filtered")
+    listing.add_argument("query", nargs="?")
+    search = actions.add_parser("search", help="search service names and usernames")
+    search.add_argument("query")
+    actions.add_parser("stats", help="show per-request latency stats")
+    actions.add_parser("lock", help="lock the vault and stop the agent")
+    kdf = commands.add_parser("kdf", help="show or calibrate the key derivation function")
+    kdf_actions = kdf.add_subparsers(dest="action", required=True)
+    kdf_actions.add_parser("show", help="show the vault's and the configured KDF")
+    calibrate = kdf_actions.add_parser("calibrate", help="pick KDF parameters for a target unlock time on this machine")
+    calibrate.add_argument("--algorithm", choices=(encryption.KDF_PBKDF2, encryption.KDF_SCRYPT),
+                           default=encryption.KDF_PBKDF2)
+    calibrate.add_argument("--target-ms", type=float, default=encryption.TARGET_UNLOCK_MS)
+    storage = commands.add_parser("format", help="show or change the vault's storage format")
+    format_actions = storage.add_subparsers(dest="action", required=True)
+    format_actions.add_parser("show", help="show the vault's and the configured format")
+    set_format = format_actions.add_parser("set", help="write the vault in another format from its next unlock")
+    set_format.add_argument("format", choices=vault_store.FORMATS)
+    importer = commands.add_parser("import", help="add the entries of a CSV or JSON export, with a single save")
+    importer.add_argument("file")
+    importer.add_argument("--format", choices=import_export.FORMATS, default=import_export.FORMAT_AUTO,
+                          help="file layout; auto detects JSON by extension and CSV layouts by header")
+    importer.add_argument("--on-conflict", choices=data_handler.CONFLICT_POLICIES, default=data_handler.CONFLICT_SKIP,
+                          help="what to do with a service that is already in the vault with other credentials")
+    importer.add_argument("--dry-run", action="store_true", help="validate and report without saving")
+    exporter = commands.add_parser("export", help="write every entry to an unencrypted CSV or JSON file")
+    exporter.add_argument("file")
+    exporter.add_argument("--format", choices=import_export.FORMATS, default=import_export.FORMAT_AUTO,
+                          help="file layout; auto writes JSON for .json files and this app's CSV otherwise")
+    breach = commands.add_parser("breach", help="check passwords against a local breached-password list, offline")
+    breach_actions = breach.add_subparsers(dest="action", required=True)
+    build = breach_actions.add_parser("build", help="convert a HaveIBeenPwned SHA-1 dump, ordered by hash")
+    build.add_argument("dump")
+    check = breach_actions.add_parser("check", help="list the vault's passwords that appear in the corpus")
+    for action in (build, check):
+        action.add_argument("--corpus", default=breach_check.CORPUS_FILE, help="corpus file to write or read")
+    generator = commands.add_parser("generate", help="print random passwords or passphrases")
+    generator.add_argument("--count", type=int, default=1)
+    preset = generator.add_mutually_exclusive_group()
+    preset.add_argument("--hex", action="store_true", help="the [hex]-[hex]-[hex] format of the interactive menu")
+    preset.add_argument("--words", type=int, default=0, help="a passphrase of this many words")
+    generator.add_argument("--length", type=int, default=password_generator.STRONG_POLICY.length)
+    generator.add_argument("--exclude", default="", help="characters never to use")
+    for name in ("lowercase", "uppercase", "digits", "symbols"):
+        generator.add_argument(f"--no-{name}", action="store_true")
+    args = parser.parse_args()
+
+    with tracing.profiling(args):
+        if args.command == "agent":
+            agent_command(args)
+        elif args.command == "kdf":
+            kdf_command(args)
+        elif args.command == "format":
+            format_command(args)
+        elif args.command == "import":
+            import_command(args)
+        elif args.command == "export":
+            export_command(args)
+        elif args.command == "breach":
+            breach_command(args)
+        elif args.command == "generate":
+            generate_command(args)
+        else:
+            PasswordManagerApp().start()
+
+if __name__ == "__main__":
+    main()
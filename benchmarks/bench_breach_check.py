@@ -0,0 +1,53 @@
+"""
+Offline breach check: conversion rate of a synthetic HaveIBeenPwned-style dump,
+then the time to audit whole vaults against the memory-mapped corpus, with a
+tenth of their passwords planted in the corpus.
+
+Run with: python -m benchmarks.bench_breach_check
+"""
+import hashlib
+import os
+import tempfile
+import time
+
+from core import breach_check
+from benchmarks.common import make_vault, time_call
+
+CORPUS_SIZE = 2_000_000 # hashes; the real dump has close to a billion
+VAULT_SIZES = (1_000, 10_000, 100_000)
+
+def write_dump(path: str, vault: dict):
+    """Random hashes plus those of every tenth vault password, ordered by hash like the real dump."""
+    planted = [breach_check.password_digest(entry["pass"]) for entry in list(vault.values())[::10]]
+    digests = [os.urandom(20) for _ in range(CORPUS_SIZE - len(planted))] + planted
+    digests.sort()
+    with open(path, "w", encoding="ascii") as f:
+        f.writelines(f"{digest.hex().upper()}:{digest[-1] + 1}\n" for digest in digests)
+
+def main():
+    largest = make_vault(max(VAULT_SIZES))
+    vaults = {size: dict(list(largest.items())[:size]) for size in VAULT_SIZES}
+    with tempfile.TemporaryDirectory() as workdir:
+        dump = os.path.join(workdir, "pwned-passwords-sha1-ordered-by-hash.txt")
+        corpus_path = os.path.join(workdir, "corpus.pwcorpus")
+        write_dump(dump, largest)
+        start = time.perf_counter()
+        records = breach_check.build_corpus(dump, corpus_path)
+        elapsed = time.perf_counter() - start
+        print(f"build: {records:,} hashes in {elapsed:.1f}s ({records / elapsed:,.0f} lines/s), "
+              f"{os.path.getsize(dump) / 2**20:.0f} MiB dump -> {os.path.getsize(corpus_path) / 2**20:.0f} MiB corpus")
+
+        opened = time_call(lambda: breach_check.BreachCorpus(corpus_path).close())
+        print(f"open: {opened:.3f} ms (nothing is read until a lookup)")
+        print(f"{'entries':>8} | {'breached':>8} | {'audit ms':>9} | {'lookups/s':>10}")
+        with breach_check.BreachCorpus(corpus_path) as corpus:
+            for size, vault in vaults.items():
+                breached = breach_check.audit(vault, corpus)
+                audit = time_call(lambda: breach_check.audit(vault, corpus), repeat=3)
+                print(f"{size:>8} | {len(breached):>8} | {audit:>9.2f} | {size / audit * 1000:>10,.0f}")
+            sha1 = time_call(lambda: [hashlib.sha1(entry["pass"].encode("utf-8")).digest()
+                                      for entry in largest.values()], repeat=3)
+            print(f"(of which SHA-1 hashing of {max(VAULT_SIZES)} passwords: {sha1:.2f} ms)")
+
+if __name__ == "__main__":
+    main()
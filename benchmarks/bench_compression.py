@@ -0,0 +1,40 @@
+"""
+Compression ratio and throughput of every registered codec on synthetic vault payloads.
+
+Run with: python -m benchmarks.bench_compression
+"""
+import time
+
+from core import storage_compression
+from benchmarks.common import make_payload
+
+PAYLOAD_SIZES = (10, 1_000, 50_000)
+LEVELS = {"zlib": (1, 6, 9), "bz2": (1, 9), "lzma": (0, 6), "gzip": (9,), "none": (0,)}
+
+def throughput(func, size: int) -> float:
+    """MB/s of the best of three runs."""
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return size / best / 1_000_000 if best else float("inf")
+
+def main():
+    print(f"{'entries':>8} | {'codec':>8} | {'ratio':>6} | {'compress MB/s':>13} | {'decompress MB/s':>15}")
+    for entries in PAYLOAD_SIZES:
+        data = make_payload(entries).encode("utf-8")
+        chosen = storage_compression.choose_codec(len(data))
+        for name in storage_compression.available_codecs():
+            for level in LEVELS.get(name, (None,)):
+                blob = storage_compression.compress_bytes(data, name, level)
+                assert storage_compression.decompress_bytes(blob) == data
+                label = f"{name}-{level}"
+                marker = " *" if chosen == (name, level) else ""
+                print(f"{entries:>8} | {label:>8} | {len(data) / len(blob):>6.2f} | "
+                      f"{throughput(lambda: storage_compression.compress_bytes(data, name, level), len(data)):>13.1f} | "
+                      f"{throughput(lambda: storage_compression.decompress_bytes(blob), len(data)):>15.1f}{marker}")
+    print("* codec picked by storage_compression.choose_codec for that payload size")
+
+if __name__ == "__main__":
+    main()
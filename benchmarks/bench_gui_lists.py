@@ -0,0 +1,79 @@
+"""
+Headless timing harness for the dashboard and List All screens.
+
+Builds each screen against synthetic vaults of growing size and reports the
+build time, the time to scroll through the list, how many Tk widgets exist, and
+the cost of a details -> dashboard round trip once the screens are cached.
+The vault, its settings files and the breach corpus are looked up in a temporary
+directory, so a vault or corpus in the working directory is never touched.
+Tk needs a display; on a machine without one (CI, SSH) run it under Xvfb:
+
+    xvfb-run python -m benchmarks.bench_gui_lists
+    python -m benchmarks.bench_gui_lists --sizes 100 100000 --scroll 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tkinter
+
+from benchmarks.common import make_vault
+from core import breach_check
+from core import storage_handler
+
+DEFAULT_SIZES = (10, 100, 1_000, 10_000, 100_000)
+
+def count_widgets(widget) -> int:
+    return sum(1 + count_widgets(child) for child in widget.winfo_children())
+
+def timed(app, func) -> float:
+    """Milliseconds until func's effects have been laid out and drawn."""
+    start = time.perf_counter()
+    func()
+    app.update()
+    return (time.perf_counter() - start) * 1000
+
+def run_screen(app, show, list_attr: str, scroll_steps: int) -> dict:
+    build_ms = timed(app, show)
+    view = getattr(app, list_attr)
+    scroll_ms = timed(app, lambda: [view.scroll_to(view.first_row + 1) or app.update_idletasks()
+                                    for _ in range(scroll_steps)])
+    return {"build_ms": build_ms, "scroll_ms": scroll_ms, "widgets": count_widgets(app.container)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="vault sizes, in entries")
+    parser.add_argument("--scroll", type=int, default=100, help="rows scrolled per screen")
+    args = parser.parse_args()
+
+    # The GUI looks for the vault, its .format.json and the corpus in the working directory
+    scratch = tempfile.TemporaryDirectory()
+    storage_handler.VAULT_FILE = os.path.join(scratch.name, storage_handler.VAULT_FILE)
+    breach_check.CORPUS_FILE = os.path.join(scratch.name, breach_check.CORPUS_FILE)
+    try:
+        from UI.gui_app import PasswordManagerGUI
+        app = PasswordManagerGUI()
+    except tkinter.TclError as e:
+        sys.exit(f"Tk could not start ({e}). Run under xvfb-run or another display.")
+    app.update()
+
+    print(f"{'entries':>8} | {'screen':>10} | {'build ms':>9} | {f'{args.scroll} rows ms':>12} | {'widgets':>7}")
+    try:
+        for entries in args.sizes:
+            app.open_vault(make_vault(entries))
+            for screen, show, list_attr in (("dashboard", app.show_dashboard, "results_list"),
+                                            ("list_all", app.show_list_all, "accounts_list")):
+                result = run_screen(app, show, list_attr, args.scroll)
+                print(f"{entries:>8} | {screen:>10} | {result['build_ms']:>9.1f} | "
+                      f"{result['scroll_ms']:>12.1f} | {result['widgets']:>7}")
+            service = next(iter(app.vault_data))
+            round_trip_ms = timed(app, lambda: [app.show_details(service), app.show_dashboard()])
+            print(f"{entries:>8} | {'round trip':>10} | {round_trip_ms:>9.1f} | {'':>12} | {count_widgets(app.container):>7}")
+    finally:
+        app.saver.close()
+        app.destroy()
+        scratch.cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Bulk import throughput: rows per second for each import layout, parsing plus
+data_handler.apply_batch() and the single save, against committing the same rows
+one at a time through the journal, the way the add-entry flows do.
+
+Run with: python -m benchmarks.bench_import
+"""
+import os
+import tempfile
+import time
+
+from core import data_handler
+from core import encryption
+from core import import_export
+from core import vault_store
+from benchmarks.common import make_vault
+
+SIZES = (20_000, 100_000)
+PASSWORD = "benchmark-master-password"
+FAST_KDF = encryption.KdfParams(encryption.KDF_PBKDF2, 1_000) # keep the KDF out of the picture
+
+def new_store(path: str) -> vault_store.VaultStore:
+    for leftover in (path, path + ".journal"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    return vault_store.VaultStore(path, kdf=FAST_KDF)
+
+def main():
+    print(f"{'layout':>10} | {'rows':>8} | {'parse+apply rows/s':>18} | {'with save rows/s':>16} | {'one by one rows/s':>17}")
+    with tempfile.TemporaryDirectory() as workdir:
+        vault_path = os.path.join(workdir, "bench.pwmanager")
+        for size in SIZES:
+            source = make_vault(size)
+            for layout in (import_export.FORMAT_JSON, *import_export.CSV_LAYOUTS):
+                export_path = os.path.join(workdir, f"export-{layout}")
+                import_export.write_entries(source, export_path, layout)
+
+                store = new_store(vault_path)
+                vault = store.create(PASSWORD)
+                start = time.perf_counter()
+                result = data_handler.apply_batch(vault, import_export.read_entries(export_path, layout))
+                applied = time.perf_counter()
+                store.save(vault)
+                store.close()
+                saved = time.perf_counter()
+                assert result.added == size, (layout, result.added, result.rejected[:3])
+
+                store = new_store(vault_path)
+                vault = store.create(PASSWORD)
+                start_single = time.perf_counter()
+                for row, service, entry in import_export.read_entries(export_path, layout):
+                    vault[service] = entry
+                    store.commit(vault, service) # Compacts into a full snapshot every 1 MiB of journal
+                store.close()
+                single = size / (time.perf_counter() - start_single)
+
+                print(f"{layout:>10} | {size:>8} | {size / (applied - start):>18,.0f} | "
+                      f"{size / (saved - start):>16,.0f} | {single:>17,.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Startup and lookup cost of the localization catalog as languages are added,
+against the original approach (parse all of locales.json, walk nested dicts per lookup).
+
+Run with: python -m benchmarks.bench_localization
+"""
+import json
+import os
+import tempfile
+import time
+
+from localization import catalog
+from localization.language_manager import LanguageManager
+from benchmarks.common import time_call
+
+LANGUAGE_COUNTS = (4, 16, 64, 256)
+LOOKUPS = 10_000
+
+def make_locales(languages: int) -> dict:
+    with open(catalog.SOURCE_FILE, encoding="utf-8") as f:
+        real = json.load(f)
+    names = list(real)
+    return {f"{names[i % len(names)]}{i}" if i >= len(names) else names[i]: real[names[i % len(names)]]
+            for i in range(languages)}
+
+def nested_lookup(translations: dict, path: str, lang: str):
+    # The original LanguageManager.get_text walk
+    val = translations[lang]
+    for key in path.split("."):
+        val = val[key]
+    return val
+
+def main():
+    print(f"{'langs':>6} | {'json startup ms':>15} | {'build ms':>9} | {'catalog startup ms':>18} | "
+          f"{'first lang ms':>13} | {'nested ns/lookup':>16} | {'catalog ns/lookup':>17}")
+    with tempfile.TemporaryDirectory(prefix="pwmanager-l10n-") as workdir:
+        for languages in LANGUAGE_COUNTS:
+            source = os.path.join(workdir, f"locales-{languages}.json")
+            with open(source, "w", encoding="utf-8") as f:
+                json.dump(make_locales(languages), f, ensure_ascii=False)
+            lang = "da"
+
+            def json_startup():
+                with open(source, encoding="utf-8") as f:
+                    return json.load(f)
+            translations = json_startup()
+            keys = list(catalog.compile_tables({lang: translations[lang]})[lang])
+            build_ms = time_call(lambda: catalog.build(source), repeat=1)
+            manager = LanguageManager(source)
+            startup_ms = time_call(lambda: LanguageManager(source))
+            first_ms = time_call(lambda: LanguageManager(source).table(lang))
+
+            start = time.perf_counter()
+            for i in range(LOOKUPS):
+                nested_lookup(translations, keys[i % len(keys)], lang)
+            nested_ns = (time.perf_counter() - start) / LOOKUPS * 1e9
+            start = time.perf_counter()
+            for i in range(LOOKUPS):
+                manager.get_text(keys[i % len(keys)], lang)
+            catalog_ns = (time.perf_counter() - start) / LOOKUPS * 1e9
+
+            print(f"{languages:>6} | {time_call(json_startup):>15.3f} | {build_ms:>9.3f} | {startup_ms:>18.3f} | "
+                  f"{first_ms:>13.3f} | {nested_ns:>16.0f} | {catalog_ns:>17.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Record payload against the JSON payload the blob and sharded formats used to write:
+serialize and parse time, payload size before and after compression, and the memory
+the parsed vault keeps (dicts per entry for JSON, columns for EntryStore) plus the
+peak while parsing, both from tracemalloc.
+
+Run with: python -m benchmarks.bench_record_store
+"""
+import gc
+import json
+import time
+import tracemalloc
+
+from core import record_store
+from core import storage_compression
+from benchmarks.common import make_vault, time_call
+
+SIZES = (1_000, 10_000, 100_000)
+
+def memory_of(parse) -> tuple:
+    """(KiB kept by the parsed result, KiB peak while parsing)."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = parse()
+        kept, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return kept / 1024, peak / 1024
+
+def main():
+    now = int(time.time())
+    print(f"{'entries':>8} | {'payload':>7} | {'serialize ms':>12} | {'parse ms':>9} | {'bytes':>11} | "
+          f"{'compressed':>10} | {'kept KiB':>9} | {'peak KiB':>9}")
+    for size in SIZES:
+        vault = make_vault(size)
+        for i, entry in enumerate(vault.values()):
+            entry["modified"] = now - i
+        store = record_store.EntryStore.from_entries(vault.items())
+        json_data = json.dumps(vault).encode("utf-8")
+        records = record_store.encode(store)
+        payloads = (
+            ("json", json_data, lambda: json.dumps(vault).encode("utf-8"), lambda: json.loads(json_data)),
+            ("records", records, lambda: record_store.encode(store), lambda: record_store.decode(records)),
+        )
+        for name, payload, serialize, parse in payloads:
+            compressed = len(storage_compression.compress_bytes(payload, "zlib", 6))
+            kept, peak = memory_of(parse)
+            print(f"{size:>8} | {name:>7} | {time_call(serialize, repeat=3):>12.2f} | "
+                  f"{time_call(parse, repeat=3):>9.2f} | {len(payload):>11,} | {compressed:>10,} | "
+                  f"{kept:>9,.0f} | {peak:>9,.0f}")
+
+if __name__ == "__main__":
+    main()
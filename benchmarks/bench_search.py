@@ -0,0 +1,35 @@
+"""
+Build, query and incremental update times of core/search_index.py.
+
+Run with: python -m benchmarks.bench_search
+"""
+import time
+
+from core.search_index import SearchIndex
+from benchmarks.common import make_vault, time_call
+
+INDEX_SIZES = (1_000, 10_000, 100_000)
+QUERIES = ("service-00000", "example", "user42", "srvc9", "zzz")
+UPDATES = 1_000
+
+def main():
+    print(f"{'entries':>8} | {'step':>20} | {'ms':>9}")
+    for entries in INDEX_SIZES:
+        vault = make_vault(entries)
+        start = time.perf_counter()
+        index = SearchIndex(vault)
+        len(index) # forces the lazy build
+        print(f"{entries:>8} | {'build':>20} | {(time.perf_counter() - start) * 1000:>9.2f}")
+        for query in QUERIES:
+            print(f"{entries:>8} | {'search ' + query:>20} | {time_call(lambda: index.search(query)):>9.2f}")
+
+        def updates():
+            for i in range(UPDATES):
+                index.add(f"added-{i}", "bench")
+            for i in range(UPDATES):
+                index.remove(f"added-{i}")
+            index.search("added") # pays for joining the appended terms
+        print(f"{entries:>8} | {f'{UPDATES * 2} add/remove':>20} | {time_call(updates, repeat=1):>9.2f}")
+
+if __name__ == "__main__":
+    main()
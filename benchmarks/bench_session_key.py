@@ -0,0 +1,27 @@
+"""
+Save latency with a per-save PBKDF2 derivation versus a cached session key.
+Each save serializes, compresses and encrypts the vault, like PasswordManagerApp.save.
+
+Run with: python -m benchmarks.bench_session_key
+"""
+import json
+
+from core import encryption
+from core import storage_compression
+from benchmarks.common import VAULT_SIZES, make_vault, time_call
+
+def main():
+    password = "benchmark-master-password"
+    session = encryption.SessionKey.create(password)
+
+    print(f"{'entries':>10} | {'derive per save (ms)':>20} | {'session key (ms)':>16} | {'speedup':>8}")
+    for size in VAULT_SIZES:
+        vault = make_vault(size)
+        before = time_call(lambda: encryption.encrypt_data(
+            storage_compression.compress_data(json.dumps(vault)), password))
+        after = time_call(lambda: session.encrypt(
+            storage_compression.compress_data(json.dumps(vault))))
+        print(f"{size:>10} | {before:>20.2f} | {after:>16.2f} | {before / after:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
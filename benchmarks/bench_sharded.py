@@ -0,0 +1,69 @@
+"""
+Sharded vault against the single-file formats that decrypt everything at unlock:
+unlock time with 1 and several shard workers, and the cost of saving after a
+single change, which rewrites one shard instead of the whole vault.
+
+Parallel unlock only pays off with more than one core; os.cpu_count() is printed
+for reference.
+
+Run with: python -m benchmarks.bench_sharded
+"""
+import os
+import tempfile
+
+from core import encryption
+from core import tracing
+from core import vault_store
+from benchmarks.common import make_vault, time_call
+
+SIZES = (10_000, 100_000)
+PASSWORD = "benchmark-master-password"
+FAST_KDF = encryption.KdfParams(encryption.KDF_PBKDF2, 1_000) # keep the KDF out of the picture
+LAYOUTS = (
+    ("blob", vault_store.FORMAT_BLOB, 1),
+    ("stream", vault_store.FORMAT_STREAM, 1),
+    ("sharded x1", vault_store.FORMAT_SHARDED, 1),
+    ("sharded x4", vault_store.FORMAT_SHARDED, 4),
+)
+
+def open_store(path: str, vault_format: str, workers: int) -> vault_store.VaultStore:
+    return vault_store.VaultStore(path, use_journal=False, vault_format=vault_format, kdf=FAST_KDF,
+                                  workers=workers)
+
+def bytes_written(func) -> int:
+    """Bytes func() writes, from the storage.write spans of a tracer."""
+    tracer = tracing.enable(allocations=False)
+    try:
+        func()
+    finally:
+        tracing.disable()
+    return tracer.stages["storage.write"][3]
+
+def main():
+    print(f"cpu count: {os.cpu_count()}")
+    print(f"{'layout':>11} | {'entries':>8} | {'unlock ms':>10} | {'save 1 change ms':>16} | {'bytes rewritten':>15}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in SIZES:
+            entries = make_vault(size)
+            for name, vault_format, workers in LAYOUTS:
+                path = os.path.join(workdir, f"{name.replace(' ', '-')}-{size}.pwmanager")
+                store = open_store(path, vault_format, workers)
+                vault = store.create(PASSWORD)
+                vault.update(entries)
+                store.save(vault)
+
+                unlock = time_call(lambda: open_store(path, vault_format, workers).unlock(PASSWORD), repeat=3)
+                store = open_store(path, vault_format, workers)
+                vault = store.unlock(PASSWORD)
+                counter = iter(range(1_000_000))
+
+                def save_one_change():
+                    vault["changed.example.com"] = {"user": "bench", "pass": str(next(counter))}
+                    store.save(vault)
+
+                save = time_call(save_one_change, repeat=3)
+                rewritten = bytes_written(save_one_change)
+                print(f"{name:>11} | {size:>8} | {unlock:>10.2f} | {save:>16.2f} | {rewritten:>15,}")
+
+if __name__ == "__main__":
+    main()
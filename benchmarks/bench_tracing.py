@@ -0,0 +1,54 @@
+"""
+Cost of the pipeline tracing: unlock plus full save with tracing off, on, and on
+with allocation tracking (what --profile does by default). Every vault format is
+measured, including lookups of single entries, the per-record hot path of the
+indexed format. Tracing off should match an uninstrumented build.
+
+Run with: python -m benchmarks.bench_tracing
+"""
+import os
+import tempfile
+
+from core import encryption
+from core import tracing
+from core import vault_store
+from benchmarks.common import VAULT_SIZES, make_vault, time_call
+
+PASSWORD = "benchmark-master-password"
+FAST_KDF = encryption.KdfParams(encryption.KDF_PBKDF2, 1_000) # keep the KDF out of the picture
+LOOKUPS = 1_000
+
+def roundtrip(path: str, vault_format: str, services: list):
+    store = vault_store.VaultStore(path, vault_format=vault_format, kdf=FAST_KDF)
+    vault = store.unlock(PASSWORD)
+    for service in services:
+        vault[service]
+    store.save(vault)
+    store.close()
+
+def timed(mode: str, func) -> float:
+    if mode != "off":
+        tracing.enable(allocations=mode == "allocations")
+    try:
+        return time_call(func, repeat=3)
+    finally:
+        tracing.disable()
+
+def main():
+    modes = ("off", "on", "allocations")
+    print(f"{'format':>8} | {'entries':>8} | " + " | ".join(f"{mode + ' (ms)':>16}" for mode in modes))
+    with tempfile.TemporaryDirectory() as workdir:
+        for vault_format in (vault_store.FORMAT_BLOB, vault_store.FORMAT_INDEXED, vault_store.FORMAT_STREAM):
+            for size in VAULT_SIZES:
+                path = os.path.join(workdir, f"{vault_format}-{size}.pwmanager")
+                store = vault_store.VaultStore(path, vault_format=vault_format, kdf=FAST_KDF)
+                vault = store.create(PASSWORD)
+                vault.update(make_vault(size))
+                store.save(vault)
+                store.close()
+                services = list(vault)[:LOOKUPS]
+                times = [timed(mode, lambda: roundtrip(path, vault_format, services)) for mode in modes]
+                print(f"{vault_format:>8} | {size:>8} | " + " | ".join(f"{t:>16.2f}" for t in times))
+
+if __name__ == "__main__":
+    main()
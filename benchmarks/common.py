@@ -0,0 +1,31 @@
+import json
+import secrets
+import time
+
+from core import password_generator
+
+VAULT_SIZES = (10, 100, 1_000, 10_000)
+
+def make_vault(entries: int) -> dict:
+    """
+    Builds a synthetic vault shaped like the real one: {service: {"user", "pass"}}.
+    """
+    return {
+        f"service-{i:07d}.example.com": {
+            "user": f"user{i}@{secrets.token_hex(4)}.example.com",
+            "pass": password_generator.generate_secure_password(),
+        }
+        for i in range(entries)
+    }
+
+def make_payload(entries: int) -> str:
+    return json.dumps(make_vault(entries))
+
+def time_call(func, repeat: int = 5) -> float:
+    """Returns the best wall time in milliseconds over `repeat` runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
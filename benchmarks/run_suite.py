@@ -0,0 +1,177 @@
+"""
+Headless benchmark suite for the unlock, save and CRUD paths across vault sizes.
+
+Every phase is run twice: once untraced for wall and CPU time, once under
+tracemalloc for peak memory, so tracing overhead never skews the timings.
+Vaults are written to a temporary directory; the real vault.pwmanager is never touched.
+
+Run with:
+    python -m benchmarks.run_suite --out results.json
+    python -m benchmarks.run_suite --sizes 10 1000 --format stream --out stream.json
+    python -m benchmarks.run_suite --compare before.json after.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+import tracemalloc
+
+from core import data_handler
+from core import encryption
+from core import password_generator
+from core import storage_compression
+from core import storage_handler
+from core import vault_store
+from benchmarks.common import make_vault
+
+DEFAULT_SIZES = (10, 100, 1_000, 10_000, 100_000, 1_000_000)
+PASSWORD = "benchmark-master-password"
+
+def measure(func, round_no: int) -> dict:
+    """Wall and CPU time from the untraced round, peak memory from the traced one."""
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    func(round_no)
+    result = {
+        "wall_ms": (time.perf_counter() - wall) * 1000,
+        "cpu_ms": (time.process_time() - cpu) * 1000,
+    }
+    tracemalloc.start()
+    try:
+        func(round_no + 1)
+        result["peak_kib"] = tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+    return result
+
+def run_size(entries: int, ops: int, workdir: str, vault_format: str, codec: str) -> dict:
+    path = os.path.join(workdir, f"bench-{entries}.pwmanager")
+    vault = make_vault(entries)
+    services = list(vault)
+    rng = random.Random(entries)
+    phases = {}
+
+    # --- Pipeline stages in isolation ---
+    salt = os.urandom(encryption.SALT_SIZE)
+    json_data = json.dumps(vault)
+    compressed = storage_compression.compress_data(json_data, codec)
+    encrypted = encryption.encrypt_data(compressed, PASSWORD)
+    raw_path = os.path.join(workdir, "raw.bin")
+    phases["derive_key"] = measure(lambda r: encryption.derive_key(PASSWORD, salt), 0)
+    phases["json_dumps"] = measure(lambda r: json.dumps(vault), 0)
+    phases["json_loads"] = measure(lambda r: json.loads(json_data), 0)
+    phases["compress"] = measure(lambda r: storage_compression.compress_data(json_data, codec), 0)
+    phases["decompress"] = measure(lambda r: storage_compression.decompress_data(compressed), 0)
+    phases["encrypt_data"] = measure(lambda r: encryption.encrypt_data(compressed, PASSWORD), 0)
+    phases["decrypt_data"] = measure(lambda r: encryption.decrypt_data(encrypted, PASSWORD), 0)
+    phases["write_vault"] = measure(lambda r: storage_handler.write_vault(encrypted, raw_path), 0)
+    phases["read_vault"] = measure(lambda r: storage_handler.read_vault(raw_path), 0)
+    del json_data, compressed, encrypted
+
+    # --- End-to-end through VaultStore, as the CLI and GUI use it ---
+    def new_store():
+        return vault_store.VaultStore(path, vault_format=vault_format, codec=codec)
+
+    store = new_store()
+    store.create(PASSWORD)
+    phases["save"] = measure(lambda r: store.save(vault), 0)
+    store.close()
+
+    unlocked = {}
+    def unlock(r):
+        unlocked["store"] = new_store()
+        unlocked["vault"] = unlocked["store"].unlock(PASSWORD)
+    phases["unlock"] = measure(unlock, 0)
+    store, live = unlocked["store"], unlocked["vault"]
+
+    def add(r):
+        for i in range(ops):
+            service = f"added-{r}-{i}.example.com"
+            live[service] = {"user": "bench", "pass": password_generator.generate_secure_password()}
+            store.commit(live, service)
+    phases["add"] = measure(add, 0)
+
+    targets = rng.sample(services, min(len(services), ops * 2))
+    def lookup(r):
+        for service in targets[r::2]:
+            live.get(service)
+    phases["lookup"] = measure(lookup, 0)
+
+    def modify(r):
+        for service in targets[r::2]:
+            data_handler.modify_entry(live, service, new_pass=password_generator.generate_secure_password())
+            store.commit(live, service)
+    phases["modify"] = measure(modify, 0)
+
+    def delete(r):
+        for service in targets[r::2]:
+            data_handler.delete_entry(live, service)
+            store.commit(live, service)
+    phases["delete"] = measure(delete, 0)
+    store.close()
+
+    for name in ("add", "modify", "lookup", "delete"):
+        phases[name]["ops"] = ops if name == "add" else len(targets[0::2])
+    return phases
+
+def compare(before_path: str, after_path: str):
+    with open(before_path) as f:
+        before = json.load(f)["results"]
+    with open(after_path) as f:
+        after = json.load(f)["results"]
+    print(f"{'entries':>9} | {'phase':>12} | {'before ms':>10} | {'after ms':>10} | {'change':>8} | {'peak KiB':>19}")
+    for size in after:
+        if size not in before:
+            continue
+        for phase, now in after[size].items():
+            then = before[size].get(phase)
+            if then is None:
+                continue
+            change = (now["wall_ms"] - then["wall_ms"]) / then["wall_ms"] * 100 if then["wall_ms"] else 0.0
+            peaks = f"{then['peak_kib']:.0f} -> {now['peak_kib']:.0f}"
+            print(f"{size:>9} | {phase:>12} | {then['wall_ms']:>10.2f} | {now['wall_ms']:>10.2f} | {change:>+7.1f}% | {peaks:>19}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="vault sizes, in entries")
+    parser.add_argument("--ops", type=int, default=100, help="operations per add/modify/delete/lookup phase")
+    parser.add_argument("--format", default=vault_store.FORMAT_INDEXED,
+                        choices=(vault_store.FORMAT_INDEXED, vault_store.FORMAT_STREAM, vault_store.FORMAT_BLOB,
+                                 vault_store.FORMAT_SHARDED))
+    parser.add_argument("--codec", default=None, choices=storage_compression.available_codecs())
+    parser.add_argument("--out", help="write results as JSON to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="diff two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "format": args.format,
+            "codec": args.codec or "auto",
+            "kdf": encryption.DEFAULT_KDF._asdict(),
+            "ops": args.ops,
+        },
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="pwmanager-bench-") as workdir:
+        for entries in args.sizes:
+            phases = run_size(entries, args.ops, workdir, args.format, args.codec)
+            report["results"][str(entries)] = phases
+            for phase, result in phases.items():
+                print(f"{entries:>9} | {phase:>12} | {result['wall_ms']:>10.2f} ms wall | "
+                      f"{result['cpu_ms']:>10.2f} ms cpu | {result['peak_kib']:>10.0f} KiB peak")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Offline check of passwords against a local breached-password corpus.
+
+build_corpus() converts a HaveIBeenPwned SHA-1 dump ("HASH:COUNT" lines, ordered
+by hash) into a compact binary file. BreachCorpus memory-maps that file and finds a
+password by binary search within its prefix bucket, so only a few pages of a
+multi-gigabyte corpus are ever read and nothing leaves the machine.
+"""
+import binascii
+import hashlib
+import mmap
+import os
+import struct
+from array import array
+from binascii import unhexlify
+
+from core import tracing
+
+CORPUS_FILE = "pwned-passwords.pwcorpus"
+MAGIC = b"PWB1"
+PREFIX_BYTES = 2 # the index has one bucket per value of the first two hash bytes
+MAX_COUNT = 0xFFFFFFFF
+WRITE_BATCH = 64 * 1024 # records per write
+PROGRESS_EVERY = 1_000_000 # dump lines
+
+_HEADER = struct.Struct(">Q") # record count
+_COUNT = struct.Struct(">I")
+_DIGEST_SIZE = 20
+_SUFFIX_SIZE = _DIGEST_SIZE - PREFIX_BYTES
+RECORD_SIZE = _SUFFIX_SIZE + _COUNT.size
+_BUCKETS = 1 << (8 * PREFIX_BYTES)
+_INDEX = struct.Struct(f">{_BUCKETS + 1}Q")
+_BUCKET = struct.Struct(">QQ") # start and end of one bucket
+INDEX_SIZE = _INDEX.size
+DATA_OFFSET = len(MAGIC) + _HEADER.size + INDEX_SIZE
+
+# File layout:
+#   MAGIC | record count | index | record 0 | record 1 | ...
+# The index holds _BUCKETS + 1 big-endian uint64 record numbers: bucket b spans records
+# index[b] to index[b + 1]. A record is the SHA-1 digest without its bucket prefix,
+# followed by how often the password was seen (uint32, saturated), sorted by digest.
+
+def password_digest(password: str) -> bytes:
+    return hashlib.sha1(password.encode("utf-8")).digest()
+
+def _parse_line(line: bytes, line_no: int):
+    digest_hex, _, count = line.rstrip().partition(b":")
+    if len(digest_hex) != 2 * _DIGEST_SIZE:
+        raise ValueError(f"Line {line_no}: expected a SHA-1 hash, got {line.strip()[:48]!r}")
+    try:
+        return unhexlify(digest_hex), min(int(count or 1), MAX_COUNT)
+    except (binascii.Error, ValueError):
+        raise ValueError(f"Line {line_no}: malformed entry {line.strip()[:48]!r}")
+
+def build_corpus(dump_path: str, out_path: str = CORPUS_FILE, progress=None) -> int:
+    """
+    Converts a SHA-1 dump ordered by hash into a corpus file, streaming it line by line.
+    The output is staged and swapped in only once complete. `progress(lines)` is called
+    every PROGRESS_EVERY lines. Returns the number of records.
+    """
+    index = array("Q", bytes(INDEX_SIZE)) # bucket sizes, shifted by one
+    temp_file = out_path + ".tmp"
+    records = 0
+    previous = b""
+    batch = []
+    try:
+        with open(dump_path, "rb") as dump, open(temp_file, "wb") as out:
+            out.write(bytes(DATA_OFFSET)) # Header and index are filled in at the end
+            with tracing.span("breach.build") as s:
+                for line_no, line in enumerate(dump, 1):
+                    if len(line) <= 2 and not line.strip():
+                        continue
+                    digest, count = _parse_line(line, line_no)
+                    if digest < previous:
+                        raise ValueError(f"Line {line_no}: the dump must be ordered by hash.")
+                    previous = digest
+                    index[int.from_bytes(digest[:PREFIX_BYTES], "big") + 1] += 1
+                    batch.append(digest[PREFIX_BYTES:] + count.to_bytes(4, "big"))
+                    records += 1
+                    if len(batch) >= WRITE_BATCH:
+                        out.write(b"".join(batch))
+                        batch = []
+                    if progress is not None and line_no % PROGRESS_EVERY == 0:
+                        progress(line_no)
+                out.write(b"".join(batch))
+                s.bytes_out = DATA_OFFSET + records * RECORD_SIZE
+            for bucket in range(1, _BUCKETS + 1): # Bucket sizes -> cumulative start positions
+                index[bucket] += index[bucket - 1]
+            out.seek(0)
+            out.write(MAGIC + _HEADER.pack(records) + _INDEX.pack(*index))
+        os.replace(temp_file, out_path)
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+    return records
+
+class BreachCorpus:
+    """Read-only view of a corpus file; lookups touch only the pages they need."""
+    def __init__(self, path: str = CORPUS_FILE):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if self._map[:len(MAGIC)] != MAGIC or len(self._map) < DATA_OFFSET:
+                raise ValueError("Not a breached-password corpus.")
+            (self.records,) = _HEADER.unpack_from(self._map, len(MAGIC))
+            if len(self._map) != DATA_OFFSET + self.records * RECORD_SIZE:
+                raise ValueError("The breached-password corpus is truncated.")
+        except BaseException:
+            self._map.close()
+            raise
+
+    def count_digest(self, digest: bytes) -> int:
+        """How often the password with this SHA-1 digest was seen in breaches; 0 if never."""
+        prefix = int.from_bytes(digest[:PREFIX_BYTES], "big")
+        low, high = _BUCKET.unpack_from(self._map, len(MAGIC) + _HEADER.size + prefix * 8)
+        suffix = digest[PREFIX_BYTES:]
+        data = self._map
+        while low < high:
+            middle = (low + high) // 2
+            offset = DATA_OFFSET + middle * RECORD_SIZE
+            candidate = data[offset:offset + _SUFFIX_SIZE]
+            if candidate < suffix:
+                low = middle + 1
+            elif candidate > suffix:
+                high = middle
+            else:
+                return _COUNT.unpack_from(data, offset + _SUFFIX_SIZE)[0]
+        return 0
+
+    def count(self, password: str) -> int:
+        return self.count_digest(password_digest(password))
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+def open_corpus(path: str = None):
+    """The corpus at `path` (default CORPUS_FILE), or None when there is none."""
+    path = path or CORPUS_FILE
+    if not os.path.exists(path):
+        return None
+    return BreachCorpus(path)
+
+def audit(vault_data, corpus: BreachCorpus) -> dict:
+    """
+    Returns service -> times seen for every entry whose password is in the corpus.
+    Passwords shared by several services are looked up once.
+    """
+    breached = {}
+    seen = {}
+    with tracing.span("breach.audit", entries=len(vault_data)):
+        for service in vault_data:
+            password = vault_data[service].get("pass")
+            if not password:
+                continue
+            digest = password_digest(password)
+            count = seen.get(digest)
+            if count is None:
+                count = seen[digest] = corpus.count_digest(digest)
+            if count:
+                breached[service] = count
+    return breached
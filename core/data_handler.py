@@ -1,3 +1,13 @@
+import time
+
+def new_entry(user: str, password: str) -> dict:
+    """An entry stamped with its modification time, for the vault audit's stale report."""
+    return {"user": user, "pass": password, "modified": int(time.time())}
+
+def add_entry(vault_data: dict, service: str, user: str, password: str):
+    """Adds or replaces a service."""
+    vault_data[service] = new_entry(user, password)
+
 def delete_entry(vault_data: dict, service: str) -> bool:
     """
     Removes a service and its associated data entirely.
@@ -12,14 +22,103 @@ def modify_entry(vault_data: dict, service: str, new_user: str = None, new_pass:
     """
     Updates the username, password, or both for a specific service.
     Validates service existence before performing partial updates.
+    Other fields are kept, and "modified" is only stamped when a value really changes.
     """
     if service not in vault_data:
         return False
     
-    if new_user:
-        vault_data[service]['user'] = new_user
+    # Read-modify-write, so lazily decrypted vaults see the change too
+    entry = vault_data[service]
+    changed = False
+    if new_user and new_user != entry.get('user'):
+        entry['user'] = new_user
+        changed = True
     
-    if new_pass:
-        vault_data[service]['pass'] = new_pass
-        
-    return True
\ No newline at end of file
+    if new_pass and new_pass != entry.get('pass'):
+        entry['pass'] = new_pass
+        changed = True
+
+    if changed:
+        entry['modified'] = int(time.time())
+        vault_data[service] = entry
+    return True
+
+CONFLICT_SKIP = "skip" # keep the entry already in the vault
+CONFLICT_OVERWRITE = "overwrite" # replace it with the imported one
+CONFLICT_RENAME = "rename" # keep both, the imported one as "service (2)", "service (3)", ...
+CONFLICT_POLICIES = (CONFLICT_SKIP, CONFLICT_OVERWRITE, CONFLICT_RENAME)
+
+class BatchResult:
+    """Outcome of apply_batch(). `rejected` holds (row, reason) for invalid rows."""
+    def __init__(self):
+        self.added = 0
+        self.updated = 0
+        self.unchanged = 0 # already in the vault with the same username and password
+        self.skipped = 0 # conflicts left alone by CONFLICT_SKIP
+        self.renamed = 0
+        self.rejected = []
+
+    @property
+    def changed(self) -> int:
+        return self.added + self.updated + self.renamed
+
+    @property
+    def rows(self) -> int:
+        return self.changed + self.unchanged + self.skipped + len(self.rejected)
+
+def validate_entry(service, entry) -> str:
+    """
+    Returns why an entry cannot be stored, or None if it is valid.
+    NUL is refused because the search index uses it as its separator.
+    """
+    if not isinstance(service, str) or not service.strip():
+        return "missing service name"
+    if not isinstance(entry, dict):
+        return "entry is not an object"
+    for field in ("user", "pass"):
+        if not isinstance(entry.get(field, ""), str):
+            return f"{field} is not text"
+    if not entry.get("pass"):
+        return "missing password"
+    if "\x00" in service + entry.get("user", "") + entry["pass"]:
+        return "contains a NUL character"
+    return None
+
+def apply_batch(vault_data: dict, rows, on_conflict: str = CONFLICT_SKIP) -> BatchResult:
+    """
+    Applies many entries to the vault in memory, without saving.
+    `rows` yields (row, service, entry), where row identifies the source line for errors;
+    a row the reader already rejected has service None and the reason as its entry.
+    Persist the whole batch afterwards with a single full save.
+    """
+    if on_conflict not in CONFLICT_POLICIES:
+        raise ValueError(f"Unknown conflict policy: {on_conflict}")
+    result = BatchResult()
+    for row, service, entry in rows:
+        error = entry if service is None and isinstance(entry, str) else validate_entry(service, entry)
+        if error:
+            result.rejected.append((row, error))
+            continue
+        service = service.strip()
+        entry = new_entry(entry.get("user", ""), entry["pass"])
+        existing = vault_data.get(service)
+        if existing is None:
+            vault_data[service] = entry
+            result.added += 1
+        elif existing.get("user") == entry["user"] and existing.get("pass") == entry["pass"]:
+            result.unchanged += 1 # Re-importing the same file changes nothing
+        elif on_conflict == CONFLICT_OVERWRITE:
+            vault_data[service] = entry
+            result.updated += 1
+        elif on_conflict == CONFLICT_RENAME:
+            vault_data[_free_name(vault_data, service)] = entry
+            result.renamed += 1
+        else:
+            result.skipped += 1
+    return result
+
+def _free_name(vault_data: dict, service: str) -> str:
+    n = 2
+    while f"{service} ({n})" in vault_data:
+        n += 1
+    return f"{service} ({n})"
@@ -1,41 +1,278 @@
 import os
+import struct
+import time
+from typing import NamedTuple
 from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
-ITERATIONS = 100_000
+from core import tracing
 
-def derive_key(password: str, salt: bytes) -> bytes:
+ITERATIONS = 100_000 # PBKDF2 cost of headerless (legacy) vaults, and the default
+SALT_SIZE = 16
+NONCE_SIZE = 12
+STREAM_PREFIX_SIZE = 7 # nonce = prefix | 4-byte chunk counter | 1-byte final-chunk flag
+STREAM_SALT_SIZE = 16 # random per stream; see SessionKey.stream_key
+
+KDF_PBKDF2 = "pbkdf2-sha256"
+KDF_SCRYPT = "scrypt"
+KDF_MAGIC = b"PWK1"
+TARGET_UNLOCK_MS = 250
+
+class KdfParams(NamedTuple):
+    algorithm: str = KDF_PBKDF2
+    cost: int = ITERATIONS # PBKDF2 iterations, or the scrypt CPU/memory cost N
+    block_size: int = 8 # scrypt r
+    parallelism: int = 1 # scrypt p
+
+DEFAULT_KDF = KdfParams()
+LEGACY_KDF = KdfParams(KDF_PBKDF2, ITERATIONS) # what a bare salt implies
+PBKDF2_MAX_COST = 20_000_000 # several seconds even on fast machines
+SCRYPT_MIN_COST = 2 ** 14
+SCRYPT_MAX_COST = 2 ** 20 # 1 GiB of memory at r=8
+SCRYPT_MAX_BLOCK_SIZE = 32
+SCRYPT_MAX_PARALLELISM = 4
+SCRYPT_MIN_MEMORY = 128 * SCRYPT_MIN_COST * 8 # bytes; scrypt needs 128 * N * r
+SCRYPT_MAX_MEMORY = 128 * SCRYPT_MAX_COST * 8
+
+# Key header: KDF_MAGIC | algorithm id | cost | r | p | salt
+# Stored wherever vaults used to store only the salt, so the KDF can change per vault.
+_KDF_IDS = {KDF_PBKDF2: 1, KDF_SCRYPT: 2}
+_KDF_NAMES = {kdf_id: name for name, kdf_id in _KDF_IDS.items()}
+_KDF_FIELDS = struct.Struct(">BIHH")
+KEY_HEADER_SIZE = len(KDF_MAGIC) + _KDF_FIELDS.size + SALT_SIZE
+
+def check_kdf(kdf: KdfParams, minimums: bool = True):
     """
-    Generates a PBKDF2HMAC sha256 derivation key with given salt key.
+    Raises ValueError unless `kdf` is a known algorithm within the bounds calibrate()
+    picks from. With `minimums` False only the upper bounds apply: that is the check
+    for parameters read from a vault header, where a weakened header merely derives a
+    wrong key but an inflated one would tie up the CPU or memory before failing.
     """
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=32,
-        salt=salt,
-        iterations=ITERATIONS,
-    )
-    return kdf.derive(password.encode())
+    if kdf.algorithm not in _KDF_IDS:
+        raise ValueError(f"Unknown KDF: {kdf.algorithm!r}")
+    if not all(type(value) is int for value in kdf[1:]):
+        raise ValueError("KDF parameters must be whole numbers.")
+    if kdf.algorithm == KDF_PBKDF2:
+        lowest = ITERATIONS if minimums else 1
+        if not lowest <= kdf.cost <= PBKDF2_MAX_COST:
+            raise ValueError(f"PBKDF2 iterations must be between {lowest:,} and {PBKDF2_MAX_COST:,}.")
+        return
+    if kdf.cost < 2 or kdf.cost & (kdf.cost - 1) or kdf.cost > SCRYPT_MAX_COST:
+        raise ValueError(f"The scrypt cost must be a power of two up to {SCRYPT_MAX_COST:,}.")
+    if not 1 <= kdf.block_size <= SCRYPT_MAX_BLOCK_SIZE or not 1 <= kdf.parallelism <= SCRYPT_MAX_PARALLELISM:
+        raise ValueError(f"scrypt needs r from 1 to {SCRYPT_MAX_BLOCK_SIZE} and p from 1 to {SCRYPT_MAX_PARALLELISM}.")
+    memory = 128 * kdf.cost * kdf.block_size
+    if memory > SCRYPT_MAX_MEMORY or (minimums and memory < SCRYPT_MIN_MEMORY):
+        raise ValueError(f"scrypt must use between {SCRYPT_MIN_MEMORY >> 20} and {SCRYPT_MAX_MEMORY >> 20} MiB "
+                         f"(128 * N * r bytes).")
 
-def encrypt_data(data: bytes, password: str) -> bytes:
+def derive_key(password: str, salt: bytes, kdf: KdfParams = LEGACY_KDF) -> bytes:
+    """
+    Generates a 32-byte key from the password with the given salt and KDF
+    (PBKDF2HMAC sha256 or scrypt).
+    """
+    if kdf.algorithm == KDF_SCRYPT:
+        deriver = Scrypt(salt=salt, length=32, n=kdf.cost, r=kdf.block_size, p=kdf.parallelism)
+    elif kdf.algorithm == KDF_PBKDF2:
+        deriver = PBKDF2HMAC(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=salt,
+            iterations=kdf.cost,
+        )
+    else:
+        raise ValueError(f"Unknown KDF: {kdf.algorithm}")
+    with tracing.span("kdf", algorithm=kdf.algorithm, cost=kdf.cost):
+        return deriver.derive(password.encode())
+
+def pack_key_header(kdf: KdfParams, salt: bytes) -> bytes:
+    return KDF_MAGIC + _KDF_FIELDS.pack(_KDF_IDS[kdf.algorithm], kdf.cost, kdf.block_size, kdf.parallelism) + salt
+
+def parse_key_header(data: bytes):
+    """
+    Returns (kdf, salt, header size) from the start of `data`.
+    Anything without a valid key header is a legacy bare salt. Raises ValueError
+    for KDF parameters past check_kdf()'s upper bounds, before anything derives with them.
+    """
+    if data[:len(KDF_MAGIC)] == KDF_MAGIC and len(data) >= KEY_HEADER_SIZE:
+        kdf_id, cost, block_size, parallelism = _KDF_FIELDS.unpack_from(data, len(KDF_MAGIC))
+        if kdf_id in _KDF_NAMES:
+            kdf = KdfParams(_KDF_NAMES[kdf_id], cost, block_size, parallelism)
+            try:
+                check_kdf(kdf, minimums=False)
+            except ValueError as e:
+                raise ValueError(f"The vault header has unusable KDF parameters: {e}")
+            salt = data[KEY_HEADER_SIZE - SALT_SIZE:KEY_HEADER_SIZE]
+            return kdf, salt, KEY_HEADER_SIZE
+    return LEGACY_KDF, data[:SALT_SIZE], SALT_SIZE
+
+def calibrate(algorithm: str = KDF_PBKDF2, target_ms: float = TARGET_UNLOCK_MS) -> KdfParams:
+    """
+    Picks the cost that makes one key derivation take about `target_ms` on this
+    machine. Never goes below the legacy PBKDF2 cost or scrypt's minimum.
+    """
+    salt = os.urandom(SALT_SIZE)
+
+    def elapsed_ms(kdf: KdfParams) -> float:
+        best = float("inf")
+        for _ in range(3):
+            start = time.perf_counter()
+            derive_key("calibration", salt, kdf)
+            best = min(best, (time.perf_counter() - start) * 1000)
+        return best
+
+    if algorithm == KDF_PBKDF2:
+        probe = KdfParams(KDF_PBKDF2, 20_000)
+        cost = int(probe.cost * target_ms / max(elapsed_ms(probe), 1e-3)) // 1000 * 1000
+        return KdfParams(KDF_PBKDF2, min(max(ITERATIONS, cost), PBKDF2_MAX_COST))
+    if algorithm == KDF_SCRYPT:
+        # Cost must be a power of two and time grows about linearly with it
+        kdf = KdfParams(KDF_SCRYPT, SCRYPT_MIN_COST)
+        took = elapsed_ms(kdf)
+        while kdf.cost < SCRYPT_MAX_COST and took * 2 <= target_ms:
+            kdf = kdf._replace(cost=kdf.cost * 2)
+            took *= 2
+        return kdf
+    raise ValueError(f"Unknown KDF: {algorithm}")
+
+def encrypt_data(data: bytes, password: str, kdf: KdfParams = DEFAULT_KDF) -> bytes:
     """
     Encrypts given data and master_password with random salt key, nonce and aesgcm encryption.
     """
-    salt = os.urandom(16)
-    key = derive_key(password, salt)
-    nonce = os.urandom(12)
-    aesgcm = AESGCM(key)
-    ciphertext = aesgcm.encrypt(nonce, data, None)
-    # Store salt and nonce with the ciphertext
-    return salt + nonce + ciphertext
+    # Store the key header (KDF + salt) and nonce with the ciphertext
+    return SessionKey.create(password, kdf).encrypt(data)
 
 def decrypt_data(encrypted_blob: bytes, password: str) -> bytes:
     """
     Dencrypts given data using master_password and aesgcm decryption.
+    Blobs with a bare salt instead of a key header are legacy PBKDF2 ones.
+    """
+    return SessionKey.from_blob(encrypted_blob, password).decrypt(encrypted_blob)
+
+def _stream_nonce(prefix: bytes, counter: int, last: bool) -> bytes:
+    return prefix + counter.to_bytes(4, "big") + (b"\x01" if last else b"\x00")
+
+class SessionKey:
+    """
+    Derived key of an unlocked vault, kept in memory for the session.
+    Blobs use the same key header + nonce + ciphertext layout as encrypt_data,
+    but every save only draws a fresh nonce instead of re-running the KDF.
+    """
+    def __init__(self, key: bytes, salt: bytes, kdf: KdfParams = LEGACY_KDF):
+        self.key = key
+        self.salt = salt
+        self.kdf = kdf
+        self.header = pack_key_header(kdf, salt) # written in place of the bare salt
+        self._aesgcm = AESGCM(key)
+
+    @classmethod
+    def create(cls, password: str, kdf: KdfParams = DEFAULT_KDF) -> "SessionKey":
+        """Derives a key under a brand new random salt."""
+        salt = os.urandom(SALT_SIZE)
+        return cls(derive_key(password, salt, kdf), salt, kdf)
+
+    @classmethod
+    def from_blob(cls, encrypted_blob: bytes, password: str) -> "SessionKey":
+        """Derives the key once, reusing the KDF and salt stored in an existing vault blob."""
+        kdf, salt, _ = parse_key_header(encrypted_blob)
+        return cls(derive_key(password, salt, kdf), salt, kdf)
+
+    def encrypt(self, data: bytes) -> bytes:
+        return self.header + self.seal(data)
+
+    def decrypt(self, encrypted_blob: bytes) -> bytes:
+        kdf, salt, header_size = parse_key_header(encrypted_blob)
+        if salt != self.salt or kdf != self.kdf:
+            raise ValueError("Blob was encrypted under a different key.")
+        return self.open(encrypted_blob[header_size:])
+
+    def seal(self, data: bytes, associated_data: bytes = None) -> bytes:
+        """Encrypts a record as nonce + ciphertext, without the salt prefix."""
+        nonce = os.urandom(NONCE_SIZE)
+        if tracing.active_tracer is None: # Every record, index and journal op is sealed here
+            return nonce + self._aesgcm.encrypt(nonce, data, associated_data)
+        with tracing.span("aes-gcm.seal", len(data)) as s:
+            sealed = nonce + self._aesgcm.encrypt(nonce, data, associated_data)
+            s.bytes_out = len(sealed)
+        return sealed
+
+    def open(self, sealed: bytes, associated_data: bytes = None) -> bytes:
+        """Reverses seal(). Raises InvalidTag if the record or its associated data was altered."""
+        if tracing.active_tracer is None:
+            return self._aesgcm.decrypt(sealed[:NONCE_SIZE], sealed[NONCE_SIZE:], associated_data)
+        with tracing.span("aes-gcm.open", len(sealed)) as s:
+            data = self._aesgcm.decrypt(sealed[:NONCE_SIZE], sealed[NONCE_SIZE:], associated_data)
+            s.bytes_out = len(data)
+        return data
+
+    def stream_key(self, salt: bytes) -> "SessionKey":
+        """
+        Subkey for one stream, derived with HKDF-SHA256 from a random per-stream `salt`
+        (as Tink's streaming AEAD does). Its 7-byte nonce prefix then only has to be
+        unique within the stream, not across every save under this session key.
+        """
+        key = HKDF(hashes.SHA256(), len(self.key), salt, b"pwmanager stream").derive(self.key)
+        return SessionKey(key, self.salt, self.kdf)
+
+    def seal_stream(self, chunks, prefix: bytes, associated_data: bytes = None):
+        """
+        STREAM-style chunked encryption: yields one ciphertext per plaintext chunk.
+        Each nonce carries the chunk index and a final-chunk flag, so dropping,
+        reordering or truncating chunks makes open_stream() fail.
+        """
+        counter = 0
+        previous = None
+        for chunk in chunks:
+            if previous is not None:
+                yield self._stream_seal(_stream_nonce(prefix, counter, False), previous, associated_data)
+                counter += 1
+            previous = chunk
+        yield self._stream_seal(_stream_nonce(prefix, counter, True), previous or b"", associated_data)
+
+    def open_stream(self, chunks, prefix: bytes, associated_data: bytes = None):
+        """Reverses seal_stream(), yielding plaintext chunks as they are authenticated."""
+        counter = 0
+        previous = None
+        for chunk in chunks:
+            if previous is not None:
+                yield self._stream_open(_stream_nonce(prefix, counter, False), previous, associated_data)
+                counter += 1
+            previous = chunk
+        if previous is None:
+            raise ValueError("Encrypted stream is empty.")
+        yield self._stream_open(_stream_nonce(prefix, counter, True), previous, associated_data)
+
+    # One span per chunk; a span must not stay open across the generators' yields
+    def _stream_seal(self, nonce: bytes, chunk: bytes, associated_data: bytes) -> bytes:
+        with tracing.span("aes-gcm.seal", len(chunk)) as s:
+            sealed = self._aesgcm.encrypt(nonce, chunk, associated_data)
+            s.bytes_out = len(sealed)
+        return sealed
+
+    def _stream_open(self, nonce: bytes, sealed: bytes, associated_data: bytes) -> bytes:
+        with tracing.span("aes-gcm.open", len(sealed)) as s:
+            chunk = self._aesgcm.decrypt(nonce, sealed, associated_data)
+            s.bytes_out = len(chunk)
+        return chunk
+
+def resume_session(password: str, key_header: bytes, session: SessionKey = None) -> SessionKey:
+    """
+    Reuses `session` when it was derived for the KDF and salt in `key_header`,
+    skipping the KDF; otherwise derives a new key from `password`.
+    """
+    kdf, salt, _ = parse_key_header(key_header)
+    if session is not None and session.salt == salt and session.kdf == kdf:
+        return session
+    if password is None:
+        raise ValueError("The vault was re-keyed; the master password is needed to open it.")
+    return SessionKey(derive_key(password, salt, kdf), salt, kdf)
+
+def rotate_session_key(password: str, kdf: KdfParams = DEFAULT_KDF) -> SessionKey:
+    """
+    Explicitly rotates salt and key, optionally to a new KDF. The caller must
+    re-save the vault with the returned session for the rotation to take effect.
     """
-    salt = encrypted_blob[:16]
-    nonce = encrypted_blob[16:28]
-    ciphertext = encrypted_blob[28:]
-    key = derive_key(password, salt)
-    aesgcm = AESGCM(key)
-    return aesgcm.decrypt(nonce, ciphertext, None)
\ No newline at end of file
+    return SessionKey.create(password, kdf)
@@ -0,0 +1,172 @@
+"""
+Streaming import and export of vault entries as CSV or JSON.
+
+Importers read one row (or one JSON member) at a time and yield (row, service, entry)
+for data_handler.apply_batch(); nothing is held beyond the current row. Exporters
+write entries as they are read, so a LazyVault is decrypted one record at a time.
+
+CSV layouts:
+    csv        service,user,pass (this app's own export)
+    bitwarden  Bitwarden's CSV export; items other than logins are rejected
+    keepass    KeePass 2 "KeePass CSV (1.x)": Account, Login Name, Password, ...
+    keepassxc  KeePassXC: Group, Title, Username, Password, URL, Notes, ...
+JSON is this app's own {"service": {"user": ..., "pass": ...}} object.
+"""
+import csv
+import json
+import os
+from typing import NamedTuple
+
+from core.stream_vault import iter_json_object
+
+FORMAT_AUTO = "auto"
+FORMAT_JSON = "json"
+READ_SIZE = 64 * 1024
+
+class CsvLayout(NamedTuple):
+    columns: tuple # header written on export, in order
+    service: str
+    user: str
+    password: str
+    kind: str = None # column holding the item type, for managers that export more than logins
+    login_kind: str = None
+    defaults: dict = {} # fixed values for other columns on export
+
+CSV_LAYOUTS = {
+    "csv": CsvLayout(("service", "user", "pass"), "service", "user", "pass"),
+    "bitwarden": CsvLayout(
+        ("folder", "favorite", "type", "name", "notes", "fields", "reprompt",
+         "login_uri", "login_username", "login_password", "login_totp"),
+        "name", "login_username", "login_password", kind="type", login_kind="login",
+        defaults={"type": "login", "reprompt": "0"}),
+    "keepass": CsvLayout(("Account", "Login Name", "Password", "Web Site", "Comments"),
+                         "Account", "Login Name", "Password"),
+    "keepassxc": CsvLayout(("Group", "Title", "Username", "Password", "URL", "Notes"),
+                           "Title", "Username", "Password"),
+}
+FORMATS = (FORMAT_AUTO, FORMAT_JSON, *CSV_LAYOUTS)
+
+class ImportFormatError(ValueError):
+    pass
+
+def _normalize(name: str) -> str:
+    return name.strip().lower()
+
+def detect_csv_layout(header: list) -> str:
+    """Picks the layout whose service, user and password columns are all in `header`."""
+    present = {_normalize(name) for name in header}
+    for name, layout in CSV_LAYOUTS.items():
+        if {_normalize(layout.service), _normalize(layout.user), _normalize(layout.password)} <= present:
+            return name
+    raise ImportFormatError(f"Unrecognised CSV header: {', '.join(header)}")
+
+def resolve_format(path: str, file_format: str = FORMAT_AUTO) -> str:
+    """Returns `file_format`, or the detected one for auto; raises if the file cannot be read."""
+    if file_format != FORMAT_AUTO:
+        os.stat(path)
+        return file_format
+    if os.path.splitext(path)[1].lower() == ".json":
+        return FORMAT_JSON
+    with open(path, "r", newline="", encoding="utf-8-sig") as f:
+        header = next(csv.reader(f), None)
+    if header is None:
+        raise ImportFormatError("The file is empty.")
+    return detect_csv_layout(header)
+
+def read_csv(path: str, layout_name: str = FORMAT_AUTO):
+    """Yields (line number, service, entry) per data row. Column names are matched case-insensitively."""
+    # utf-8-sig: spreadsheet and Bitwarden exports often start with a byte order mark
+    with open(path, "r", newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        if layout_name == FORMAT_AUTO:
+            layout_name = detect_csv_layout(header)
+        layout = CSV_LAYOUTS[layout_name]
+        columns = {_normalize(name): i for i, name in enumerate(header)}
+        try:
+            service_col, user_col, pass_col = (columns[_normalize(name)]
+                                               for name in (layout.service, layout.user, layout.password))
+        except KeyError as e:
+            raise ImportFormatError(f"Missing column {e} for the {layout_name} layout.")
+        kind_col = columns.get(_normalize(layout.kind)) if layout.kind else None
+        width = max(service_col, user_col, pass_col) + 1
+
+        try:
+            for row in reader:
+                if not any(row):
+                    continue # Blank line
+                line = reader.line_num
+                if len(row) < width:
+                    yield line, None, f"expected at least {width} columns, got {len(row)}"
+                    continue
+                if kind_col is not None and kind_col < len(row) and row[kind_col] != layout.login_kind:
+                    yield line, None, f"not a login item ({row[kind_col] or 'no type'})"
+                    continue
+                yield line, row[service_col], {"user": row[user_col], "pass": row[pass_col]}
+        except csv.Error as e:
+            raise ImportFormatError(f"Line {reader.line_num}: {e}")
+
+def read_json(path: str):
+    """Yields (service, service, entry) per member, parsing the file incrementally."""
+    with open(path, "r", encoding="utf-8-sig") as f:
+        chunks = iter(lambda: f.read(READ_SIZE), "")
+        try:
+            for service, entry in iter_json_object(chunks):
+                yield service, service, entry
+        except ValueError as e:
+            raise ImportFormatError(f"Invalid JSON export: {e}")
+
+def read_entries(path: str, file_format: str = FORMAT_AUTO):
+    """
+    Yields (row, service, entry) from an export file. A row the importer cannot
+    make sense of comes with service None and the reason as its entry, which
+    data_handler.apply_batch() reports as rejected.
+    """
+    file_format = resolve_format(path, file_format)
+    if file_format == FORMAT_JSON:
+        return read_json(path)
+    return read_csv(path, file_format)
+
+def _open_private(path: str):
+    # Exports hold every password in the clear: never readable by other users
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    if hasattr(os, "fchmod"):
+        os.fchmod(fd, 0o600) # The mode above only applies to new files
+    return os.fdopen(fd, "w", newline="", encoding="utf-8")
+
+def write_csv(vault_data, path: str, layout_name: str = "csv") -> int:
+    layout = CSV_LAYOUTS[layout_name]
+    count = 0
+    with _open_private(path) as f:
+        writer = csv.writer(f)
+        writer.writerow(layout.columns)
+        for service in vault_data:
+            entry = vault_data[service]
+            values = dict(layout.defaults)
+            values.update({layout.service: service, layout.user: entry.get("user", ""),
+                           layout.password: entry.get("pass", "")})
+            writer.writerow([values.get(column, "") for column in layout.columns])
+            count += 1
+    return count
+
+def write_json(vault_data, path: str) -> int:
+    count = 0
+    with _open_private(path) as f:
+        f.write("{")
+        for service in vault_data:
+            entry = vault_data[service]
+            f.write((",\n " if count else "\n ") + json.dumps(service) + ": " +
+                    json.dumps({"user": entry.get("user", ""), "pass": entry.get("pass", "")}))
+            count += 1
+        f.write("\n}\n" if count else "}\n")
+    return count
+
+def write_entries(vault_data, path: str, file_format: str = FORMAT_AUTO) -> int:
+    """Writes every entry to `path`; auto picks JSON for .json files, else this app's CSV. Returns the count."""
+    if file_format == FORMAT_AUTO:
+        file_format = FORMAT_JSON if os.path.splitext(path)[1].lower() == ".json" else "csv"
+    if file_format == FORMAT_JSON:
+        return write_json(vault_data, path)
+    return write_csv(vault_data, path, file_format)
@@ -0,0 +1,194 @@
+import json
+import os
+import struct
+import threading
+
+from core import encryption
+from core import tracing
+
+JOURNAL_SUFFIX = ".journal"
+MAGIC = b"PWJ1"
+COMPACT_THRESHOLD = 1024 * 1024 # bytes of journal before a new snapshot is written
+
+_LENGTH = struct.Struct(">I")
+_SEQ = struct.Struct(">Q")
+
+def snapshot_id(snapshot_blob: bytes) -> bytes:
+    """
+    Key header (or legacy salt) + nonce of a snapshot blob. Unique per save, so it ties
+    a journal to one base.
+    """
+    _, _, header_size = encryption.parse_key_header(snapshot_blob)
+    return snapshot_blob[:header_size + encryption.NONCE_SIZE]
+
+def _associated_data(header: bytes, seq: int) -> bytes:
+    # Binding the header and position means a record cannot be moved, reordered or replayed elsewhere
+    return header + _SEQ.pack(seq)
+
+def encode_record(session: encryption.SessionKey, header: bytes, seq: int, op: dict) -> bytes:
+    sealed = session.seal(json.dumps(op).encode("utf-8"), _associated_data(header, seq))
+    return _LENGTH.pack(len(sealed)) + sealed
+
+def read_records(data: bytes, session: encryption.SessionKey, header: bytes):
+    """
+    Decodes the records following the header. Returns (ops, valid_length).
+    A torn or unauthenticated final record is ignored; damage before the tail raises ValueError.
+    """
+    ops = []
+    offset = len(header)
+    while offset < len(data):
+        end = offset + _LENGTH.size
+        if end > len(data):
+            break # Torn length prefix
+        (length,) = _LENGTH.unpack_from(data, offset)
+        if end + length > len(data):
+            break # Truncated record body
+        try:
+            plain = session.open(data[end:end + length], _associated_data(header, len(ops)))
+        except Exception:
+            if end + length == len(data):
+                break # Torn final write
+            raise ValueError("Journal record is corrupted.")
+        ops.append(json.loads(plain))
+        offset = end + length
+    return ops, offset
+
+def apply_op(vault_data: dict, op: dict):
+    if op["op"] == "set":
+        vault_data[op["service"]] = op["entry"]
+    else:
+        vault_data.pop(op["service"], None)
+
+class VaultJournal:
+    """
+    Append-only log of encrypted single-entry changes on top of a snapshot.
+    Once the log passes compact_threshold bytes, a fresh snapshot is encoded on
+    a background thread and the log restarts with only the changes made meanwhile.
+
+    Snapshots are produced by the owning store through take_snapshot(),
+    encode_snapshot(), snapshot_id() and install_snapshot().
+    """
+    def __init__(self, store, compact_threshold: int = COMPACT_THRESHOLD):
+        self.store = store
+        self.path = store.path + JOURNAL_SUFFIX
+        self.compact_threshold = compact_threshold
+        self.header = b""
+        self.size = 0
+        self.seq = 0
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._pending = None # ops appended while a compaction is running
+        self._worker = None
+
+    @property
+    def session(self) -> encryption.SessionKey:
+        return self.store.session
+
+    def open(self, base_id: bytes, vault_data: dict, read_only: bool = False) -> int:
+        """
+        Replays the journal belonging to the snapshot `base_id` into vault_data.
+        Returns the number of records applied. With `read_only`, torn tails and
+        interrupted compactions are skipped rather than repaired, for readers that
+        share the vault with a writer.
+        """
+        self.header = MAGIC + base_id
+        tmp_path = self.path + ".tmp"
+        for candidate in (self.path, tmp_path):
+            if not os.path.exists(candidate):
+                continue
+            with tracing.span("journal.replay") as s:
+                with open(candidate, "rb") as f:
+                    data = f.read()
+                s.bytes_in = len(data)
+                if not data.startswith(self.header):
+                    continue # Stale: belongs to an older snapshot or key
+                ops, valid_length = read_records(data, self.session, self.header)
+            if not read_only:
+                if candidate == tmp_path:
+                    os.replace(tmp_path, self.path) # Finish an interrupted compaction
+                if valid_length < len(data):
+                    os.truncate(self.path, valid_length)
+            for op in ops:
+                apply_op(vault_data, op)
+            self.size, self.seq = valid_length, len(ops)
+            return len(ops)
+        if not read_only:
+            self._write_log(self.path, self.header, [])
+        return 0
+
+    def append(self, vault_data: dict, service: str):
+        """Records the current state of one service (or its removal), compacting when due."""
+        self.append_entry(service, vault_data.get(service))
+        if self.compaction_due:
+            self.compact(vault_data)
+
+    def append_entry(self, service: str, entry):
+        """Writes one record; `entry` None means the service was deleted. Never compacts."""
+        if entry is None:
+            op = {"op": "del", "service": service}
+        else:
+            op = {"op": "set", "service": service, "entry": dict(entry)}
+        with self._lock, tracing.span("journal.append") as s:
+            record = encode_record(self.session, self.header, self.seq, op)
+            with open(self.path, "ab") as f:
+                s.bytes_out = f.write(record)
+            self.size += len(record)
+            self.seq += 1
+            if self._pending is not None:
+                self._pending.append(op)
+
+    @property
+    def compaction_due(self) -> bool:
+        return self.size >= self.compact_threshold and self._pending is None
+
+    def compact(self, vault_data: dict, background: bool = True):
+        with self._lock:
+            if self._pending is not None:
+                return # Already compacting
+            self._pending = []
+            snapshot = self.store.take_snapshot(vault_data)
+        if background:
+            self._worker = threading.Thread(target=self._compact, args=(snapshot,), daemon=True)
+            self._worker.start()
+        else:
+            self._compact(snapshot)
+
+    def _compact(self, snapshot: dict):
+        try:
+            with tracing.span("journal.compact"):
+                encoded = self.store.encode_snapshot(snapshot)
+                with self._lock:
+                    header = MAGIC + self.store.snapshot_id(encoded)
+                    tmp_path = self.path + ".tmp"
+                    # Stage the new log first: a crash after the snapshot swap is recovered from the .tmp log
+                    self._write_log(tmp_path, header, self._pending)
+                    self.store.install_snapshot(encoded, snapshot)
+                    os.replace(tmp_path, self.path)
+                    self.header = header
+                    self.size, self.seq = os.path.getsize(self.path), len(self._pending)
+                    self._pending = None
+            self.last_error = None
+        except Exception as e:
+            self.last_error = e
+            self._pending = None
+
+    def _write_log(self, path: str, header: bytes, ops: list):
+        with open(path, "wb") as f:
+            f.write(header)
+            for seq, op in enumerate(ops):
+                f.write(encode_record(self.session, header, seq, op))
+        if path == self.path:
+            self.size, self.seq = os.path.getsize(path), len(ops)
+
+    def reset(self, base_id: bytes):
+        """Starts an empty log after a full snapshot has been written."""
+        self.wait()
+        with self._lock:
+            self.header = MAGIC + base_id
+            self._write_log(self.path, self.header, [])
+
+    def wait(self):
+        """Blocks until a running background compaction has finished."""
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
@@ -1,11 +1,182 @@
-import secrets
+import math
+import os
+from functools import lru_cache
+from typing import NamedTuple
 
-def generate_secure_password() -> str:
+LOWERCASE = "abcdefghijklmnopqrstuvwxyz"
+UPPERCASE = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+DIGITS = "0123456789"
+SYMBOLS = "!#$%&*+-=?@^_~" # no quotes, backslashes or spaces, which break shells and forms
+HEX_DIGITS = "0123456789abcdef"
+LOOK_ALIKES = "Il1|O0o"
+WORDLIST_FILE = os.path.join(os.path.dirname(__file__), "eff_large_wordlist.txt") # EFF large list, 7776 words
+
+class PasswordPolicy(NamedTuple):
+    length: int = 20 # characters, not counting group separators
+    lowercase: bool = True
+    uppercase: bool = True
+    digits: bool = True
+    symbols: bool = True
+    require_each: bool = True # at least one character of every enabled class
+    exclude_look_alikes: bool = True
+    exclude: str = "" # more characters never to use
+    alphabet: str = "" # replaces the classes above when set
+    group_size: int = 0 # insert the separator every group_size characters; 0 for none
+    words: int = 0 # passphrase mode: this many words from the word list, the fields above ignored
+    separator: str = "-"
+
+# The original [hex]-[hex]-[hex] format: 3 groups of 3 random bytes, 72 bits
+HEX_POLICY = PasswordPolicy(length=18, alphabet=HEX_DIGITS, group_size=6, exclude_look_alikes=False)
+STRONG_POLICY = PasswordPolicy()
+PASSPHRASE_POLICY = PasswordPolicy(words=6)
+DEFAULT_POLICY = HEX_POLICY
+
+class Generated(NamedTuple):
+    password: str
+    entropy_bits: float # of the policy that produced it: log2 of the number of equally likely outputs
+
+class Batch(NamedTuple):
+    passwords: list
+    entropy_bits: float # the same for every password of the batch
+
+class _Plan(NamedTuple):
+    symbols: object # str of characters, or a tuple of words in passphrase mode
+    required: tuple # frozensets of characters, one per class that must appear
+    table: bytes # bytes.translate table: accepted byte -> character (ASCII alphabets only)
+    rejected: bytes # bytes at or above the rejection limit, deleted by translate
+    groups: tuple # slices cutting a password into groups, empty when not grouped
+    entropy_bits: float
+
+@lru_cache(maxsize=1)
+def load_wordlist() -> tuple:
+    with open(WORDLIST_FILE, "r", encoding="utf-8") as f:
+        return tuple(line.strip() for line in f if line.strip())
+
+def _rejection_limit(size: int, space: int) -> int:
+    """Largest multiple of `size` that fits in `space`; draws at or above it are rejected to avoid modulo bias."""
+    return space - space % size
+
+@lru_cache(maxsize=32)
+def _plan(policy: PasswordPolicy) -> _Plan:
+    """Validates a policy and precomputes its alphabet, sampling tables and entropy."""
+    if policy.words < 0:
+        raise ValueError("A passphrase needs at least one word.")
+    if policy.words:
+        # Words containing the separator (drop-down, t-shirt... for "-") would make passphrases ambiguous
+        words = tuple(word for word in load_wordlist() if not policy.separator or policy.separator not in word)
+        return _Plan(words, (), b"", b"", (), policy.words * math.log2(len(words)))
+
+    excluded = set(policy.exclude) | (set(LOOK_ALIKES) if policy.exclude_look_alikes else set())
+    if policy.alphabet:
+        classes = [policy.alphabet]
+    else:
+        enabled = (policy.lowercase, policy.uppercase, policy.digits, policy.symbols)
+        classes = [chars for chars, on in zip((LOWERCASE, UPPERCASE, DIGITS, SYMBOLS), enabled) if on]
+    classes = ["".join(dict.fromkeys(c for c in chars if c not in excluded)) for chars in classes]
+    classes = [chars for chars in classes if chars]
+    symbols = "".join(dict.fromkeys("".join(classes)))
+    required = tuple(frozenset(chars) for chars in classes) if policy.require_each and len(classes) > 1 else ()
+    if not symbols:
+        raise ValueError("The policy leaves no characters to choose from.")
+    if len(symbols) > 256:
+        raise ValueError("An alphabet can have at most 256 characters.")
+    if policy.length < max(1, len(required)):
+        raise ValueError(f"A length of {policy.length} cannot include all {len(required)} required character classes.")
+
+    limit = _rejection_limit(len(symbols), 256)
+    table = rejected = b""
+    if all(ord(c) < 128 for c in symbols):
+        table = bytes(ord(symbols[b % len(symbols)]) if b < limit else 0 for b in range(256))
+        rejected = bytes(range(limit, 256))
+
+    # Entropy of a uniform pick among the strings that contain every required class
+    # (inclusion-exclusion over the classes left out)
+    valid = 0
+    for mask in range(1 << len(required)):
+        left_out = sum(len(required[i]) for i in range(len(required)) if mask >> i & 1)
+        valid += (-1) ** bin(mask).count("1") * (len(symbols) - left_out) ** policy.length
+    size = policy.group_size
+    groups = tuple(slice(i, i + size) for i in range(0, policy.length, size)) if size > 0 else ()
+    return _Plan(symbols, required, table, rejected, groups, math.log2(valid))
+
+def _draw_chars(plan: _Plan, count: int) -> str:
+    """About `count` characters drawn uniformly from the plan's alphabet, from one urandom buffer."""
+    size = len(plan.symbols)
+    limit = _rejection_limit(size, 256)
+    raw = os.urandom(count * 256 // limit + 16) # Expected rejections plus a little slack
+    if plan.table:
+        return raw.translate(plan.table, plan.rejected).decode("ascii") # All in C
+    return "".join([plan.symbols[b % size] for b in raw if b < limit])
+
+def _draw_words(words: tuple, count: int) -> list:
+    """About `count` words drawn uniformly from two-byte samples of one urandom buffer."""
+    limit = _rejection_limit(len(words), 1 << 16)
+    raw = os.urandom(2 * (count * (1 << 16) // limit + 8))
+    return [words[v % len(words)] for v in memoryview(raw).cast("H") if v < limit]
+
+def _take(plan: _Plan, count: int):
+    """
+    `count` uniform samples (characters or words), usually from a single urandom buffer.
+    Nothing is kept between calls: samples left over are discarded, never reused.
+    """
+    words = not isinstance(plan.symbols, str)
+    samples = [] if words else ""
+    while len(samples) < count:
+        needed = count - len(samples)
+        samples += _draw_words(plan.symbols, needed) if words else _draw_chars(plan, needed)
+    return samples[:count]
+
+def _grouped(plan: _Plan, policy: PasswordPolicy, password: str) -> str:
+    return policy.separator.join([password[group] for group in plan.groups]) if plan.groups else password
+
+def generate(policy: PasswordPolicy = DEFAULT_POLICY) -> Generated:
+    plan = _plan(policy)
+    if policy.words:
+        return Generated(policy.separator.join(_take(plan, policy.words)), plan.entropy_bits)
+    while True:
+        password = _take(plan, policy.length)
+        # Redrawing a password that misses a required class keeps the pick uniform
+        if all(not required.isdisjoint(password) for required in plan.required):
+            return Generated(_grouped(plan, policy, password), plan.entropy_bits)
+
+def generate_batch(count: int, policy: PasswordPolicy = DEFAULT_POLICY) -> Batch:
+    """
+    Generates `count` passwords following `policy`, drawing the randomness for the
+    whole batch at once instead of per password.
+    """
+    if count < 0:
+        raise ValueError("The number of passwords cannot be negative.")
+    plan = _plan(policy)
+    if policy.words:
+        words = _take(plan, count * policy.words)
+        separator = policy.separator
+        return Batch([separator.join(words[i:i + policy.words]) for i in range(0, len(words), policy.words)],
+                     plan.entropy_bits)
+
+    length = policy.length
+    passwords = []
+    while len(passwords) < count:
+        chars = _take(plan, (count - len(passwords)) * length)
+        drawn = [chars[i:i + length] for i in range(0, len(chars), length)]
+        if plan.required:
+            drawn = [p for p in drawn if all(not required.isdisjoint(p) for required in plan.required)]
+        passwords += drawn
+    if plan.groups:
+        separator, groups = policy.separator, plan.groups
+        passwords = [separator.join([p[group] for group in groups]) for p in passwords]
+    return Batch(passwords, plan.entropy_bits)
+
+def entropy_bits(policy: PasswordPolicy = DEFAULT_POLICY) -> float:
+    return _plan(policy).entropy_bits
+
+def alphabet(policy: PasswordPolicy = DEFAULT_POLICY) -> str:
+    """The characters a policy draws from; the letters of the word list for passphrases."""
+    symbols = _plan(policy).symbols
+    return symbols if isinstance(symbols, str) else LOWERCASE
+
+def generate_secure_password(policy: PasswordPolicy = DEFAULT_POLICY) -> str:
     """
-    Generates a high-entropy password in the format [hex]-[hex]-[hex].
-    Each hex segment represents 3 bytes (6 characters).
+    Generates a high-entropy password. By default in the format [hex]-[hex]-[hex],
+    each hex segment representing 3 bytes (6 characters).
     """
-    part1 = secrets.token_hex(3)
-    part2 = secrets.token_hex(3)
-    part3 = secrets.token_hex(3)
-    return f"{part1}-{part2}-{part3}"
\ No newline at end of file
+    return generate(policy).password
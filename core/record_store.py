@@ -0,0 +1,243 @@
+"""
+Compact in-memory entry store and the binary payload it is saved as.
+
+EntryStore keeps the vault column by column, one list per field, instead of a
+dict per entry. The payload replaces the JSON the blob and sharded formats used
+to write: field names are not repeated per entry, every distinct string is stored
+once, and it decodes into an EntryStore with a few bulk slicing calls instead of a
+parser building nested dicts. JSON payloads are still read.
+"""
+import json
+import sys
+from array import array
+from collections.abc import MutableMapping
+from itertools import accumulate
+
+from core import tracing
+
+MAGIC = b"PWR1" # the digit is the format version
+NO_TIME = -(1 << 63) # "modified" column value of entries without one
+_INT64_MAX = (1 << 63) - 1
+
+_HEADER_FIELDS = 3 # string count, record count, string table size in bytes
+
+# Payload layout, integers little-endian:
+#   MAGIC | string count | record count | string table size |
+#   string offsets: string count + 1 uint32, in characters |
+#   string table: the strings, concatenated, UTF-8 |
+#   records, one column per field, record count values each:
+#     user, pass, extra: uint32 string id | modified: int64
+# String i is the text between offsets i and i + 1 of the decoded table. Offsets count
+# characters, not bytes, so the table is decoded with one call and then sliced; there is
+# no random access to a single string without decoding the table. The first
+# `record count` strings are the services, in record order; usernames and extra
+# fields are stored once however many entries share them. Id `string count` marks an
+# absent field. "extra" holds any other fields of the entry as a JSON object.
+
+def is_records(payload: bytes) -> bool:
+    return payload[:len(MAGIC)] == MAGIC
+
+class EntryStore(MutableMapping):
+    """
+    Mapping of service -> entry stored as columns. Entries are returned as copies:
+    write them back to change them, as with LazyVault. "user" and "pass" strings and
+    an integer "modified" have columns of their own; other fields are kept per entry.
+    """
+    def __init__(self):
+        self._rows = {} # service -> position in the columns
+        self._services = []
+        self._users = [] # None when the entry has no text "user"
+        self._passwords = [] # None when the entry has no text "pass"
+        self._modified = array("q") # NO_TIME when the entry has no integer "modified"
+        self._extra = [] # dict of the remaining fields, or None
+
+    @classmethod
+    def from_entries(cls, entries) -> "EntryStore":
+        store = cls()
+        for service, entry in entries:
+            store[service] = entry
+        return store
+
+    def copy(self) -> "EntryStore":
+        """Point-in-time copy for a snapshot; entries share their strings."""
+        copied = EntryStore()
+        copied._rows = dict(self._rows)
+        copied._services = list(self._services)
+        copied._users = list(self._users)
+        copied._passwords = list(self._passwords)
+        copied._modified = array("q", self._modified)
+        copied._extra = [extra and dict(extra) for extra in self._extra]
+        return copied
+
+    def __getitem__(self, service):
+        row = self._rows[service]
+        entry = {}
+        if self._users[row] is not None:
+            entry["user"] = self._users[row]
+        if self._passwords[row] is not None:
+            entry["pass"] = self._passwords[row]
+        if self._modified[row] != NO_TIME:
+            entry["modified"] = self._modified[row]
+        if self._extra[row]:
+            entry.update(self._extra[row])
+        return entry
+
+    def __setitem__(self, service, entry):
+        user = password = extra = None
+        modified = NO_TIME
+        for field, value in entry.items():
+            if field == "user" and type(value) is str:
+                user = value
+            elif field == "pass" and type(value) is str:
+                password = value
+            elif field == "modified" and type(value) is int and NO_TIME < value <= _INT64_MAX:
+                modified = value
+            else:
+                extra = extra or {}
+                extra[field] = value
+        row = self._rows.get(service)
+        if row is None:
+            self._rows[service] = len(self._services)
+            self._services.append(service)
+            self._users.append(user)
+            self._passwords.append(password)
+            self._modified.append(modified)
+            self._extra.append(extra)
+        else:
+            self._users[row] = user
+            self._passwords[row] = password
+            self._modified[row] = modified
+            self._extra[row] = extra
+
+    def __delitem__(self, service):
+        row = self._rows.pop(service)
+        last = len(self._services) - 1
+        columns = (self._services, self._users, self._passwords, self._modified, self._extra)
+        if row != last: # Move the last entry into the gap, keeping the columns dense
+            for column in columns:
+                column[row] = column[last]
+            self._rows[self._services[row]] = row
+        for column in columns:
+            column.pop()
+
+    def __iter__(self):
+        return iter(self._services)
+
+    def __len__(self):
+        return len(self._services)
+
+    def __contains__(self, service):
+        return service in self._rows
+
+    def username(self, service: str) -> str:
+        """Username without building the entry, for listing and search."""
+        return self._users[self._rows[service]]
+
+    def modified(self, service: str):
+        """Integer "modified" of the entry, or None, without building the entry."""
+        modified = self._modified[self._rows[service]]
+        return None if modified == NO_TIME else modified
+
+def _little_endian(column: array) -> bytes:
+    if sys.byteorder != "little":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+def _distinct(values: list) -> list:
+    distinct = dict.fromkeys(values)
+    distinct.pop(None, None)
+    return list(distinct)
+
+def _id_column(values: list, distinct: list, first: int, absent: int) -> array:
+    ids = dict(zip(distinct, range(first, first + len(distinct))))
+    ids[None] = absent
+    return array("I", map(ids.__getitem__, values))
+
+def encode(vault) -> bytes:
+    """Serializes an EntryStore, or any mapping of service -> entry, to a payload."""
+    store = vault if isinstance(vault, EntryStore) else EntryStore.from_entries(vault.items())
+    with tracing.span("records.encode", entries=len(store)) as s:
+        records = len(store)
+        # Passwords are kept per entry, in record order: hashing them all to share copies costs more than it saves
+        passwords = [password for password in store._passwords if password is not None]
+        users = _distinct(store._users)
+        extra = [None if fields is None else json.dumps(fields) for fields in store._extra]
+        extras = _distinct(extra)
+        first_user = records + len(passwords)
+        first_extra = first_user + len(users)
+        absent = first_extra + len(extras)
+
+        if len(passwords) == records:
+            pass_ids = array("I", range(records, first_user))
+        else:
+            pass_ids = array("I")
+            next_id = records
+            for password in store._passwords:
+                pass_ids.append(absent if password is None else next_id)
+                next_id += password is not None
+        user_ids = _id_column(store._users, users, first_user, absent)
+        extra_ids = _id_column(extra, extras, first_extra, absent)
+        strings = store._services + passwords + users + extras
+
+        text = "".join(strings).encode("utf-8")
+        header = array("I", (len(strings), records, len(text)))
+        offsets = array("I", accumulate(map(len, strings), initial=0))
+        payload = b"".join(_little_endian(part) if isinstance(part, array) else part for part in
+                           (MAGIC, header, offsets, text, user_ids, pass_ids, extra_ids, store._modified))
+        s.bytes_out = len(payload)
+    return payload
+
+def _column(typecode: str, payload: bytes, offset: int, count: int):
+    column = array(typecode)
+    end = offset + count * column.itemsize
+    if end > len(payload):
+        raise ValueError("Record payload is truncated.")
+    column.frombytes(payload[offset:end])
+    if sys.byteorder != "little":
+        column.byteswap()
+    return column, end
+
+def decode(payload: bytes) -> EntryStore:
+    """Parses a payload written by encode(). Raises ValueError if it is damaged."""
+    if not is_records(payload):
+        raise ValueError("Not a record payload.")
+    with tracing.span("records.decode", len(payload)):
+        header, offset = _column("I", payload, len(MAGIC), _HEADER_FIELDS)
+        string_count, record_count, text_size = header
+        offsets, offset = _column("I", payload, offset, string_count + 1)
+        text = payload[offset:offset + text_size].decode("utf-8")
+        offset += text_size
+        columns = []
+        for _ in range(3): # user, pass, extra
+            column, offset = _column("I", payload, offset, record_count)
+            columns.append(column)
+        modified, offset = _column("q", payload, offset, record_count)
+        if offset != len(payload) or offsets[-1] != len(text) or record_count > string_count:
+            raise ValueError("Record payload is corrupted.")
+
+        strings = [text[start:end] for start, end in zip(offsets, offsets[1:])]
+        services = strings[:record_count]
+        strings.append(None) # Id string_count: absent
+        try:
+            users, passwords, extra = [list(map(strings.__getitem__, column)) for column in columns]
+        except IndexError:
+            raise ValueError("Record payload is corrupted.")
+        store = EntryStore()
+        store._rows = dict(zip(services, range(record_count)))
+        if len(store._rows) != record_count:
+            raise ValueError("Record payload is corrupted.")
+        store._services = services
+        store._users = users
+        store._passwords = passwords
+        store._modified = modified
+        store._extra = [None if fields is None else json.loads(fields) for fields in extra]
+    return store
+
+def load_payload(payload: bytes) -> EntryStore:
+    """Decodes a record payload, or a JSON object of service -> entry from older saves."""
+    if is_records(payload):
+        return decode(payload)
+    with tracing.span("json.loads", len(payload)):
+        vault_data = json.loads(payload)
+    return EntryStore.from_entries(vault_data.items())
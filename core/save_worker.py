@@ -0,0 +1,74 @@
+import queue
+import threading
+
+class SaveWorker:
+    """
+    Write-behind persistence for the GUI. Snapshots and captured entries are taken
+    on the caller's thread; serialization, encryption and disk I/O run on one
+    background writer. Changes queued while a write is running are coalesced.
+    """
+    def __init__(self, store):
+        self.store = store
+        self.results = queue.Queue() # (ok, error) per finished write, drained by the GUI
+        self.busy = False
+        self._cond = threading.Condition()
+        self._snapshot = None
+        self._entries = {} # service -> entry, or None for a deletion
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def pending(self) -> int:
+        """Queue depth: writes waiting behind the one in progress."""
+        with self._cond:
+            return (self._snapshot is not None) + len(self._entries)
+
+    def submit(self, vault_data, service: str = None):
+        """Queues a single changed service, or a full snapshot when none is given."""
+        if service is None or self.store.compaction_due():
+            snapshot = self.store.take_snapshot(vault_data)
+            with self._cond:
+                self._snapshot = snapshot
+                self._entries.clear() # Already part of the snapshot
+                self._cond.notify()
+            return
+        entry = vault_data.get(service)
+        with self._cond:
+            self._entries.pop(service, None) # Keep only the latest state, in change order
+            self._entries[service] = entry
+            self._cond.notify()
+
+    def flush(self, timeout: float = None) -> bool:
+        """Blocks until everything queued is on disk. Returns False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self.busy and self._snapshot is None and not self._entries, timeout)
+
+    def close(self):
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or self._snapshot is not None or self._entries)
+                if self._closed:
+                    return
+                snapshot, entries = self._snapshot, self._entries
+                self._snapshot, self._entries = None, {}
+                self.busy = True
+            try:
+                if snapshot is not None:
+                    self.store.save_snapshot(snapshot)
+                for service, entry in entries.items():
+                    self.store.commit_entry(service, entry)
+                self.results.put((True, None))
+            except Exception as e:
+                self.results.put((False, e))
+            finally:
+                with self._cond:
+                    self.busy = False
+                    self._cond.notify_all()
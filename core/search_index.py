@@ -0,0 +1,185 @@
+import re
+from bisect import bisect_right
+
+SEPARATOR = "\x00" # never typed into a search box, so matches cannot span two terms
+DEFAULT_LIMIT = 200
+CANDIDATES = 4 # matches looked at per result slot before a scan gives up
+
+def _username(vault_data, service: str) -> str:
+    # LazyVault knows usernames from its index, without decrypting the record
+    if hasattr(vault_data, "username"):
+        return vault_data.username(service) or ""
+    return vault_data[service].get("user", "")
+
+class SearchIndex:
+    """
+    In-memory index over service names and usernames with prefix, substring and
+    fuzzy (ordered subsequence, starting with the term's first letter) matching.
+
+    All terms live in one lower-cased haystack string, so every lookup is a C-level
+    str.find or regex scan. Changes are appended and the old terms tombstoned; the
+    haystack is only repacked once most of it is dead. The index is built from
+    `vault_data` on the first search, so unlocking does not pay for it.
+    """
+    def __init__(self, vault_data=None):
+        self._vault_data = vault_data # built lazily from this
+        self._haystack = SEPARATOR
+        self._tail = [] # appended terms not yet joined into the haystack
+        self._length = len(self._haystack) # haystack plus tail
+        self._offsets = [] # start of each term
+        self._owners = [] # service owning each term, None once dead
+        self._terms_of = {} # service -> indexes into _offsets/_owners
+        self._dead = 0
+        self._initials = set() # first letter of every term ever indexed, a superset of the live ones
+
+    def __len__(self):
+        self._build()
+        return len(self._terms_of)
+
+    def _build(self):
+        if self._vault_data is None:
+            return
+        vault_data, self._vault_data = self._vault_data, None
+        for service in vault_data:
+            self._append(service, _username(vault_data, service))
+        self._flush()
+
+    def _append(self, service: str, user: str):
+        slots = []
+        for term in (service, user):
+            if not term:
+                continue
+            term = term.lower() + SEPARATOR
+            slots.append(len(self._offsets))
+            self._offsets.append(self._length)
+            self._owners.append(service)
+            self._tail.append(term)
+            self._length += len(term)
+            self._initials.add(term[0])
+        self._terms_of[service] = slots
+
+    def _flush(self):
+        if self._tail:
+            self._haystack += "".join(self._tail)
+            self._tail = []
+
+    def add(self, service: str, user: str = ""):
+        """Adds or replaces a service's terms."""
+        if self._vault_data is not None:
+            return # Not built yet; the build will read the current vault
+        self.remove(service)
+        self._append(service, user)
+
+    def remove(self, service: str):
+        if self._vault_data is not None:
+            return
+        for slot in self._terms_of.pop(service, ()):
+            self._owners[slot] = None
+            self._dead += 1
+        if self._dead > len(self._owners) // 2 and self._dead > 1024:
+            self._repack()
+
+    def sync(self, vault_data, service: str):
+        """Brings one service in line with vault_data after an add, modify or delete."""
+        if service in vault_data:
+            self.add(service, _username(vault_data, service))
+        else:
+            self.remove(service)
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT) -> list:
+        """
+        Returns matching services: prefix matches first, then substring matches.
+        Fuzzy matches are the fallback when neither finds anything.
+        An empty query matches nothing; callers show the full list instead.
+        """
+        query = query.strip().lower().replace(SEPARATOR, "")
+        if not query:
+            return []
+        self._build()
+        self._flush()
+        # One pass finds both kinds; a prefix-only pass is needed only when a broad
+        # query ran out of candidates before finding enough prefix matches
+        prefixes, substrings, complete = self._scan(query, limit)
+        if not complete and len(prefixes) < limit:
+            prefixes = self._scan_prefixes(query, limit)
+        results = dict.fromkeys(prefixes) # insertion-ordered set
+        for service in substrings:
+            if len(results) >= limit:
+                break
+            results[service] = None
+        if not results:
+            self._fuzzy(query, results, limit)
+        return list(results)
+
+    def _owner_at(self, position: int):
+        return self._owners[bisect_right(self._offsets, position) - 1]
+
+    def _scan(self, query: str, limit: int):
+        """Returns (prefix matches, other substring matches, whether the scan reached the end)."""
+        haystack = self._haystack
+        prefixes, substrings = {}, {}
+        budget = limit * CANDIDATES
+        position = haystack.find(query)
+        while position != -1:
+            owner = self._owner_at(position)
+            if owner is not None:
+                if haystack[position - 1] == SEPARATOR:
+                    prefixes[owner] = None
+                    substrings.pop(owner, None)
+                elif owner not in prefixes:
+                    substrings[owner] = None
+            budget -= 1
+            if budget == 0 or len(prefixes) >= limit:
+                return prefixes, substrings, False
+            position = haystack.find(query, position + 1)
+        return prefixes, substrings, True
+
+    def _scan_prefixes(self, query: str, limit: int) -> dict:
+        haystack = self._haystack
+        needle = SEPARATOR + query
+        prefixes = {}
+        position = haystack.find(needle)
+        while position != -1 and len(prefixes) < limit:
+            owner = self._owner_at(position + 1) # the needle starts on the previous term's separator
+            if owner is not None:
+                prefixes[owner] = None
+            position = haystack.find(needle, position + 1)
+        return prefixes
+
+    def _fuzzy(self, query: str, results: dict, limit: int):
+        if query[0] not in self._initials:
+            return # No term starts with that letter: skip the scan
+        # Anchored on the first letter of a term, so the regex can skip ahead with a literal search.
+        # Each gap stops at the first occurrence of the next letter, which never needs backtracking.
+        pattern = re.compile(SEPARATOR + re.escape(query[0]) +
+                             "".join(f"[^{SEPARATOR}{re.escape(char)}]*{re.escape(char)}" for char in query[1:]))
+        matches = []
+        for match in pattern.finditer(self._haystack):
+            owner = self._owner_at(match.start() + 1)
+            if owner is not None:
+                matches.append((match.end() - match.start(), owner))
+                if len(matches) >= limit * CANDIDATES:
+                    break # Loose queries match nearly everything; rank a bounded sample
+        # Tighter matches rank first
+        for _, owner in sorted(matches, key=lambda m: m[0]):
+            if len(results) >= limit:
+                break
+            results[owner] = None
+
+    def _repack(self):
+        self._flush()
+        live = []
+        for slot, owner in enumerate(self._owners):
+            if owner is not None:
+                start = self._offsets[slot]
+                live.append((owner, self._haystack[start:self._haystack.index(SEPARATOR, start) + 1]))
+        self._haystack = SEPARATOR
+        self._length = len(self._haystack)
+        self._offsets, self._owners, self._terms_of, self._dead = [], [], {}, 0
+        for owner, term in live:
+            self._terms_of.setdefault(owner, []).append(len(self._offsets))
+            self._offsets.append(self._length)
+            self._owners.append(owner)
+            self._tail.append(term)
+            self._length += len(term)
+        self._flush()
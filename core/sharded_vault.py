@@ -0,0 +1,234 @@
+import json
+import os
+import threading
+import zlib
+from collections.abc import MutableMapping
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from core import encryption
+from core import record_store
+from core import storage_compression
+from core import storage_handler
+from core import tracing
+
+MAGIC = b"PWM1" # manifest
+SHARD_MAGIC = b"PWH1"
+SHARD_COUNT = 16
+SHARDS_SUFFIX = ".shards" # directory of shard files, next to the manifest
+SHARD_SUFFIX = ".shard"
+WORKERS = min(SHARD_COUNT, os.cpu_count() or 1)
+READ_ATTEMPTS = 3
+
+HEADER_SIZE = len(MAGIC) + encryption.KEY_HEADER_SIZE
+
+# Manifest (the vault file itself):
+#   MAGIC | key header | sealed JSON {"shards": [shard file name or null, ...]}
+# Shard file, one per non-empty shard, in <vault>.shards/:
+#   SHARD_MAGIC | sealed, compressed record payload (core/record_store.py) of the services hashing to it
+# A shard is sealed with its index and the key header as associated data, and its file
+# is named after its nonce, so the manifest pins the exact version of every shard.
+# A save writes the changed shards under new names, then swaps the manifest in with
+# os.replace(): until the swap, the old manifest still points at the untouched old shards.
+
+def is_sharded(blob: bytes) -> bool:
+    return blob[:len(MAGIC)] == MAGIC
+
+def shard_of(service: str, shard_count: int) -> int:
+    return zlib.crc32(service.encode("utf-8")) % shard_count
+
+def shard_dir(path: str) -> str:
+    return path + SHARDS_SUFFIX
+
+def snapshot_id(manifest: bytes) -> bytes:
+    """Key header + manifest nonce; unique per save."""
+    return manifest[len(MAGIC):HEADER_SIZE + encryption.NONCE_SIZE]
+
+def _shard_ad(key_header: bytes, index: int) -> bytes:
+    return SHARD_MAGIC + key_header + index.to_bytes(4, "big")
+
+class ShardSnapshot(NamedTuple):
+    shards: dict # shard index -> EntryStore copy, for the shards to rewrite only
+    files: list # shard file names of the vault when the snapshot was taken
+    versions: dict # shard index -> change counter, to rebase safely after a background save
+
+class ShardedVault(MutableMapping):
+    """
+    Mapping of service -> entry kept as one EntryStore per shard. Changes mark their shard
+    dirty, so a save only re-encrypts and rewrites the shards that changed.
+    Like LazyVault, entries are returned as copies: write them back to change them.
+    """
+    def __init__(self, shards: list, files: list, session: encryption.SessionKey = None):
+        self.shards = shards
+        self.files = files # shard file name per shard, None while it has none
+        self.session = session # key the files are sealed under; None for a new vault
+        self.lock = threading.Lock() # held for changes, snapshots and rebases
+        self._dirty = set()
+        self._versions = {}
+
+    @classmethod
+    def from_entries(cls, entries, shard_count: int = SHARD_COUNT) -> "ShardedVault":
+        """A new vault holding `entries` (service, entry) pairs; every shard is dirty."""
+        vault = cls([record_store.EntryStore() for _ in range(shard_count)], [None] * shard_count)
+        for service, entry in entries:
+            vault.shards[shard_of(service, shard_count)][service] = entry
+        vault._dirty.update(range(shard_count))
+        return vault
+
+    def _shard(self, service) -> record_store.EntryStore:
+        return self.shards[shard_of(service, len(self.shards))]
+
+    def __getitem__(self, service):
+        return self._shard(service)[service]
+
+    def __setitem__(self, service, entry):
+        index = shard_of(service, len(self.shards))
+        with self.lock:
+            self.shards[index][service] = entry
+            self._changed(index)
+
+    def __delitem__(self, service):
+        index = shard_of(service, len(self.shards))
+        with self.lock:
+            del self.shards[index][service]
+            self._changed(index)
+
+    def _changed(self, index: int):
+        self._dirty.add(index)
+        self._versions[index] = self._versions.get(index, 0) + 1
+
+    def __iter__(self):
+        for shard in self.shards:
+            yield from shard
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+    def __contains__(self, service):
+        return isinstance(service, str) and service in self._shard(service)
+
+    def username(self, service: str) -> str:
+        return self._shard(service).username(service)
+
+    def modified(self, service: str):
+        return self._shard(service).modified(service)
+
+    def copy(self) -> "ShardedVault":
+        """Point-in-time copy of every shard, for a reader on another thread. Never saved."""
+        with self.lock:
+            return ShardedVault([shard.copy() for shard in self.shards], list(self.files), self.session)
+
+    def freeze(self, everything: bool = False) -> ShardSnapshot:
+        """Copies the dirty shards, or all of them, for a snapshot; clean ones stay as they are on disk."""
+        with self.lock:
+            indexes = range(len(self.shards)) if everything else sorted(self._dirty)
+            return ShardSnapshot({i: self.shards[i].copy() for i in indexes}, list(self.files),
+                                 dict(self._versions))
+
+    def rebase(self, snapshot: ShardSnapshot, files: list, session: encryption.SessionKey):
+        """
+        Points the vault at freshly written shard files. Shards changed after
+        `snapshot` was taken stay dirty for the next save.
+        """
+        with self.lock:
+            self.session = session
+            for index in snapshot.shards:
+                self.files[index] = files[index]
+                if self._versions.get(index, 0) == snapshot.versions.get(index, 0):
+                    self._dirty.discard(index)
+
+def _pool_map(func, items: list, workers: int) -> list:
+    if workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(workers, len(items)), thread_name_prefix="shard") as pool:
+        return list(pool.map(func, items))
+
+def _shard_name(index: int, sealed: bytes) -> str:
+    return f"{index:03d}-{sealed[:encryption.NONCE_SIZE].hex()}{SHARD_SUFFIX}"
+
+def _load_shard(directory: str, session: encryption.SessionKey, index: int, name: str) -> record_store.EntryStore:
+    if name is None:
+        return record_store.EntryStore()
+    with tracing.span("shard.load", shard=index):
+        with tracing.span("storage.read") as s, open(os.path.join(directory, name), "rb") as f:
+            data = f.read()
+            s.bytes_out = len(data)
+        sealed = data[len(SHARD_MAGIC):]
+        if data[:len(SHARD_MAGIC)] != SHARD_MAGIC or name != _shard_name(index, sealed):
+            raise ValueError(f"Shard {name} does not belong to this vault.")
+        payload = storage_compression.decompress_bytes(session.open(sealed, _shard_ad(session.header, index)))
+        return record_store.load_payload(payload)
+
+def read(path: str, password: str, session: encryption.SessionKey = None, workers: int = WORKERS):
+    """
+    Reads the manifest, then decrypts and decompresses every shard on a thread pool.
+    Returns (ShardedVault, session, snapshot_id). A `session` for the same KDF and salt skips the KDF.
+    """
+    for attempt in range(READ_ATTEMPTS):
+        manifest = storage_handler.read_vault(path)
+        if not is_sharded(manifest) or len(manifest) < HEADER_SIZE:
+            raise ValueError("Not a sharded vault.")
+        key_header = manifest[len(MAGIC):HEADER_SIZE]
+        session = encryption.resume_session(password, key_header, session)
+        files = json.loads(session.open(manifest[HEADER_SIZE:], MAGIC + key_header))["shards"]
+        directory = shard_dir(path)
+        try:
+            shards = _pool_map(lambda item: _load_shard(directory, session, *item), list(enumerate(files)), workers)
+        except FileNotFoundError:
+            if attempt == READ_ATTEMPTS - 1:
+                raise
+            continue # A writer swapped in a new manifest and removed the old shards meanwhile
+        return ShardedVault(shards, files, session), session, snapshot_id(manifest)
+
+def write(snapshot: ShardSnapshot, session: encryption.SessionKey, path: str, codec: str = None,
+          level: int = None, workers: int = WORKERS):
+    """
+    Writes the snapshot's shards as new files, encoding them on a thread pool, and stages
+    the manifest next to `path`. Returns (temp_file, files, snapshot_id); commit with
+    storage_handler.commit_vault(), then remove_stale().
+    """
+    directory = shard_dir(path)
+    os.makedirs(directory, exist_ok=True)
+
+    def encode(item) -> str:
+        index, entries = item
+        if not entries:
+            return None
+        with tracing.span("shard.encode", shard=index):
+            compressed = storage_compression.compress_bytes(record_store.encode(entries), codec, level)
+            sealed = session.seal(compressed, _shard_ad(session.header, index))
+            name = _shard_name(index, sealed)
+            # A fresh name: nothing references the file until the manifest swap
+            with tracing.span("storage.write") as s, open(os.path.join(directory, name), "wb") as f:
+                s.bytes_in = f.write(SHARD_MAGIC + sealed)
+        return name
+
+    files = list(snapshot.files)
+    items = sorted(snapshot.shards.items())
+    for (index, _), name in zip(items, _pool_map(encode, items, workers)):
+        files[index] = name
+    manifest = MAGIC + session.header + session.seal(json.dumps({"shards": files}).encode("utf-8"),
+                                                     MAGIC + session.header)
+    return storage_handler.stage_vault(manifest, path), files, snapshot_id(manifest)
+
+def remove_stale(path: str, files: list):
+    """Deletes the shard files the committed manifest no longer references, including ones left by a crash."""
+    keep = set(files)
+    try:
+        names = os.listdir(shard_dir(path))
+    except FileNotFoundError:
+        return
+    for name in names:
+        if name.endswith(SHARD_SUFFIX) and name not in keep:
+            try:
+                os.remove(os.path.join(shard_dir(path), name))
+            except FileNotFoundError:
+                pass
+
+def remove_shards(path: str):
+    """Deletes every shard file, once the vault has been rewritten in another format."""
+    remove_stale(path, [])
+    try:
+        os.rmdir(shard_dir(path))
+    except OSError:
+        pass
@@ -1,7 +1,150 @@
+import bz2
 import gzip
+import lzma
+import zlib
+from typing import Callable, NamedTuple
 
-def compress_data(data_str: str) -> bytes:
-    return gzip.compress(data_str.encode('utf-8'))
+from core import tracing
+
+MAGIC = b"PWZ"
+GZIP_MAGIC = b"\x1f\x8b" # Legacy vaults: bare gzip, no codec header
+
+class _Passthrough:
+    """Streaming stand-in for the "none" codec."""
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    def decompress(self, data: bytes) -> bytes:
+        return data
+
+    def flush(self) -> bytes:
+        return b""
+
+class Codec(NamedTuple):
+    name: str
+    codec_id: int
+    default_level: int
+    compress: Callable[[bytes, int], bytes]
+    decompress: Callable[[bytes], bytes]
+    compressor: Callable[[int], object] # streaming: .compress(data) and .flush()
+    decompressor: Callable[[], object] # streaming: .decompress(data)
+
+_CODECS_BY_NAME = {}
+_CODECS_BY_ID = {}
+
+def register_codec(codec: Codec):
+    """Makes a codec available by name for writing and by id for auto-detection."""
+    _CODECS_BY_NAME[codec.name] = codec
+    _CODECS_BY_ID[codec.codec_id] = codec
+
+register_codec(Codec("none", 0, 0, lambda data, level: data, lambda data: data,
+                     lambda level: _Passthrough(), _Passthrough))
+register_codec(Codec("zlib", 1, 6, lambda data, level: zlib.compress(data, level), zlib.decompress,
+                     lambda level: zlib.compressobj(level), zlib.decompressobj))
+register_codec(Codec("bz2", 2, 9, lambda data, level: bz2.compress(data, level), bz2.decompress,
+                     bz2.BZ2Compressor, bz2.BZ2Decompressor))
+register_codec(Codec("lzma", 3, 6, lambda data, level: lzma.compress(data, preset=level), lzma.decompress,
+                     lambda level: lzma.LZMACompressor(preset=level), lzma.LZMADecompressor))
+register_codec(Codec("gzip", 4, 9, lambda data, level: gzip.compress(data, level), gzip.decompress,
+                     lambda level: zlib.compressobj(level, wbits=31), lambda: zlib.decompressobj(wbits=31)))
+
+def available_codecs() -> list:
+    return list(_CODECS_BY_NAME)
+
+def choose_codec(size: int):
+    """
+    Picks (codec name, level) from the payload size. Tiny vaults are not worth
+    compressing; large ones favour speed, since every snapshot recompresses them.
+    """
+    if size < 512:
+        return "none", 0
+    if size < 4 * 1024 * 1024:
+        return "zlib", 6
+    return "zlib", 1
+
+def compress_bytes(data: bytes, codec: str = None, level: int = None) -> bytes:
+    """
+    Compresses with the given codec, or the one choose_codec() picks,
+    and prefixes the result with the codec header. A `level` overrides the picked one.
+    """
+    if codec is None:
+        codec, chosen = choose_codec(len(data))
+        level = chosen if level is None else level
+    selected = _CODECS_BY_NAME[codec]
+    if level is None:
+        level = selected.default_level
+    with tracing.span("compress", len(data), codec=codec) as s:
+        compressed = MAGIC + bytes([selected.codec_id]) + selected.compress(data, level)
+        s.bytes_out = len(compressed)
+    return compressed
+
+def decompress_bytes(compressed_data: bytes) -> bytes:
+    """Auto-detects the codec from the header; bare gzip is read as a legacy vault."""
+    if compressed_data[:len(GZIP_MAGIC)] == GZIP_MAGIC:
+        codec, payload = _CODECS_BY_NAME["gzip"], compressed_data
+    elif compressed_data[:len(MAGIC)] != MAGIC:
+        raise ValueError("Unknown compression format.")
+    else:
+        codec_id = compressed_data[len(MAGIC)]
+        if codec_id not in _CODECS_BY_ID:
+            raise ValueError(f"Unknown compression codec id {codec_id}.")
+        codec, payload = _CODECS_BY_ID[codec_id], compressed_data[len(MAGIC) + 1:]
+    with tracing.span("decompress", len(compressed_data), codec=codec.name) as s:
+        data = codec.decompress(payload)
+        s.bytes_out = len(data)
+    return data
+
+def codec_of(compressed_data: bytes) -> str:
+    if compressed_data[:len(GZIP_MAGIC)] == GZIP_MAGIC:
+        return "gzip"
+    return _CODECS_BY_ID[compressed_data[len(MAGIC)]].name
+
+def compress_data(data_str: str, codec: str = None, level: int = None) -> bytes:
+    return compress_bytes(data_str.encode('utf-8'), codec, level)
 
 def decompress_data(compressed_data: bytes) -> str:
-    return gzip.decompress(compressed_data).decode('utf-8')
\ No newline at end of file
+    return decompress_bytes(compressed_data).decode('utf-8')
+
+def compress_stream(chunks, codec: str = None, level: int = None, size_hint: int = 0):
+    """
+    Streaming counterpart of compress_bytes: yields the codec header, then compressed
+    output as the input chunks arrive. size_hint feeds choose_codec() when codec is None.
+    """
+    if codec is None:
+        codec, chosen = choose_codec(size_hint)
+        level = chosen if level is None else level
+    selected = _CODECS_BY_NAME[codec]
+    compressor = selected.compressor(selected.default_level if level is None else level)
+    yield MAGIC + bytes([selected.codec_id])
+    for chunk in chunks:
+        with tracing.span("compress", len(chunk), codec=codec) as s:
+            out = compressor.compress(chunk)
+            s.bytes_out = len(out)
+        if out:
+            yield out
+    with tracing.span("compress", codec=codec) as s:
+        out = compressor.flush()
+        s.bytes_out = len(out)
+    yield out
+
+def decompress_stream(chunks):
+    """Streaming counterpart of decompress_bytes, for tagged payloads."""
+    decompressor = None
+    header = b""
+    for chunk in chunks:
+        if decompressor is None:
+            header += chunk
+            if len(header) < len(MAGIC) + 1:
+                continue
+            if header[:len(MAGIC)] != MAGIC or header[len(MAGIC)] not in _CODECS_BY_ID:
+                raise ValueError("Unknown compression format.")
+            codec = _CODECS_BY_ID[header[len(MAGIC)]]
+            decompressor = codec.decompressor()
+            chunk = header[len(MAGIC) + 1:]
+        with tracing.span("decompress", len(chunk), codec=codec.name) as s:
+            out = decompressor.decompress(chunk)
+            s.bytes_out = len(out)
+        if out:
+            yield out
+    if decompressor is None:
+        raise ValueError("Compressed stream is truncated.")
@@ -1,15 +1,81 @@
+import json
+import mmap
 import os
+from contextlib import contextmanager
+
+from core import tracing
 
 VAULT_FILE = "vault.pwmanager"
+KDF_SETTINGS_SUFFIX = ".kdf.json" # desired KDF for the vault, next to it
+FORMAT_SETTINGS_SUFFIX = ".format.json" # desired storage format for the vault, next to it
+
+class SettingsError(ValueError):
+    """A settings file next to the vault is malformed or holds unsafe values."""
 
-def read_vault() -> bytes:
-    if not os.path.exists(VAULT_FILE):
+def read_vault(path: str = None) -> bytes:
+    path = path or VAULT_FILE
+    if not os.path.exists(path):
         return b""
-    with open(VAULT_FILE, "rb") as f:
-        return f.read()
-
-def write_vault(data: bytes):
-    temp_file = VAULT_FILE + ".tmp"
-    with open(temp_file, "wb") as f:
-        f.write(data)
-    os.replace(temp_file, VAULT_FILE) # Atomic swap
\ No newline at end of file
+    with tracing.span("storage.read") as s, open(path, "rb") as f:
+        data = f.read()
+        s.bytes_out = len(data)
+    return data
+
+@contextmanager
+def map_vault(path: str = None):
+    """Memory-maps the vault read-only, so chunks are paged in only as they are read."""
+    with open(path or VAULT_FILE, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+def stage_vault(data, path: str = None) -> str:
+    """
+    Writes bytes, or an iterable of byte chunks, next to the vault without replacing it.
+    Returns the temp file for commit_vault().
+    """
+    temp_file = (path or VAULT_FILE) + ".tmp"
+    with tracing.span("storage.write") as s, open(temp_file, "wb") as f:
+        if isinstance(data, (bytes, bytearray)):
+            s.bytes_in = f.write(data)
+        else:
+            # Chunks are produced lazily here, so their stages nest inside this span
+            for chunk in data:
+                s.bytes_in += f.write(chunk)
+    return temp_file
+
+def commit_vault(temp_file: str, path: str = None):
+    with tracing.span("storage.commit"):
+        os.replace(temp_file, path or VAULT_FILE) # Atomic swap
+
+def write_vault(data: bytes, path: str = None):
+    commit_vault(stage_vault(data, path), path)
+
+def _read_settings(suffix: str, path: str = None):
+    settings_file = (path or VAULT_FILE) + suffix
+    try:
+        with open(settings_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        raise SettingsError(f"{settings_file} is not valid JSON ({e}). Fix or delete it.")
+
+def _write_settings(settings: dict, suffix: str, path: str = None):
+    settings_file = (path or VAULT_FILE) + suffix
+    with open(settings_file + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(settings, f, indent=2)
+    os.replace(settings_file + ".tmp", settings_file)
+
+def read_kdf_settings(path: str = None):
+    """Returns the saved KDF settings of the vault at `path`, or None. Raises SettingsError if unreadable."""
+    return _read_settings(KDF_SETTINGS_SUFFIX, path)
+
+def write_kdf_settings(settings: dict, path: str = None):
+    _write_settings(settings, KDF_SETTINGS_SUFFIX, path)
+
+def read_format_settings(path: str = None):
+    """Returns the saved format settings of the vault at `path`, or None. Raises SettingsError if unreadable."""
+    return _read_settings(FORMAT_SETTINGS_SUFFIX, path)
+
+def write_format_settings(settings: dict, path: str = None):
+    _write_settings(settings, FORMAT_SETTINGS_SUFFIX, path)
@@ -0,0 +1,184 @@
+import codecs
+import json
+import os
+import re
+import struct
+
+from core import encryption
+from core import storage_compression
+from core import storage_handler
+from core import tracing
+
+MAGIC = b"PWS1"
+CHUNK_SIZE = 64 * 1024
+
+_CHUNK_SIZE = struct.Struct(">I")
+_TAG_SIZE = 16
+_SALT_OFFSET = len(MAGIC) + encryption.KEY_HEADER_SIZE
+_PREFIX_OFFSET = _SALT_OFFSET + encryption.STREAM_SALT_SIZE
+_CHUNK_SIZE_OFFSET = _PREFIX_OFFSET + encryption.STREAM_PREFIX_SIZE
+HEADER_SIZE = _CHUNK_SIZE_OFFSET + _CHUNK_SIZE.size
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+# File layout:
+#   MAGIC | key header | stream salt | nonce prefix | chunk size | chunk 0 | chunk 1 | ... | final chunk
+# The key header records the KDF and salt (see encryption.pack_key_header).
+# The plaintext is the compressed JSON vault, cut into chunk-size pieces and sealed with
+# SessionKey.seal_stream() under a subkey of the stream salt (SessionKey.stream_key), so
+# saves never share a key and the short nonce prefix cannot collide across them.
+# Every chunk takes the header as associated data.
+# Reading and writing both stream, so peak memory does not grow with the file size.
+
+def is_stream(blob: bytes) -> bool:
+    return blob[:len(MAGIC)] == MAGIC
+
+def snapshot_id(header: bytes) -> bytes:
+    """Key header + stream salt + nonce prefix. Both are random per save, like the legacy nonce."""
+    return header[len(MAGIC):_CHUNK_SIZE_OFFSET]
+
+def _json_pieces(vault):
+    # Serializes one entry at a time, so a LazyVault is never decrypted all at once
+    yield "{"
+    separator = ""
+    for service in vault:
+        yield separator + json.dumps(service) + ": " + json.dumps(vault[service])
+        separator = ", "
+    yield "}"
+
+def _batched_utf8(pieces, size: int):
+    batch = []
+    length = 0
+    for piece in pieces:
+        batch.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield "".join(batch).encode("utf-8")
+            batch, length = [], 0
+    if batch:
+        yield "".join(batch).encode("utf-8")
+
+def _rechunk(pieces, size: int):
+    """Regroups a byte stream into pieces of exactly `size` bytes (the last may be shorter)."""
+    buffer = bytearray()
+    for piece in pieces:
+        buffer += piece
+        while len(buffer) >= size:
+            yield bytes(buffer[:size])
+            del buffer[:size]
+    if buffer:
+        yield bytes(buffer)
+
+def write(vault, session: encryption.SessionKey, path: str = None, codec: str = None, level: int = None,
+          chunk_size: int = CHUNK_SIZE):
+    """
+    Streams `vault` into a staged temp file next to `path`.
+    Returns (temp_file, snapshot_id); commit with storage_handler.commit_vault().
+    """
+    salt = os.urandom(encryption.STREAM_SALT_SIZE)
+    prefix = os.urandom(encryption.STREAM_PREFIX_SIZE)
+    header = MAGIC + session.header + salt + prefix + _CHUNK_SIZE.pack(chunk_size)
+    text = tracing.traced_iter("json.dumps", _batched_utf8(_json_pieces(vault), chunk_size))
+    compressed = storage_compression.compress_stream(text, codec, level, size_hint=len(vault) * 100)
+    sealed = session.stream_key(salt).seal_stream(_rechunk(compressed, chunk_size), prefix, header)
+
+    def file_chunks():
+        yield header
+        yield from sealed
+
+    return storage_handler.stage_vault(file_chunks(), path), snapshot_id(header)
+
+def iter_json_object(text_chunks):
+    """
+    Incrementally parses a top-level JSON object from an iterable of text chunks,
+    yielding (key, value) pairs without holding the whole document.
+    """
+    scan = json.JSONDecoder().scan_once
+    chunks = iter(text_chunks)
+    buf = ""
+    pos = 0
+    eof = False
+
+    def more() -> bool:
+        nonlocal buf, pos, eof
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+            return False
+        buf = buf[pos:] + chunk
+        pos = 0
+        return True
+
+    def token() -> str:
+        """Next non-whitespace character, without consuming it ("" at the end)."""
+        nonlocal pos
+        while True:
+            pos = _WHITESPACE.match(buf, pos).end()
+            if pos < len(buf) or not more():
+                return buf[pos:pos + 1]
+
+    def value():
+        nonlocal pos
+        while True:
+            try:
+                obj, end = scan(buf, pos)
+                # A value ending exactly at the buffer edge might continue in the next chunk
+                if end < len(buf) or eof:
+                    pos = end
+                    return obj
+            except (StopIteration, json.JSONDecodeError):
+                if eof:
+                    raise ValueError("Vault payload is truncated or malformed.")
+            more()
+
+    def expect(chars: str) -> str:
+        nonlocal pos
+        char = token()
+        if not char or char not in chars:
+            raise ValueError(f"Expected one of {chars!r} in vault payload.")
+        pos += 1
+        return char
+
+    expect("{")
+    if token() == "}":
+        pos += 1
+    else:
+        while True:
+            if token() != '"':
+                raise ValueError("Vault keys must be strings.")
+            key = value()
+            expect(":")
+            token()
+            yield key, value()
+            if expect(",}") == "}":
+                break
+    if token():
+        raise ValueError("Trailing data after vault payload.")
+
+def read(path: str, password: str, session: encryption.SessionKey = None):
+    """
+    Memory-maps a stream vault and decrypts, decompresses and parses it chunk by chunk.
+    Returns (vault_data, session, snapshot_id). Truncation or reordering raises.
+    A `session` for the same KDF and salt skips the KDF.
+    """
+    with storage_handler.map_vault(path) as mapped:
+        header = mapped[:HEADER_SIZE]
+        if not is_stream(header) or len(header) < HEADER_SIZE:
+            raise ValueError("Not a stream vault.")
+        key_header = header[len(MAGIC):_SALT_OFFSET]
+        salt = header[_SALT_OFFSET:_PREFIX_OFFSET]
+        prefix = header[_PREFIX_OFFSET:_CHUNK_SIZE_OFFSET]
+        (chunk_size,) = _CHUNK_SIZE.unpack_from(header, _CHUNK_SIZE_OFFSET)
+        session = encryption.resume_session(password, key_header, session)
+
+        sealed_size = chunk_size + _TAG_SIZE
+        sealed = (mapped[offset:offset + sealed_size] for offset in range(HEADER_SIZE, len(mapped), sealed_size))
+        sealed = tracing.traced_iter("storage.read", sealed) # Copying out of the map pages the file in
+        compressed = session.stream_key(salt).open_stream(sealed, prefix, header)
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        text = (decoder.decode(piece) for piece in storage_compression.decompress_stream(compressed))
+        # Pulls the chunks through the stages above; their spans nest inside this one
+        with tracing.span("json.loads", len(mapped) - HEADER_SIZE):
+            vault_data = dict(iter_json_object(text))
+        if decoder.decode(b"", final=True):
+            raise ValueError("Trailing data after vault payload.")
+    return vault_data, session, snapshot_id(header)
@@ -0,0 +1,217 @@
+"""
+Lightweight tracing of the load and save pipelines.
+
+Each stage wraps its work in a span:
+
+    with tracing.span("compress", len(data), codec=name) as s:
+        out = compress(data)
+        s.bytes_out = len(out)
+
+A span records its duration, its own time without nested spans, bytes in and out
+and, when allocation tracking is on, the net and peak memory allocated while it ran.
+While no tracer is enabled, span() returns one shared no-op object, so instrumented
+code pays only a function call and an empty `with` per stage. Per-record hot paths
+check `tracing.active_tracer is None` first and skip even that.
+
+Spans never stay open across a `yield`: generator stages wrap each step instead,
+or are wrapped from outside with traced_iter().
+
+Enabled from the command line with --profile (per-stage breakdown on exit) and
+--trace FILE (Chrome trace JSON for chrome://tracing or https://ui.perfetto.dev).
+"""
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+active_tracer = None # the enabled Tracer, or None
+
+class _NullSpan:
+    """Returned by span() while tracing is off; ignores everything."""
+    __slots__ = ()
+    bytes_in = bytes_out = property(lambda self: 0, lambda self, value: None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+_END = object()
+
+class Span:
+    __slots__ = ("tracer", "name", "bytes_in", "bytes_out", "args", "start", "child_ns", "mem_start", "peak_seen")
+
+    def __init__(self, tracer, name: str, bytes_in: int, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.bytes_in = bytes_in
+        self.bytes_out = 0
+        self.args = args
+        self.child_ns = 0
+
+    def __enter__(self):
+        stack = self.tracer._stack()
+        if self.tracer.allocations:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1].peak_seen = max(stack[-1].peak_seen, peak) # reset_peak() below would lose it
+            tracemalloc.reset_peak()
+            self.mem_start = self.peak_seen = current
+        stack.append(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        stack = self.tracer._stack()
+        stack.pop()
+        duration = end - self.start
+        alloc = peak = 0
+        if self.tracer.allocations:
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(self.peak_seen, peak)
+            alloc, peak = current - self.mem_start, peak - self.mem_start
+        if stack:
+            stack[-1].child_ns += duration
+            if self.tracer.allocations:
+                stack[-1].peak_seen = max(stack[-1].peak_seen, self.mem_start + peak)
+        self.tracer._record(self, duration, alloc, peak)
+        return False
+
+class Tracer:
+    """
+    Collects spans from every thread. Per-stage totals are always kept; individual
+    events only with `keep_events`, for write_chrome_trace().
+    Allocation figures come from tracemalloc, which is process-wide and slows every
+    stage down, so spans overlapping on other threads share them.
+    """
+    def __init__(self, allocations: bool = True, keep_events: bool = False):
+        self.allocations = allocations
+        self.keep_events = keep_events
+        self.origin = time.perf_counter_ns()
+        self.stages = {} # name -> [calls, total ns, self ns, bytes in, bytes out, alloc, peak]
+        self.events = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self) -> list:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _record(self, span: Span, duration: int, alloc: int, peak: int):
+        with self._lock:
+            stage = self.stages.get(span.name)
+            if stage is None:
+                stage = self.stages[span.name] = [0, 0, 0, 0, 0, 0, 0]
+            stage[0] += 1
+            stage[1] += duration
+            stage[2] += duration - span.child_ns
+            stage[3] += span.bytes_in
+            stage[4] += span.bytes_out
+            stage[5] += alloc
+            stage[6] = max(stage[6], peak)
+            if self.keep_events:
+                self.events.append((span.name, threading.get_ident(), span.start, duration,
+                                    span.bytes_in, span.bytes_out, alloc, peak, span.args))
+
+    def report(self) -> str:
+        """Per-stage breakdown, most expensive own time first."""
+        lines = [f"{'Stage':<16} {'Calls':>7} {'Total ms':>10} {'Self ms':>10} {'In KiB':>10} "
+                 f"{'Out KiB':>10} {'Alloc KiB':>10} {'Peak KiB':>10}"]
+        with self._lock:
+            stages = sorted(self.stages.items(), key=lambda item: item[1][2], reverse=True)
+        for name, (calls, total, own, bytes_in, bytes_out, alloc, peak) in stages:
+            memory = f"{alloc / 1024:>10.1f} {peak / 1024:>10.1f}" if self.allocations else f"{'-':>10} {'-':>10}"
+            lines.append(f"{name:<16} {calls:>7} {total / 1e6:>10.2f} {own / 1e6:>10.2f} "
+                         f"{bytes_in / 1024:>10.1f} {bytes_out / 1024:>10.1f} {memory}")
+        if not stages:
+            lines.append("(no stages recorded)")
+        return "\n".join(lines)
+
+    def write_chrome_trace(self, path: str):
+        """Writes the events in the Chrome trace event format ("X" complete events, in µs)."""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self.events)
+        trace = []
+        for name, tid, start, duration, bytes_in, bytes_out, alloc, peak, args in events:
+            details = dict(args, bytes_in=bytes_in, bytes_out=bytes_out)
+            if self.allocations:
+                details.update(alloc_bytes=alloc, peak_bytes=peak)
+            trace.append({"name": name, "cat": name.split(".")[0], "ph": "X", "pid": pid, "tid": tid,
+                          "ts": (start - self.origin) / 1000, "dur": duration / 1000, "args": details})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+
+def span(name: str, bytes_in: int = 0, **args):
+    tracer = active_tracer
+    if tracer is None:
+        return _NULL_SPAN
+    return Span(tracer, name, bytes_in, args)
+
+def traced_iter(name: str, chunks):
+    """
+    Times every pull from `chunks` as a `name` span, counting the bytes it yields.
+    Returns `chunks` untouched while tracing is off.
+    """
+    if active_tracer is None:
+        return chunks
+    return _traced_iter(name, iter(chunks))
+
+def _traced_iter(name: str, iterator):
+    while True:
+        with span(name) as s:
+            chunk = next(iterator, _END)
+            if chunk is not _END:
+                s.bytes_out = len(chunk)
+        if chunk is _END:
+            return
+        yield chunk
+
+def enable(allocations: bool = True, keep_events: bool = False) -> Tracer:
+    """Starts tracing in every thread. Returns the new tracer."""
+    global active_tracer
+    tracer = Tracer(allocations, keep_events)
+    if allocations and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    active_tracer = tracer
+    return tracer
+
+def disable():
+    global active_tracer
+    if active_tracer is not None and active_tracer.allocations:
+        tracemalloc.stop()
+    active_tracer = None
+
+def add_arguments(parser):
+    """The --profile/--trace options shared by the CLI and the GUI launcher."""
+    parser.add_argument("--profile", action="store_true",
+                        help="print a per-stage breakdown of the load and save pipelines on exit")
+    parser.add_argument("--trace", metavar="FILE", help="write a Chrome trace (JSON) of every stage to FILE")
+    parser.add_argument("--no-alloc-tracking", dest="track_allocations", action="store_false",
+                        help="skip allocation tracking, which slows every stage down")
+
+@contextmanager
+def profiling(args, out=None):
+    """Traces the enclosed block when --profile or --trace was given, then reports."""
+    if not args.profile and not args.trace:
+        yield None
+        return
+    tracer = enable(args.track_allocations, keep_events=args.trace is not None)
+    try:
+        yield tracer
+    finally:
+        disable()
+        out = out or sys.stderr # The report must not mix with output meant for scripts
+        if args.profile:
+            print(tracer.report(), file=out)
+        if args.trace:
+            tracer.write_chrome_trace(args.trace)
+            print(f"Trace written to {args.trace}", file=out)
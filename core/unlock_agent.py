@@ -0,0 +1,307 @@
+import asyncio
+import json
+import os
+import socket
+import struct
+import tempfile
+import time
+from collections import deque
+
+from core import journal
+from core import search_index
+
+DEFAULT_IDLE_TIMEOUT = 15 * 60 # seconds without a request before the agent locks itself
+LATENCY_SAMPLES = 1024 # recent latencies kept per operation for the stats
+MAX_REQUEST = 64 * 1024
+
+# Protocol: one JSON object per line in each direction.
+#   request:  {"op": "get", "service": "github"}
+#   response: {"ok": true, "result": {...}}  or  {"ok": false, "error": "..."}
+# Operations: ping, get, list, search, stats, lock.
+
+class AgentError(Exception):
+    pass
+
+def socket_path() -> str:
+    """Per-user socket inside a private (0700) directory, like ssh-agent's."""
+    base = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(base, f"pwmanager-agent-{os.getuid()}", "agent.sock")
+
+def agent_running(path: str = None) -> bool:
+    try:
+        with AgentClient(path, timeout=1.0) as client:
+            client.request("ping")
+        return True
+    except (AgentError, OSError, ValueError):
+        return False
+
+class UnlockAgent:
+    """
+    Keeps an unlocked vault in memory and serves lookups to local clients over a
+    Unix socket, so scripts pay the key derivation once instead of per run.
+
+    `store` should be read-only (VaultStore(read_only=True)): the agent shares the
+    vault with the CLI and GUI and picks up their changes, re-reading the vault with
+    the key it holds whenever the files change. It locks itself, dropping the vault
+    and key, after `idle_timeout` seconds without a request or on a "lock" request.
+    """
+    def __init__(self, store, vault_data, path: str = None, idle_timeout: float = DEFAULT_IDLE_TIMEOUT):
+        self.store = store
+        self.vault = vault_data
+        self.search = search_index.SearchIndex(vault_data)
+        self.path = path or socket_path()
+        self.idle_timeout = idle_timeout
+        self.started = self.last_request = time.monotonic()
+        self.latencies = {} # op -> recent latencies in ms
+        self.counts = {} # op -> requests served
+        self.writers = set()
+        self.lock_reason = None
+        self.stopped = None # asyncio.Event, created by serve()
+        self.listener = None # listening socket, created by bind()
+        self.disk_state = self._disk_state()
+        self.handlers = {
+            "ping": self.op_ping,
+            "get": self.op_get,
+            "list": self.op_list,
+            "search": self.op_search,
+            "stats": self.op_stats,
+            "lock": self.op_lock,
+        }
+
+    def bind(self):
+        """
+        Creates the listening socket, 0600. Clients can connect as soon as this returns;
+        they are queued until serve() runs, which may be in a process forked after this.
+        """
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        os.chmod(directory, 0o700)
+        if os.path.exists(self.path):
+            if agent_running(self.path):
+                raise AgentError(f"An agent is already listening on {self.path}.")
+            os.unlink(self.path) # Left behind by an agent that was killed
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            listener.bind(self.path)
+            listener.listen()
+        except OSError:
+            listener.close()
+            raise
+        finally:
+            os.umask(old_umask)
+        self.listener = listener
+
+    async def serve(self):
+        """Serves until locked, binding the socket first unless bind() was called. The socket is removed on exit."""
+        self.stopped = asyncio.Event()
+        if self.listener is None:
+            self.bind()
+        server = await asyncio.start_unix_server(self.handle_client, sock=self.listener, limit=MAX_REQUEST)
+
+        watchdog = asyncio.create_task(self.watch_idle())
+        try:
+            await self.stopped.wait()
+        finally:
+            watchdog.cancel()
+            server.close()
+            for writer in list(self.writers):
+                writer.close()
+            await server.wait_closed()
+            self.lock(self.lock_reason or "shutdown")
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+    def stop(self, reason: str):
+        if self.lock_reason is None:
+            self.lock_reason = reason
+        self.stopped.set()
+
+    def lock(self, reason: str):
+        """Drops every reference to the vault and key held by the agent."""
+        self.lock_reason = reason
+        self.vault = self.search = None
+        self.store.vault = self.store.session = self.store.journal = None
+
+    async def watch_idle(self):
+        while True:
+            remaining = self.last_request + self.idle_timeout - time.monotonic()
+            if remaining <= 0:
+                self.stop("idle timeout")
+                return
+            await asyncio.sleep(remaining)
+
+    async def handle_client(self, reader, writer):
+        if not self._same_user(writer):
+            writer.close()
+            return
+        self.writers.add(writer)
+        try:
+            while not self.stopped.is_set():
+                try:
+                    line = await reader.readline()
+                except ValueError: # Longer than MAX_REQUEST
+                    writer.write(json.dumps({"ok": False, "error": "Request too large."}).encode("utf-8") + b"\n")
+                    break
+                if not line:
+                    break
+                response = self.respond(line)
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+                if self.lock_reason is not None:
+                    self.stop(self.lock_reason) # Only once the reply is on its way
+        except ConnectionError:
+            pass
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+
+    def respond(self, line: bytes) -> dict:
+        start = time.perf_counter()
+        self.last_request = time.monotonic()
+        op = "invalid"
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict) or request.get("op") not in self.handlers:
+                raise AgentError(f"Unknown request: {line[:80]!r}")
+            op = request["op"]
+            response = {"ok": True, "result": self.handlers[op](request)}
+        except Exception as e: # One bad request must not take the agent down
+            response = {"ok": False, "error": str(e) or type(e).__name__}
+        self._record(op, (time.perf_counter() - start) * 1000)
+        return response
+
+    def _record(self, op: str, elapsed_ms: float):
+        if op not in self.latencies:
+            self.latencies[op] = deque(maxlen=LATENCY_SAMPLES)
+        self.latencies[op].append(elapsed_ms)
+        self.counts[op] = self.counts.get(op, 0) + 1
+
+    def _same_user(self, writer) -> bool:
+        """Rejects peers running as another user where the OS tells us (Linux)."""
+        sock = writer.get_extra_info("socket")
+        if sock is None or not hasattr(socket, "SO_PEERCRED"):
+            return True # The 0600 socket in a 0700 directory is the only guard
+        credentials = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+        _, uid, _ = struct.unpack("3i", credentials)
+        return uid == os.getuid()
+
+    def _disk_state(self):
+        state = []
+        for path in (self.store.path, self.store.path + journal.JOURNAL_SUFFIX):
+            try:
+                stat = os.stat(path)
+                state.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                state.append(None)
+        return state
+
+    def refresh(self):
+        """Re-reads the vault if the CLI or GUI changed it since the last request."""
+        state = self._disk_state()
+        if state == self.disk_state:
+            return
+        try:
+            self.vault = self.store.reload()
+        except ValueError:
+            self.lock_reason = "vault re-keyed on disk"
+            raise AgentError("The vault was re-keyed; the agent locked itself. Start it again.")
+        self.search = search_index.SearchIndex(self.vault)
+        self.disk_state = state
+
+    # --- Operations ---
+    def op_ping(self, request):
+        return {"entries": len(self.vault)}
+
+    def op_get(self, request):
+        self.refresh()
+        service = request["service"]
+        if service not in self.vault:
+            raise AgentError(f"Not found: {service}")
+        return dict(self.vault[service])
+
+    def op_list(self, request):
+        self.refresh()
+        query = request.get("query") or ""
+        if query.strip():
+            return self.search.search(query, request.get("limit", search_index.DEFAULT_LIMIT))
+        return list(self.vault)
+
+    def op_search(self, request):
+        self.refresh()
+        return self.search.search(request["query"], request.get("limit", search_index.DEFAULT_LIMIT))
+
+    def op_stats(self, request):
+        ops = {}
+        for op, samples in self.latencies.items():
+            ordered = sorted(samples)
+            ops[op] = {
+                "count": self.counts[op],
+                "mean_ms": sum(ordered) / len(ordered),
+                "p50_ms": ordered[len(ordered) // 2],
+                "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                "max_ms": ordered[-1],
+            }
+        now = time.monotonic()
+        return {
+            "entries": len(self.vault),
+            "clients": len(self.writers),
+            "uptime_s": now - self.started,
+            "locks_in_s": max(0.0, self.last_request + self.idle_timeout - now),
+            "ops": ops,
+        }
+
+    def op_lock(self, request):
+        self.lock_reason = "lock requested"
+        return None
+
+class AgentClient:
+    """Blocking client for the CLI and scripts; one connection serves many requests."""
+    def __init__(self, path: str = None, timeout: float = 10.0):
+        self.path = path or socket_path()
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.connect(self.path)
+        except OSError as e:
+            self.sock.close()
+            raise AgentError(f"No agent listening on {self.path} ({e.strerror or e}).")
+        self.stream = self.sock.makefile("rwb")
+
+    def request(self, op: str, **args):
+        self.stream.write(json.dumps({"op": op, **args}).encode("utf-8") + b"\n")
+        self.stream.flush()
+        line = self.stream.readline()
+        if not line:
+            raise AgentError("The agent closed the connection.")
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise AgentError(response.get("error", "Request failed."))
+        return response["result"]
+
+    def get(self, service: str) -> dict:
+        return self.request("get", service=service)
+
+    def list(self, query: str = None) -> list:
+        return self.request("list", query=query)
+
+    def search(self, query: str, limit: int = search_index.DEFAULT_LIMIT) -> list:
+        return self.request("search", query=query, limit=limit)
+
+    def stats(self) -> dict:
+        return self.request("stats")
+
+    def lock(self):
+        return self.request("lock")
+
+    def close(self):
+        self.stream.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,221 @@
+"""
+Vault health audit: reused, weak and stale passwords.
+
+Reuse is found in one pass by grouping entries on a keyed hash of their password
+(BLAKE2b under a key derived from the vault key), never by comparing pairs.
+Strength is a guessing-entropy estimate per entry. Age comes from the "modified"
+timestamp data_handler stamps on every add and change.
+
+Results are kept per entry between runs, sealed next to the vault. An entry whose
+"modified" is the same as at the last run is not read again at all: vaults that
+know it without decrypting (indexed, blob, sharded) skip the record and the hash.
+Other entries are only re-scored when their password changed.
+"""
+import hashlib
+import json
+import math
+import os
+import time
+from functools import lru_cache
+from typing import NamedTuple
+
+from core import breach_check
+from core import encryption
+from core import password_generator
+from core import tracing
+
+AUDIT_SUFFIX = ".audit" # sealed results of the last run, next to the vault
+MAGIC = b"PWA1"
+STALE_DAYS = 365
+WEAK_BELOW = 2 # scores under this are reported as weak
+SCORE_BITS = (28, 36, 60, 80) # entropy needed for scores 1 to 4
+DAY = 24 * 60 * 60
+
+# Alphabet sizes for the entropy estimate; characters outside ASCII count as a large pool
+_CLASSES = ((password_generator.LOWERCASE, 26), (password_generator.UPPERCASE, 26),
+            (password_generator.DIGITS, 10))
+_PUNCTUATION = 33
+_OTHER = 100
+_RUN_WEIGHT = 0.25 # share of a character's entropy when it repeats or continues a sequence
+
+class EntryHealth(NamedTuple):
+    fingerprint: str # keyed hash of the password, hex
+    score: int # 0 (very weak) to 4 (strong)
+    bits: float # estimated guessing entropy
+    modified: int # unix time of the last change; 0 when unknown
+    breached: int = None # times seen in the breach corpus the audit last used; None if not looked up
+
+class AuditReport(NamedTuple):
+    reused: list # lists of services sharing one password, largest group first
+    weak: list # (service, score, bits), weakest first
+    stale: list # (service, days since the last change), oldest first
+    undated: list # services added before timestamps existed
+    breached: dict # service -> times seen, when a breach corpus was given
+    entries: int
+    rescored: int # entries scored by this run; the others came from the previous one
+
+@lru_cache(maxsize=1)
+def _words() -> frozenset:
+    return frozenset(password_generator.load_wordlist())
+
+def _pool(chars: str) -> int:
+    pool = sum(size for alphabet, size in _CLASSES if any(c in alphabet for c in chars))
+    if any(not c.isalnum() and c.isascii() for c in chars):
+        pool += _PUNCTUATION
+    if not chars.isascii():
+        pool += _OTHER
+    return pool
+
+def _tokens(password: str):
+    """Splits into runs of letters and runs of everything else."""
+    start = 0
+    for i in range(1, len(password) + 1):
+        if i == len(password) or password[i].isalpha() != password[start].isalpha():
+            yield password[start:i]
+            start = i
+
+def estimate_bits(password: str) -> float:
+    """
+    Rough guessing entropy: dictionary words count as one pick from the word list,
+    other characters by the size of the character classes in use, with repeats
+    and sequences ("aaa", "abc", "321") counting for little.
+    """
+    if not password:
+        return 0.0
+    char_bits = math.log2(_pool(password))
+    word_bits = math.log2(len(_words()))
+    bits = 0.0
+    for token in _tokens(password):
+        if token.isalpha() and token.lower() in _words():
+            bits += word_bits + (1 if token != token.lower() else 0)
+            continue
+        previous = step = None
+        for char in token:
+            delta = ord(char) - ord(previous) if previous is not None else None
+            bits += char_bits * (_RUN_WEIGHT if delta in (-1, 0, 1) and delta == step else 1)
+            previous, step = char, delta
+    return bits
+
+def score(bits: float) -> int:
+    return sum(bits >= threshold for threshold in SCORE_BITS)
+
+def audit_key(session: encryption.SessionKey) -> bytes:
+    """Key of the password fingerprints, tied to the vault key and useless without it."""
+    return hashlib.blake2b(b"vault audit fingerprints", key=session.key, digest_size=32).digest()
+
+def _read_audit_file(path: str) -> bytes:
+    """The sealed results, or b"" when there are none."""
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return b""
+
+def _write_audit_file(data: bytes, path: str):
+    temp_file = path + ".tmp"
+    with open(temp_file, "wb") as f:
+        f.write(data)
+    os.replace(temp_file, path) # A crash leaves the previous results, never half of them
+
+def corpus_id(corpus) -> list:
+    """Identifies a breach corpus file, so counts looked up in an older one are not reused."""
+    stat = os.stat(corpus.path)
+    return [corpus.records, stat.st_size, stat.st_mtime_ns]
+
+class VaultAudit:
+    """
+    Audits a vault, reusing the results of the previous run for entries that did
+    not change since. load() and save() keep them across sessions.
+    """
+    def __init__(self, session: encryption.SessionKey, results: dict = None, checked_at: int = 0,
+                 corpus: list = None):
+        self.session = session
+        self.key = audit_key(session)
+        self.results = results or {} # service -> EntryHealth
+        self.checked_at = checked_at # unix time of the last run
+        self.corpus = corpus # corpus_id() of the corpus the breach counts come from
+
+    @classmethod
+    def load(cls, vault_path: str, session: encryption.SessionKey) -> "VaultAudit":
+        """The saved results for this vault, or an empty audit when there are none under this key."""
+        blob = _read_audit_file(vault_path + AUDIT_SUFFIX)
+        if blob[:len(MAGIC)] != MAGIC:
+            return cls(session)
+        try:
+            plain = session.open(blob[len(MAGIC):], MAGIC + session.header)
+        except Exception:
+            return cls(session) # Written under an older key: everything is re-scored
+        with tracing.span("json.loads", len(plain)):
+            saved = json.loads(plain)
+        results = {service: EntryHealth(*result) for service, result in saved["results"].items()}
+        return cls(session, results, saved["checked_at"], saved["corpus"])
+
+    def save(self, vault_path: str):
+        with tracing.span("json.dumps") as s:
+            plain = json.dumps({"checked_at": self.checked_at, "corpus": self.corpus,
+                                "results": self.results}).encode("utf-8")
+            s.bytes_out = len(plain)
+        _write_audit_file(MAGIC + self.session.seal(plain, MAGIC + self.session.header), vault_path + AUDIT_SUFFIX)
+
+    def fingerprint(self, password: str) -> str:
+        return hashlib.blake2b(password.encode("utf-8"), key=self.key, digest_size=16).hexdigest()
+
+    def run(self, vault_data, now: float = None, stale_days: int = STALE_DAYS, corpus=None) -> AuditReport:
+        """
+        Audits every entry. Results of removed services are dropped. With a breach
+        `corpus` (breach_check.BreachCorpus), passwords seen in breaches are reported too.
+        Entries with the same nonzero "modified" as at the last run keep their results
+        unread, unless they were last changed in the second that run started.
+        """
+        now = time.time() if now is None else now
+        # Vaults that keep "modified" apart from the record tell it without decrypting
+        modified_of = getattr(vault_data, "modified", None) or (lambda service: vault_data[service].get("modified"))
+        current_corpus = corpus_id(corpus) if corpus is not None else None
+        counts_valid = corpus is None or current_corpus == self.corpus
+        empty = self.fingerprint("")
+        previous = self.results
+        results = {}
+        by_fingerprint = {}
+        counts = {} # fingerprint -> breach count, one lookup per distinct password
+        rescored = 0
+        with tracing.span("vault.audit", entries=len(vault_data)):
+            for service in vault_data:
+                result = previous.get(service)
+                unchanged = (result is not None and result.modified and result.modified < self.checked_at
+                             and (corpus is None or counts_valid and result.breached is not None)
+                             and modified_of(service) == result.modified)
+                if not unchanged:
+                    entry = vault_data[service]
+                    password = entry.get("pass", "")
+                    fingerprint = self.fingerprint(password)
+                    modified = entry.get("modified", 0)
+                    if result is None or result.fingerprint != fingerprint:
+                        bits = estimate_bits(password)
+                        result = EntryHealth(fingerprint, score(bits), bits, modified)
+                        rescored += 1
+                    elif result.modified != modified:
+                        result = result._replace(modified=modified)
+                    if corpus is not None: # Otherwise the count of an unchanged password stays
+                        if fingerprint not in counts:
+                            counts[fingerprint] = corpus.count_digest(breach_check.password_digest(password)) \
+                                if password else 0
+                        result = result._replace(breached=counts[fingerprint])
+                results[service] = result
+                if result.fingerprint != empty: # An empty password is reported as weak; sharing it is not reuse
+                    by_fingerprint.setdefault(result.fingerprint, []).append(service)
+            self.results = results
+            self.checked_at = int(now)
+            if corpus is not None:
+                self.corpus = current_corpus
+
+            reused = sorted((group for group in by_fingerprint.values() if len(group) > 1), key=len, reverse=True)
+            weak = sorted(((service, r.score, r.bits) for service, r in results.items() if r.score < WEAK_BELOW),
+                          key=lambda item: item[2])
+            cutoff = now - stale_days * DAY
+            stale = sorted(((service, int((now - r.modified) // DAY)) for service, r in results.items()
+                            if r.modified and r.modified < cutoff), key=lambda item: item[1], reverse=True)
+            undated = [service for service, r in results.items() if not r.modified]
+            breached = {}
+            if corpus is not None:
+                breached = {service: r.breached for service, r in results.items() if r.breached}
+        return AuditReport(reused, weak, stale, undated, breached, len(results), rescored)
@@ -0,0 +1,203 @@
+import json
+import struct
+import threading
+from collections.abc import MutableMapping
+
+from core import encryption
+from core import storage_compression
+from core import tracing
+
+MAGIC = b"PWX1"
+
+_LENGTH = struct.Struct(">I")
+HEADER_SIZE = len(MAGIC) + encryption.KEY_HEADER_SIZE + _LENGTH.size
+
+# File layout:
+#   MAGIC | key header | index length | sealed index | record 0 | record 1 | ...
+# The key header records the KDF and salt (see encryption.pack_key_header).
+# The index maps each service to the (offset, length, username, modified, nonce) of its record,
+# offsets relative to the first record. Usernames and change times ride along so listing,
+# searching and auditing never decrypt a record they do not need. Every record is sealed on its own with the service name as associated data.
+# The record's nonce in the sealed index binds it to this snapshot: a record of an older
+# file, swapped in at the same place, carries another nonce and is refused on read.
+
+def is_indexed(blob: bytes) -> bool:
+    return blob[:len(MAGIC)] == MAGIC
+
+def snapshot_id(blob: bytes) -> bytes:
+    """
+    Key header + index nonce. Unique per save, like the legacy blob's salt + nonce.
+    """
+    key_header = blob[len(MAGIC):HEADER_SIZE - _LENGTH.size]
+    return key_header + blob[HEADER_SIZE:HEADER_SIZE + encryption.NONCE_SIZE]
+
+def seal_entry(session: encryption.SessionKey, service: str, entry: dict) -> bytes:
+    if tracing.active_tracer is None: # Once per entry on save: no span around the dumps
+        return session.seal(json.dumps(entry).encode("utf-8"), service.encode("utf-8"))
+    with tracing.span("json.dumps") as s:
+        plain = json.dumps(entry).encode("utf-8")
+        s.bytes_out = len(plain)
+    return session.seal(plain, service.encode("utf-8"))
+
+def open_entry(session: encryption.SessionKey, service: str, record: bytes) -> dict:
+    plain = session.open(record, service.encode("utf-8"))
+    if tracing.active_tracer is None:
+        return json.loads(plain)
+    with tracing.span("json.loads", len(plain)):
+        return json.loads(plain)
+
+def read_index(path: str, password: str, session: encryption.SessionKey = None):
+    """
+    Reads and decrypts only the header and index of an indexed vault.
+    Returns (LazyVault, session, snapshot_id). A `session` for the same KDF and salt skips the KDF.
+    """
+    with tracing.span("storage.read") as s, open(path, "rb") as f:
+        head = f.read(HEADER_SIZE)
+        if not is_indexed(head) or len(head) < HEADER_SIZE:
+            raise ValueError("Not an indexed vault.")
+        key_header = head[len(MAGIC):HEADER_SIZE - _LENGTH.size]
+        (index_length,) = _LENGTH.unpack_from(head, HEADER_SIZE - _LENGTH.size)
+        sealed_index = f.read(index_length)
+        s.bytes_out = len(head) + len(sealed_index)
+    session = encryption.resume_session(password, key_header, session)
+    plain_index = storage_compression.decompress_bytes(session.open(sealed_index, MAGIC + key_header))
+    with tracing.span("json.loads", len(plain_index)):
+        index = json.loads(plain_index)
+    vault = LazyVault(path, session, {service: (offset, length, bytes.fromhex(nonce))
+                                      for service, (offset, length, _, _, nonce) in index.items()},
+                      HEADER_SIZE + index_length)
+    vault._users = {service: user for service, (_, _, user, _, _) in index.items()}
+    vault._modified = {service: modified for service, (_, _, _, modified, _) in index.items()}
+    return vault, session, key_header + sealed_index[:encryption.NONCE_SIZE]
+
+def encode(vault, session: encryption.SessionKey, codec: str = None, level: int = None):
+    """
+    Builds a complete indexed vault file from a dict or a frozen LazyVault.
+    The index is compressed with `codec` at `level` (None lets storage_compression choose).
+    Unchanged records of a LazyVault are copied as ciphertext without being decrypted.
+    Returns (blob, locations, records_offset).
+    """
+    records = bytearray()
+    locations = {}
+    lazy = isinstance(vault, LazyVault)
+    raw_records = vault.raw_records() if lazy else {}
+    same_key = lazy and vault.session.key == session.key
+    for service in vault:
+        record = raw_records.get(service)
+        if record is None:
+            record = seal_entry(session, service, vault[service])
+        elif not same_key: # Key rotation: re-seal under the new key
+            record = seal_entry(session, service, open_entry(vault.session, service, record))
+        if lazy:
+            user, modified = vault.username(service), vault.modified(service)
+        else:
+            user, modified = vault[service].get("user"), vault[service].get("modified")
+        locations[service] = (len(records), len(record), user, modified, record[:encryption.NONCE_SIZE].hex())
+        records += record
+    with tracing.span("json.dumps") as s:
+        plain_index = json.dumps(locations).encode("utf-8")
+        s.bytes_out = len(plain_index)
+    plain_index = storage_compression.compress_bytes(plain_index, codec, level)
+    sealed_index = session.seal(plain_index, MAGIC + session.header)
+    header = MAGIC + session.header + _LENGTH.pack(len(sealed_index))
+    return header + sealed_index + bytes(records), locations, HEADER_SIZE + len(sealed_index)
+
+class LazyVault(MutableMapping):
+    """
+    Mapping of service -> entry where only the index lives in memory.
+    Reading an entry decrypts its record from disk on demand and does not keep it;
+    new or modified entries are held in memory until the next snapshot.
+    """
+    def __init__(self, path: str, session: encryption.SessionKey, index: dict, records_offset: int):
+        self.path = path
+        self.session = session
+        self.records_offset = records_offset
+        self.io_lock = threading.Lock() # held while the file is read or swapped, and for changes
+        self._index = index # service -> (offset, length, nonce), or None when only in _dirty
+        self._dirty = {}
+        self._users = {} # service -> username, kept in memory for listing and search
+        self._modified = {} # service -> "modified" of the entry, kept in memory for the audit
+        self._versions = {} # bumped on every change, to rebase safely after a background save
+
+    def __getitem__(self, service):
+        if service in self._dirty:
+            return dict(self._dirty[service])
+        offset, length, nonce = self._index[service]
+        with self.io_lock, tracing.span("storage.read") as s:
+            with open(self.path, "rb") as f:
+                f.seek(self.records_offset + offset)
+                record = f.read(length)
+            s.bytes_out = len(record)
+        if record[:encryption.NONCE_SIZE] != nonce:
+            raise ValueError(f"Record of {service} does not belong to this snapshot.")
+        return open_entry(self.session, service, record)
+
+    def __setitem__(self, service, entry):
+        with self.io_lock:
+            self._index[service] = None
+            self._dirty[service] = dict(entry)
+            self._users[service] = entry.get("user")
+            self._modified[service] = entry.get("modified")
+            self._versions[service] = self._versions.get(service, 0) + 1
+
+    def __delitem__(self, service):
+        with self.io_lock:
+            del self._index[service]
+            self._dirty.pop(service, None)
+            self._users.pop(service, None)
+            self._modified.pop(service, None)
+            self._versions[service] = self._versions.get(service, 0) + 1
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, service):
+        return service in self._index
+
+    def username(self, service: str) -> str:
+        """Username from the index, without decrypting the record."""
+        return self._users.get(service)
+
+    def modified(self, service: str):
+        """Last change time from the index, without decrypting the record."""
+        return self._modified.get(service)
+
+    def freeze(self) -> "LazyVault":
+        """Cheap point-in-time copy for a snapshot; shares the file, not the mutable state."""
+        with self.io_lock:
+            frozen = LazyVault(self.path, self.session, dict(self._index), self.records_offset)
+            frozen._dirty = {service: dict(entry) for service, entry in self._dirty.items()}
+            frozen._users = dict(self._users)
+            frozen._modified = dict(self._modified)
+            frozen._versions = dict(self._versions)
+        frozen.io_lock = self.io_lock
+        return frozen
+
+    def raw_records(self) -> dict:
+        """Ciphertext of every clean record, read from disk in one pass; a record the index does not name is dropped."""
+        clean = {service: loc for service, loc in self._index.items() if loc is not None}
+        if not clean:
+            return {}
+        with self.io_lock:
+            with open(self.path, "rb") as f:
+                f.seek(self.records_offset)
+                data = f.read()
+        records = {service: data[offset:offset + length] for service, (offset, length, _) in clean.items()}
+        return {service: record for service, record in records.items()
+                if record[:encryption.NONCE_SIZE] == clean[service][2]}
+
+    def rebase(self, frozen: "LazyVault", locations: dict, records_offset: int, session: encryption.SessionKey):
+        """
+        Points the vault at a freshly written file. Entries changed after `frozen`
+        was taken stay in memory; everything else is read from the new file.
+        Must be called with io_lock held, right after the swap.
+        """
+        self.session = session
+        self.records_offset = records_offset
+        for service, loc in locations.items():
+            if service in self._index and self._versions.get(service) == frozen._versions.get(service):
+                self._index[service] = (loc[0], loc[1], bytes.fromhex(loc[4]))
+                self._dirty.pop(service, None)
@@ -0,0 +1,311 @@
+import os
+from typing import NamedTuple
+
+from core import encryption
+from core import journal
+from core import record_store
+from core import sharded_vault
+from core import storage_compression
+from core import storage_handler
+from core import stream_vault
+from core import tracing
+from core import vault_index
+
+FORMAT_BLOB = "blob" # Original layout: key header (or bare salt) | nonce | one AES-GCM blob of the compressed payload
+FORMAT_INDEXED = "indexed" # core/vault_index.py: sealed index + one sealed record per entry
+FORMAT_STREAM = "stream" # core/stream_vault.py: chunked STREAM encryption, read through mmap
+FORMAT_SHARDED = "sharded" # core/sharded_vault.py: manifest + shard files decrypted in parallel
+FORMATS = (FORMAT_INDEXED, FORMAT_STREAM, FORMAT_SHARDED, FORMAT_BLOB)
+DEFAULT_FORMAT = FORMAT_INDEXED # for new vaults with no format configured
+
+class EncodedSnapshot(NamedTuple):
+    base_id: bytes # ties the journal to this snapshot
+    temp_file: str # staged next to the vault, swapped in by install_snapshot()
+    locations: dict = None # indexed format only
+    records_offset: int = None
+    files: list = None # sharded format only
+
+def detect_format(path: str) -> str:
+    with open(path, "rb") as f:
+        magic = f.read(4)
+    if vault_index.is_indexed(magic):
+        return FORMAT_INDEXED
+    if stream_vault.is_stream(magic):
+        return FORMAT_STREAM
+    if sharded_vault.is_sharded(magic):
+        return FORMAT_SHARDED
+    return FORMAT_BLOB
+
+class VaultStore:
+    """
+    Load and save pipeline shared by the CLI and the GUI.
+    Full saves write a snapshot of the whole vault; single-entry commits are
+    appended to the encrypted journal and folded back in by compaction.
+
+    Any format is read. Snapshots are written in `vault_format`, else the format
+    saved next to the vault (see set_format), else the vault's current one; a vault
+    found in another format than the one asked for is migrated once, on unlock.
+    `codec` names a storage_compression codec; None picks one by payload size.
+    `codec_level` overrides the compression level, e.g. zlib 1 (fastest) to 9 (smallest);
+    None keeps the level picked by payload size, or the codec's default.
+    A `read_only` store never migrates, repairs or writes anything; it is for
+    readers running alongside a writer, such as the unlock agent.
+    `kdf` overrides the KDF settings saved next to the vault (see set_kdf); a vault
+    unlocked under other KDF parameters is re-keyed to them on unlock.
+    `shard_count` applies to new sharded vaults; `workers` bounds the threads that
+    decrypt and encode shards.
+    """
+    def __init__(self, path: str = None, use_journal: bool = True, vault_format: str = None,
+                 compact_threshold: int = journal.COMPACT_THRESHOLD, codec: str = None, codec_level: int = None,
+                 read_only: bool = False, kdf: encryption.KdfParams = None,
+                 shard_count: int = sharded_vault.SHARD_COUNT, workers: int = sharded_vault.WORKERS):
+        self.path = path or storage_handler.VAULT_FILE
+        self.use_journal = use_journal
+        self.requested_format = vault_format
+        self.vault_format = vault_format or DEFAULT_FORMAT # Resolved again by create() and unlock()
+        self.compact_threshold = compact_threshold
+        self.codec = codec
+        self.codec_level = codec_level
+        self.read_only = read_only
+        self.kdf = kdf
+        self.shard_count = shard_count
+        self.workers = workers
+        self.session = None
+        self.journal = None
+        self.vault = None
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path) and os.path.getsize(self.path) > 0
+
+    def desired_kdf(self) -> encryption.KdfParams:
+        """
+        The KDF the vault should be keyed with. Raises SettingsError if the saved
+        settings are malformed or outside the bounds of encryption.check_kdf().
+        """
+        if self.kdf is not None:
+            return self.kdf
+        settings = storage_handler.read_kdf_settings(self.path)
+        if not settings:
+            return encryption.DEFAULT_KDF
+        try:
+            kdf = encryption.KdfParams(**settings)
+            encryption.check_kdf(kdf)
+        except (TypeError, ValueError) as e:
+            raise storage_handler.SettingsError(
+                f"Unusable KDF settings in {self.path + storage_handler.KDF_SETTINGS_SUFFIX}: {e}")
+        return kdf
+
+    def desired_format(self) -> str:
+        """
+        The format asked for by the constructor or the saved settings, or None to
+        keep the vault's own. Raises SettingsError if the saved settings are malformed.
+        """
+        if self.requested_format is not None:
+            return self.requested_format
+        settings = storage_handler.read_format_settings(self.path)
+        if not settings:
+            return None
+        vault_format = settings.get("format") if isinstance(settings, dict) else None
+        if vault_format not in FORMATS:
+            raise storage_handler.SettingsError(
+                f"Unusable format settings in {self.path + storage_handler.FORMAT_SETTINGS_SUFFIX}: "
+                f"the format must be one of {', '.join(FORMATS)}.")
+        return vault_format
+
+    def set_format(self, vault_format: str):
+        """Saves the format to write this vault in; it is migrated on its next unlock."""
+        if vault_format not in FORMATS:
+            raise ValueError(f"Unknown vault format: {vault_format!r}")
+        storage_handler.write_format_settings({"format": vault_format}, self.path)
+
+    def set_kdf(self, kdf: encryption.KdfParams):
+        """Saves the KDF to use for this vault; it is re-keyed on its next unlock."""
+        encryption.check_kdf(kdf)
+        storage_handler.write_kdf_settings(kdf._asdict(), self.path)
+
+    def stored_kdf(self) -> encryption.KdfParams:
+        """The KDF recorded in the vault file, readable without the password."""
+        with open(self.path, "rb") as f:
+            head = f.read(64)
+        offset = 0 if detect_format(self.path) == FORMAT_BLOB else 4 # past the format magic
+        return encryption.parse_key_header(head[offset:])[0]
+
+    def create(self, password: str) -> dict:
+        """Starts a new, empty vault. Nothing is written until the first save."""
+        self.vault_format = self.desired_format() or DEFAULT_FORMAT
+        self.session = encryption.SessionKey.create(password, self.desired_kdf())
+        self.journal = None
+        self.vault = {}
+        if self.vault_format == FORMAT_BLOB:
+            self.vault = record_store.EntryStore()
+        if self.vault_format == FORMAT_SHARDED:
+            self.vault = sharded_vault.ShardedVault.from_entries((), self.shard_count)
+        return self.vault
+
+    def unlock(self, password: str, session: encryption.SessionKey = None):
+        """
+        Decrypts the vault (only its index, for the indexed format) and replays its journal.
+        Raises on a wrong password or a corrupted vault.
+        An existing `session` is reused instead of re-deriving the key while the salt matches.
+        """
+        found_format = detect_format(self.path)
+        # Settings are checked before the key is derived, so bad ones fail fast
+        desired_kdf = None if password is None or self.read_only else self.desired_kdf()
+        self.vault_format = found_format if self.read_only else self.desired_format() or found_format
+        with tracing.span("vault.unlock", format=found_format):
+            vault_data, session, base_id = self._read(found_format, password, session)
+            migrating = found_format != self.vault_format
+            rekeying = desired_kdf is not None and session.kdf != desired_kdf
+            if migrating and isinstance(vault_data, vault_index.LazyVault):
+                vault_data = dict(vault_data.items()) # Its records are about to be replaced
+            if migrating and self.vault_format == FORMAT_SHARDED:
+                vault_data = sharded_vault.ShardedVault.from_entries(vault_data.items(), self.shard_count)
+            if migrating and self.vault_format == FORMAT_BLOB:
+                vault_data = record_store.EntryStore.from_entries(vault_data.items())
+            self.session = session
+            self.vault = vault_data
+            self.journal = None
+            if self.use_journal:
+                self.journal = journal.VaultJournal(self, self.compact_threshold)
+                self.journal.open(base_id, vault_data, self.read_only)
+        if rekeying:
+            self.rotate_key(password, vault_data) # Also writes the configured format
+        elif migrating:
+            self.migrate(vault_data)
+        if migrating and found_format == FORMAT_SHARDED:
+            sharded_vault.remove_shards(self.path) # The new snapshot no longer needs them
+        return vault_data
+
+    def _read(self, found_format: str, password: str, session: encryption.SessionKey = None):
+        if found_format == FORMAT_INDEXED:
+            return vault_index.read_index(self.path, password, session)
+        if found_format == FORMAT_STREAM:
+            return stream_vault.read(self.path, password, session)
+        if found_format == FORMAT_SHARDED:
+            return sharded_vault.read(self.path, password, session, self.workers)
+        return self._read_blob(password, session)
+
+    def _read_blob(self, password: str, session: encryption.SessionKey = None):
+        raw_blob = storage_handler.read_vault(self.path)
+        session = encryption.resume_session(password, raw_blob, session)
+        decrypted = session.decrypt(raw_blob)
+        vault_data = record_store.load_payload(storage_compression.decompress_bytes(decrypted))
+        return vault_data, session, journal.snapshot_id(raw_blob)
+
+    def reload(self):
+        """
+        Re-reads a vault changed on disk with the key already in memory.
+        Raises ValueError if it was re-keyed since.
+        """
+        if self.journal is not None:
+            self.journal.wait()
+        return self.unlock(None, self.session)
+
+    def migrate(self, vault_data):
+        """One-shot rewrite of the vault in the configured format."""
+        self.save(vault_data)
+
+    # --- Snapshot hooks, also driven by the journal's background compaction ---
+    def take_snapshot(self, vault_data):
+        with tracing.span("vault.snapshot"): # Runs on the caller's (UI) thread even for background saves
+            if self.vault_format == FORMAT_SHARDED:
+                if not isinstance(vault_data, sharded_vault.ShardedVault):
+                    vault_data = sharded_vault.ShardedVault.from_entries(vault_data.items(), self.shard_count)
+                # Shards sealed under another key (after rotate_key) are all rewritten
+                rekeyed = vault_data.session is None or vault_data.session.key != self.session.key
+                return vault_data.freeze(everything=rekeyed)
+            if isinstance(vault_data, vault_index.LazyVault):
+                return vault_data.freeze()
+            if isinstance(vault_data, record_store.EntryStore):
+                return vault_data.copy()
+            return {service: dict(entry) for service, entry in vault_data.items()}
+
+    def read_snapshot(self, vault_data):
+        """Point-in-time copy of the whole vault that another thread can read while this one changes it."""
+        if isinstance(vault_data, sharded_vault.ShardedVault):
+            return vault_data.copy() # take_snapshot() copies only the shards a save needs
+        return self.take_snapshot(vault_data)
+
+    def encode_snapshot(self, snapshot) -> EncodedSnapshot:
+        """Encrypts a snapshot into a staged temp file; the live vault file is untouched."""
+        if self.vault_format == FORMAT_INDEXED:
+            blob, locations, records_offset = vault_index.encode(snapshot, self.session, self.codec, self.codec_level)
+            temp_file = storage_handler.stage_vault(blob, self.path)
+            return EncodedSnapshot(vault_index.snapshot_id(blob), temp_file, locations, records_offset)
+        if self.vault_format == FORMAT_STREAM:
+            temp_file, base_id = stream_vault.write(snapshot, self.session, self.path, self.codec, self.codec_level)
+            return EncodedSnapshot(base_id, temp_file)
+        if self.vault_format == FORMAT_SHARDED:
+            temp_file, files, base_id = sharded_vault.write(snapshot, self.session, self.path, self.codec,
+                                                            self.codec_level, self.workers)
+            return EncodedSnapshot(base_id, temp_file, files=files)
+        compressed = storage_compression.compress_bytes(record_store.encode(snapshot), self.codec, self.codec_level)
+        blob = self.session.encrypt(compressed)
+        return EncodedSnapshot(journal.snapshot_id(blob), storage_handler.stage_vault(blob, self.path))
+
+    def snapshot_id(self, encoded: EncodedSnapshot) -> bytes:
+        return encoded.base_id
+
+    def install_snapshot(self, encoded: EncodedSnapshot, snapshot):
+        if encoded.files is not None:
+            storage_handler.commit_vault(encoded.temp_file, self.path)
+            if isinstance(self.vault, sharded_vault.ShardedVault):
+                self.vault.rebase(snapshot, encoded.files, self.session)
+            sharded_vault.remove_stale(self.path, encoded.files) # Only after the swap
+            return
+        if not isinstance(self.vault, vault_index.LazyVault):
+            storage_handler.commit_vault(encoded.temp_file, self.path)
+            return
+        with self.vault.io_lock:
+            storage_handler.commit_vault(encoded.temp_file, self.path)
+            if encoded.locations is not None:
+                self.vault.rebase(snapshot, encoded.locations, encoded.records_offset, self.session)
+
+    def save(self, vault_data):
+        """Writes a full snapshot and starts an empty journal."""
+        self.save_snapshot(self.take_snapshot(vault_data))
+
+    def save_snapshot(self, snapshot):
+        """Like save(), for a snapshot already taken with take_snapshot()."""
+        if self.journal is not None:
+            self.journal.wait()
+        with tracing.span("vault.save", format=self.vault_format):
+            encoded = self.encode_snapshot(snapshot)
+            self.install_snapshot(encoded, snapshot)
+            if self.use_journal:
+                if self.journal is None:
+                    self.journal = journal.VaultJournal(self, self.compact_threshold)
+                self.journal.reset(self.snapshot_id(encoded))
+
+    def commit(self, vault_data, service: str):
+        """Persists a change to a single service (added, modified or deleted)."""
+        if self.journal is None:
+            self.save(vault_data) # No snapshot to append to yet
+        else:
+            self.journal.append(vault_data, service)
+
+    def commit_entry(self, service: str, entry):
+        """
+        Appends an already captured entry (None for a deletion) to the journal.
+        Unlike commit(), never starts a compaction; check compaction_due() instead.
+        """
+        self.journal.append_entry(service, entry)
+
+    def compaction_due(self) -> bool:
+        """True when the next change should be written as a full snapshot."""
+        return self.journal is None or self.journal.compaction_due
+
+    def rotate_key(self, password: str, vault_data):
+        """
+        Re-encrypts everything under a new salt and key, derived with the configured KDF;
+        the old journal becomes stale.
+        """
+        if self.journal is not None:
+            self.journal.wait()
+        with tracing.span("vault.rotate"):
+            self.session = encryption.rotate_session_key(password, self.desired_kdf())
+            self.save(vault_data)
+
+    def close(self):
+        if self.journal is not None:
+            self.journal.wait()
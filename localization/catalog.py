@@ -0,0 +1,145 @@
+"""
+Compiled localization catalog.
+
+locales.json is compiled once into one flat {"section.key": text} table per
+language and written to a cache file next to it. Startup then reads only the
+catalog header; each language's table is loaded the first time it is used.
+
+Rebuild the cache explicitly with:
+    python -m localization.catalog
+It is also rebuilt on demand whenever locales.json is newer than the cache.
+"""
+import json
+import marshal
+import os
+import string
+import struct
+import sys
+
+SOURCE_FILE = "localization/locales.json"
+CATALOG_SUFFIX = ".catalog"
+FALLBACK_LANG = "en"
+MAGIC = b"PWL1"
+
+_HEADER_LENGTH = struct.Struct(">I")
+
+# File layout:
+#   MAGIC | header length | marshalled header | marshalled table per language
+# The header records the source file's mtime and size, the marshal format and the
+# Python version (marshal is not portable between versions), and each table's
+# (offset, length). A cache that does not match is simply rebuilt.
+
+def catalog_path(source: str) -> str:
+    return os.path.splitext(source)[0] + CATALOG_SUFFIX
+
+def _flatten(tree: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in tree.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        else:
+            flat[prefix + key] = str(value)
+    return flat
+
+def _fields(template: str):
+    """Placeholder names in a format template; raises ValueError on malformed braces."""
+    return {field for _, field, _, _ in string.Formatter().parse(template) if field is not None}
+
+def compile_tables(translations: dict) -> dict:
+    """
+    Flattens every language and checks its templates against the fallback language.
+    A translation that is malformed, or uses a placeholder the fallback does not,
+    would fail at format time, so it is dropped and the fallback text used instead.
+    """
+    tables = {lang: _flatten(tree) for lang, tree in translations.items()}
+    fallback = tables.get(FALLBACK_LANG, {})
+    for lang, table in tables.items():
+        for key, template in list(table.items()):
+            try:
+                fields = _fields(template)
+                if key in fallback and lang != FALLBACK_LANG and not fields <= _fields(fallback[key]):
+                    raise ValueError(f"placeholders {sorted(fields)} differ from {FALLBACK_LANG}")
+            except ValueError as e:
+                print(f"Warning: {lang}:{key} dropped ({e})", file=sys.stderr)
+                del table[key]
+    return tables
+
+def _stamp(source: str) -> tuple:
+    stat = os.stat(source)
+    return (stat.st_mtime_ns, stat.st_size, marshal.version, sys.version_info[:2])
+
+def build(source: str = SOURCE_FILE, target: str = None) -> dict:
+    """Compiles `source` and writes the catalog cache. Returns the compiled tables."""
+    target = target or catalog_path(source)
+    with open(source, "r", encoding="utf-8") as f:
+        tables = compile_tables(json.load(f))
+
+    blobs = {lang: marshal.dumps(table) for lang, table in tables.items()}
+    offsets, position = {}, 0
+    for lang, blob in blobs.items():
+        offsets[lang] = (position, len(blob))
+        position += len(blob)
+    header = marshal.dumps({"stamp": _stamp(source), "languages": offsets})
+
+    temp_file = target + ".tmp"
+    with open(temp_file, "wb") as f:
+        f.write(MAGIC + _HEADER_LENGTH.pack(len(header)) + header)
+        for blob in blobs.values():
+            f.write(blob)
+    os.replace(temp_file, target) # Atomic swap, like the vault
+    return tables
+
+class Catalog:
+    """
+    Read side of the cache: parses only the header up front and unmarshals a
+    language's table on first use. Call load() to get the table.
+    """
+    def __init__(self, source: str = SOURCE_FILE):
+        self.source = source
+        self.path = catalog_path(source)
+        self.tables = {}
+        self.offsets = self._read_header()
+        if self.offsets is None:
+            try:
+                self.tables = build(source, self.path)
+            except OSError:
+                # Read-only install: compile in memory and skip the cache
+                with open(source, "r", encoding="utf-8") as f:
+                    self.tables = compile_tables(json.load(f))
+            self.offsets = {lang: None for lang in self.tables}
+
+    def _read_header(self):
+        """Returns the table offsets, or None when the cache is missing or stale."""
+        try:
+            with open(self.path, "rb") as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    return None
+                (length,) = _HEADER_LENGTH.unpack(f.read(_HEADER_LENGTH.size))
+                header = marshal.loads(f.read(length))
+            if tuple(header["stamp"]) != _stamp(self.source):
+                return None
+        except (OSError, EOFError, ValueError, TypeError, KeyError, struct.error):
+            return None
+        self.data_offset = len(MAGIC) + _HEADER_LENGTH.size + length
+        return header["languages"]
+
+    def languages(self) -> list:
+        return list(self.offsets)
+
+    def load(self, lang: str) -> dict:
+        """The flat table for `lang`, or an empty one for an unknown language."""
+        table = self.tables.get(lang)
+        if table is None:
+            location = self.offsets.get(lang)
+            if location is None:
+                return {}
+            with open(self.path, "rb") as f:
+                f.seek(self.data_offset + location[0])
+                table = marshal.loads(f.read(location[1]))
+            self.tables[lang] = table
+        return table
+
+if __name__ == "__main__":
+    compiled = build()
+    print(f"Wrote {catalog_path(SOURCE_FILE)}: {len(compiled)} languages, "
+          f"{sum(len(table) for table in compiled.values())} strings")
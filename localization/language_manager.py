@@ -1,28 +1,41 @@
-import json
+from localization import catalog
 
 class LanguageManager:
     def __init__(self, filepath="localization/locales.json"):
-        with open(filepath, "r", encoding="utf-8") as f:
-            self.translations = json.load(f)
+        # Only the compiled catalog's header is read here; languages load on first use
+        self.catalog = catalog.Catalog(filepath)
+        self.resolved = {} # lang -> flat table with fallback strings filled in
+
+    def table(self, lang):
+        """Flat {"section.key": text} table for `lang`, missing keys taken from English."""
+        table = self.resolved.get(lang)
+        if table is None:
+            table = self.catalog.load(catalog.FALLBACK_LANG)
+            own = self.catalog.load(lang) if lang != catalog.FALLBACK_LANG else None
+            if own:
+                table = {**table, **own}
+            self.resolved[lang] = table # Unknown languages too: they share the English table
+        return table
 
     def get_text(self, path, lang="en", **kwargs):
         """
         Retrieves a string using a dot-notated key (e.g., 'auth.title').
         Supports variable injection via kwargs.
         """
-        keys = path.split('.')
-        try:
-            val = self.translations[lang]
-            for key in keys:
-                val = val[key]
-            
-            # Inject variables like {service} if present
-            if isinstance(val, str) and kwargs:
+        table = self.resolved.get(lang)
+        if table is None:
+            table = self.table(lang)
+        val = table.get(path)
+        if val is None:
+            return path # Not in the language nor in English
+        # Inject variables like {service} if present
+        if kwargs:
+            try:
                 return val.format(**kwargs)
-            return val
-        except (KeyError, TypeError):
-            return path # Fallback to the key itself if not found
-    
+            except (KeyError, IndexError):
+                return val
+        return val
+
     def get_supported_languages(self):
-        """Returns a list of all language codes available in the JSON."""
-        return list(self.translations.keys())
\ No newline at end of file
+        """Returns a list of all language codes available in the catalog."""
+        return self.catalog.languages()
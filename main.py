@@ -1,5 +1,12 @@
+import argparse
+
+from core import tracing
 from UI.gui_app import PasswordManagerGUI
 
 if __name__ == "__main__":
-    app = PasswordManagerGUI()
-    app.mainloop()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Secure Vault")
+    tracing.add_arguments(parser)
+    args = parser.parse_args()
+    with tracing.profiling(args): # Reports once the window is closed
+        app = PasswordManagerGUI()
+        app.mainloop()
\ No newline at end of file
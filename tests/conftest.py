@@ -0,0 +1,41 @@
+"""Vault, session and path helpers shared by the test modules."""
+import pytest
+
+from core import encryption
+from core import vault_store
+
+PASSWORD = "correct horse battery staple"
+FAST_KDF = encryption.KdfParams(encryption.KDF_PBKDF2, 1_000) # keeps the tests fast; never used for real vaults
+
+def entry(n: int) -> dict:
+    return {"user": f"user{n}", "pass": f"password-{n}"}
+
+@pytest.fixture
+def vault_path(tmp_path) -> str:
+    """Vault file inside the test's own temporary directory; nothing is created yet."""
+    return str(tmp_path / "test.pwmanager")
+
+@pytest.fixture
+def open_store(vault_path):
+    """Opens VaultStores on `vault_path`, or another path, with the fast test KDF."""
+    def open_store(path: str = None, **kwargs) -> vault_store.VaultStore:
+        return vault_store.VaultStore(str(path or vault_path), kdf=FAST_KDF, **kwargs)
+    return open_store
+
+@pytest.fixture
+def session() -> encryption.SessionKey:
+    """Session key of PASSWORD under the fast test KDF, with a fresh salt."""
+    return encryption.SessionKey.create(PASSWORD, FAST_KDF)
+
+@pytest.fixture
+def write_vault(open_store):
+    """Saves entries 0 to count - 1 in `vault_format`. Returns them as plain dicts."""
+    def write_vault(vault_format: str = None, count: int = 20, path: str = None, **kwargs) -> dict:
+        store = open_store(path, vault_format=vault_format, **kwargs)
+        data = store.create(PASSWORD)
+        for n in range(count):
+            data[f"service{n}"] = entry(n)
+        store.save(data)
+        store.close()
+        return {f"service{n}": entry(n) for n in range(count)}
+    return write_vault
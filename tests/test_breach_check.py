@@ -0,0 +1,62 @@
+"""The breach corpus is built from a sorted SHA-1 dump and finds digests by their 2-byte prefix bucket."""
+import hashlib
+
+import pytest
+
+from core import breach_check
+
+FIRST = bytes(20) # bucket 0x0000
+LAST = b"\xff" * 20 # bucket 0xffff
+PASSWORDS = {"password": 9_545_824, "dragon": 7_500, "correct horse battery staple": 260}
+
+def dump_lines() -> list:
+    digests = {hashlib.sha1(password.encode()).digest(): count for password, count in PASSWORDS.items()}
+    digests[FIRST] = 1
+    digests[FIRST[:-1] + b"\x02"] = 2 # Same bucket as FIRST
+    digests[LAST] = breach_check.MAX_COUNT + 1 # Saturated
+    return [f"{digest.hex().upper()}:{count}" for digest, count in sorted(digests.items())]
+
+@pytest.fixture
+def corpus(tmp_path):
+    dump = tmp_path / "pwned.txt"
+    dump.write_text("\r\n".join(dump_lines()) + "\r\n")
+    out = str(tmp_path / "test.pwcorpus")
+    assert breach_check.build_corpus(str(dump), out) == len(PASSWORDS) + 3
+    with breach_check.BreachCorpus(out) as corpus:
+        yield corpus
+
+def test_hits(corpus):
+    for password, count in PASSWORDS.items():
+        assert corpus.count(password) == count
+    assert corpus.count_digest(FIRST) == 1
+    assert corpus.count_digest(FIRST[:-1] + b"\x02") == 2
+    assert corpus.count_digest(LAST) == breach_check.MAX_COUNT
+
+@pytest.mark.parametrize("digest", [
+    FIRST[:-1] + b"\x01", # between two records of the first bucket
+    FIRST[:-1] + b"\x03", # after them
+    LAST[:-1] + b"\xfe", # before the only record of the last bucket
+    b"\x80" + bytes(19), # an empty bucket
+])
+def test_misses(corpus, digest):
+    assert corpus.count_digest(digest) == 0
+
+def test_miss_by_password(corpus):
+    assert corpus.count("not in any breach, hopefully") == 0
+
+def test_unsorted_dump_is_rejected(tmp_path):
+    dump = tmp_path / "pwned.txt"
+    dump.write_text("\n".join(reversed(dump_lines())) + "\n")
+    out = tmp_path / "test.pwcorpus"
+    with pytest.raises(ValueError, match="Line 2"):
+        breach_check.build_corpus(str(dump), str(out))
+    assert not out.exists()
+    assert list(tmp_path.iterdir()) == [dump] # The staged file is removed too
+
+def test_truncated_corpus_is_rejected(corpus, tmp_path):
+    with open(corpus.path, "rb") as f:
+        data = f.read()
+    truncated = tmp_path / "truncated.pwcorpus"
+    truncated.write_bytes(data[:-1])
+    with pytest.raises(ValueError):
+        breach_check.BreachCorpus(str(truncated))
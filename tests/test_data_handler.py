@@ -0,0 +1,22 @@
+"""Modifying an entry keeps its other fields and only restamps "modified" on a real change."""
+from core import data_handler
+
+def vault() -> dict:
+    return {"mail": {"user": "me", "pass": "secret", "modified": 1_700_000_000, "note": "kept"}}
+
+def test_unchanged_values_keep_the_stamp():
+    data = vault()
+    assert data_handler.modify_entry(data, "mail", "me", "secret")
+    assert data == vault()
+
+def test_changed_password_is_stamped_and_keeps_other_fields():
+    data = vault()
+    assert data_handler.modify_entry(data, "mail", new_pass="other")
+    assert data["mail"]["pass"] == "other" and data["mail"]["user"] == "me"
+    assert data["mail"]["note"] == "kept"
+    assert data["mail"]["modified"] > 1_700_000_000
+
+def test_missing_service_is_not_added():
+    data = vault()
+    assert not data_handler.modify_entry(data, "bank", "me", "secret")
+    assert data == vault()
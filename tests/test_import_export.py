@@ -0,0 +1,111 @@
+"""Importers read every supported layout, conflicts follow the chosen policy, and exports round-trip privately."""
+import os
+import stat
+
+import pytest
+
+from core import data_handler
+from core import import_export
+
+BITWARDEN = """﻿folder,favorite,type,name,notes,fields,reprompt,login_uri,login_username,login_password,login_totp
+,,login,mail,,,0,https://mail.example,me@example.com,secret,
+,,note,diary,private,,0,,,,
+,1,login,bank,,,0,https://bank.example,me,hunter2,
+"""
+KEEPASS = """"Account","Login Name","Password","Web Site","Comments"
+"mail","me@example.com","secret","https://mail.example",""
+"bank","me","hunter2","",""
+"""
+KEEPASSXC = """"Group","Title","Username","Password","URL","Notes"
+"Root","mail","me@example.com","secret","https://mail.example",""
+"Root/Money","bank","me","hunter2","",""
+"""
+ENTRIES = {"mail": {"user": "me@example.com", "pass": "secret"}, "bank": {"user": "me", "pass": "hunter2"}}
+
+def write(tmp_path, name: str, text: str) -> str:
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+def imported(path: str, file_format: str = import_export.FORMAT_AUTO) -> tuple:
+    """(entries, rejected reasons) of an import into an empty vault."""
+    vault = {}
+    result = data_handler.apply_batch(vault, import_export.read_entries(path, file_format))
+    return {service: {"user": entry["user"], "pass": entry["pass"]} for service, entry in vault.items()}, \
+        [reason for _, reason in result.rejected]
+
+@pytest.mark.parametrize("layout, text", [("bitwarden", BITWARDEN), ("keepass", KEEPASS), ("keepassxc", KEEPASSXC)])
+def test_csv_layouts_are_detected_and_read(tmp_path, layout, text):
+    path = write(tmp_path, "export.csv", text)
+    assert import_export.resolve_format(path) == layout
+    entries, rejected = imported(path)
+    assert entries == ENTRIES
+    assert rejected == (["not a login item (note)"] if layout == "bitwarden" else [])
+    assert imported(path, layout)[0] == ENTRIES
+
+def test_unknown_csv_header_is_rejected(tmp_path):
+    path = write(tmp_path, "export.csv", "site,login,secret\nmail,me,secret\n")
+    with pytest.raises(import_export.ImportFormatError):
+        import_export.resolve_format(path)
+
+def test_short_csv_rows_are_rejected_not_fatal(tmp_path):
+    path = write(tmp_path, "export.csv", "service,user,pass\nmail,me@example.com,secret\nbank,me\n")
+    entries, rejected = imported(path)
+    assert entries == {"mail": ENTRIES["mail"]}
+    assert rejected == ["expected at least 3 columns, got 2"]
+
+def test_json_import(tmp_path):
+    path = write(tmp_path, "export.json",
+                 '{"mail": {"user": "me@example.com", "pass": "secret"}, "bank": {"user": "me", "pass": "hunter2"},'
+                 ' "empty": {"user": "me"}, "odd": ["me", "secret"]}')
+    entries, rejected = imported(path)
+    assert entries == ENTRIES
+    assert rejected == ["missing password", "entry is not an object"]
+
+@pytest.mark.parametrize("text", ['{"mail": {"user": "me", "pass": "secret"}', '["mail"]', '{"mail": }', "{} {}", ""])
+def test_malformed_json_is_rejected(tmp_path, text):
+    path = write(tmp_path, "export.json", text)
+    with pytest.raises(import_export.ImportFormatError):
+        list(import_export.read_entries(path))
+
+@pytest.mark.parametrize("policy, expected, counts", [
+    (data_handler.CONFLICT_SKIP, {"mail": "old"}, (0, 0, 1, 0)),
+    (data_handler.CONFLICT_OVERWRITE, {"mail": "secret"}, (0, 1, 0, 0)),
+    (data_handler.CONFLICT_RENAME, {"mail": "old", "mail (2)": "secret", "mail (3)": "other"}, (0, 0, 0, 2)),
+])
+def test_conflict_policies(policy, expected, counts):
+    vault = {"mail": {"user": "me@example.com", "pass": "old"}}
+    rows = [(1, "mail", {"user": "me@example.com", "pass": "old"}), # Same as the vault: never a conflict
+            (2, "mail", {"user": "me@example.com", "pass": "secret"})]
+    if policy == data_handler.CONFLICT_RENAME:
+        rows.append((3, "mail", {"user": "me@example.com", "pass": "other"}))
+    result = data_handler.apply_batch(vault, rows, policy)
+    assert {service: entry["pass"] for service, entry in vault.items()} == expected
+    assert (result.added, result.updated, result.skipped, result.renamed) == counts
+    assert result.unchanged == 1
+
+def test_unknown_conflict_policy_is_rejected():
+    with pytest.raises(ValueError):
+        data_handler.apply_batch({}, [], "merge")
+
+@pytest.mark.parametrize("file_format, name", [
+    (import_export.FORMAT_AUTO, "export.csv"),
+    (import_export.FORMAT_AUTO, "export.json"),
+    ("bitwarden", "export.csv"),
+    ("keepass", "export.csv"),
+    ("keepassxc", "export.csv"),
+])
+def test_export_import_round_trip(tmp_path, file_format, name):
+    vault = dict(ENTRIES, **{'quo"ted, ünïcödé': {"user": "line\nbreak", "pass": "p,a\"ss"}})
+    path = str(tmp_path / name)
+    assert import_export.write_entries(vault, path, file_format) == len(vault)
+    assert imported(path) == (vault, [])
+
+def test_exports_are_private(tmp_path):
+    path = tmp_path / "export.csv"
+    path.write_text("left over")
+    os.chmod(path, 0o644) # An existing file keeps its mode unless the exporter resets it
+    import_export.write_entries(ENTRIES, str(path))
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    import_export.write_entries(ENTRIES, str(tmp_path / "new.json"))
+    assert stat.S_IMODE(os.stat(tmp_path / "new.json").st_mode) == 0o600
@@ -0,0 +1,142 @@
+"""Crash safety of the encrypted journal: torn tails, corruption and compaction."""
+import os
+
+import pytest
+
+from core import journal
+from tests.conftest import PASSWORD, entry
+
+def record_offsets(data: bytes, header_size: int) -> list:
+    """Start of every record in a journal file."""
+    offsets = []
+    offset = header_size
+    while offset < len(data):
+        offsets.append(offset)
+        offset += 4 + int.from_bytes(data[offset:offset + 4], "big")
+    return offsets
+
+@pytest.fixture
+def vault(vault_path, open_store):
+    """A saved vault with three changes in its journal. Returns (vault path, journal header size)."""
+    path = vault_path
+    store = open_store(path)
+    data = store.create(PASSWORD)
+    data["base"] = entry(0)
+    store.save(data)
+    for n in range(1, 4):
+        data[f"service{n}"] = entry(n)
+        store.commit(data, f"service{n}")
+    header_size = len(store.journal.header)
+    store.close()
+    return path, header_size
+
+def journal_path(path) -> str:
+    return str(path) + journal.JOURNAL_SUFFIX
+
+def read_bytes(path) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+def test_replays_every_change(vault, open_store):
+    path, _ = vault
+    data = open_store(path).unlock(PASSWORD)
+    assert sorted(data) == ["base", "service1", "service2", "service3"]
+    assert data["service3"] == entry(3)
+
+@pytest.mark.parametrize("cut", [1, 10, 30])
+def test_truncated_final_record_is_ignored_and_cut_off(vault, cut, open_store):
+    path, header_size = vault
+    data = read_bytes(journal_path(path))
+    last = record_offsets(data, header_size)[-1]
+    os.truncate(journal_path(path), len(data) - cut)
+
+    store = open_store(path)
+    replayed = store.unlock(PASSWORD)
+    assert "service3" not in replayed
+    assert replayed["service2"] == entry(2)
+    assert os.path.getsize(journal_path(path)) == last # The torn tail is gone from disk
+
+    # New records go after the last good one and replay normally
+    replayed["service4"] = entry(4)
+    store.commit(replayed, "service4")
+    store.close()
+    assert open_store(path).unlock(PASSWORD)["service4"] == entry(4)
+
+def test_torn_length_prefix_is_ignored(vault, open_store):
+    path, _ = vault
+    size = os.path.getsize(journal_path(path))
+    with open(journal_path(path), "ab") as f:
+        f.write(b"\x00\x00")
+    assert "service3" in open_store(path).unlock(PASSWORD)
+    assert os.path.getsize(journal_path(path)) == size
+
+def test_unauthenticated_final_record_is_ignored(vault, open_store):
+    path, header_size = vault
+    data = bytearray(read_bytes(journal_path(path)))
+    last = record_offsets(bytes(data), header_size)[-1]
+    data[-1] ^= 0xFF # A final write that did not fully reach the disk
+    with open(journal_path(path), "wb") as f:
+        f.write(data)
+    replayed = open_store(path).unlock(PASSWORD)
+    assert "service3" not in replayed and "service2" in replayed
+    assert os.path.getsize(journal_path(path)) == last
+
+@pytest.mark.parametrize("damage", ["ciphertext", "length"])
+def test_corrupted_record_before_the_tail_raises(vault, damage, open_store):
+    path, header_size = vault
+    data = bytearray(read_bytes(journal_path(path)))
+    first = record_offsets(bytes(data), header_size)[0]
+    if damage == "ciphertext":
+        data[first + 20] ^= 0x01
+    else:
+        data[first + 3] ^= 0x01 # The record now appears to end elsewhere
+    with open(journal_path(path), "wb") as f:
+        f.write(data)
+    with pytest.raises(ValueError):
+        open_store(path).unlock(PASSWORD)
+
+def test_records_cannot_be_reordered(vault, open_store):
+    path, header_size = vault
+    data = read_bytes(journal_path(path))
+    first, second, third = record_offsets(data, header_size)
+    swapped = data[:first] + data[second:third] + data[first:second] + data[third:]
+    with open(journal_path(path), "wb") as f:
+        f.write(swapped)
+    with pytest.raises(ValueError):
+        open_store(path).unlock(PASSWORD)
+
+def test_replay_after_compaction_matches_the_live_vault(vault_path, open_store):
+    path = vault_path
+    store = open_store(path, compact_threshold=2_000)
+    live = store.create(PASSWORD)
+    store.save(live)
+    first_header = store.journal.header
+    for n in range(200):
+        service = f"service{n % 50}"
+        if n % 7 == 3 and service in live:
+            del live[service]
+        else:
+            live[service] = entry(n)
+        store.commit(live, service) # Compacts in the background every couple of kilobytes
+    store.close()
+    assert store.journal.last_error is None
+    assert store.journal.header != first_header # Compacted onto a new snapshot along the way
+
+    replayed = open_store(path).unlock(PASSWORD)
+    assert dict(replayed.items()) == dict(live.items())
+
+def test_interrupted_compaction_is_finished_on_unlock(vault, open_store):
+    path, _ = vault
+    store = open_store(path)
+    data = store.unlock(PASSWORD)
+    # The steps of a compaction, stopping as if the process died right after the snapshot swap
+    snapshot = store.take_snapshot(data)
+    encoded = store.encode_snapshot(snapshot)
+    header = journal.MAGIC + store.snapshot_id(encoded)
+    store.journal._write_log(journal_path(path) + ".tmp", header, [{"op": "set", "service": "late", "entry": entry(9)}])
+    store.install_snapshot(encoded, snapshot)
+
+    replayed = open_store(path).unlock(PASSWORD)
+    assert dict(replayed.items()) == {**dict(data.items()), "late": entry(9)}
+    assert not os.path.exists(journal_path(path) + ".tmp")
+    assert read_bytes(journal_path(path)).startswith(header)
@@ -0,0 +1,62 @@
+"""KDF settings from .kdf.json and key headers are bounds-checked before any key is derived."""
+import json
+
+import pytest
+
+from core import encryption
+from core import storage_handler
+from core import vault_store
+from tests.conftest import FAST_KDF, PASSWORD
+
+@pytest.mark.parametrize("kdf", [
+    encryption.DEFAULT_KDF,
+    encryption.KdfParams(encryption.KDF_PBKDF2, encryption.PBKDF2_MAX_COST),
+    encryption.KdfParams(encryption.KDF_SCRYPT, encryption.SCRYPT_MIN_COST),
+    encryption.KdfParams(encryption.KDF_SCRYPT, encryption.SCRYPT_MAX_COST),
+])
+def test_calibration_range_is_accepted(kdf):
+    encryption.check_kdf(kdf)
+
+@pytest.mark.parametrize("kdf", [
+    encryption.KdfParams("md5", encryption.ITERATIONS),
+    encryption.KdfParams(encryption.KDF_PBKDF2, 1_000),
+    encryption.KdfParams(encryption.KDF_PBKDF2, encryption.PBKDF2_MAX_COST + 1),
+    encryption.KdfParams(encryption.KDF_PBKDF2, "100000"),
+    encryption.KdfParams(encryption.KDF_SCRYPT, 2 ** 13),
+    encryption.KdfParams(encryption.KDF_SCRYPT, 3 * 2 ** 14),
+    encryption.KdfParams(encryption.KDF_SCRYPT, 2 ** 21),
+    encryption.KdfParams(encryption.KDF_SCRYPT, 2 ** 14, 0),
+    encryption.KdfParams(encryption.KDF_SCRYPT, 2 ** 14, 8, 64),
+    encryption.KdfParams(encryption.KDF_SCRYPT, 2 ** 20, 16), # 2 GiB
+    encryption.KdfParams(encryption.KDF_SCRYPT, 2 ** 16, 1), # 8 MiB
+])
+def test_out_of_range_settings_are_rejected(kdf):
+    with pytest.raises(ValueError):
+        encryption.check_kdf(kdf)
+
+def test_header_bounds_skip_the_minimums():
+    encryption.check_kdf(FAST_KDF, minimums=False)
+    with pytest.raises(ValueError):
+        encryption.check_kdf(encryption.KdfParams(encryption.KDF_SCRYPT, 2 ** 24), minimums=False)
+
+def test_inflated_header_is_rejected_before_deriving():
+    inflated = encryption.pack_key_header(encryption.KdfParams(encryption.KDF_SCRYPT, 2 ** 31), bytes(16))
+    with pytest.raises(ValueError, match="unusable KDF"):
+        encryption.parse_key_header(inflated)
+
+@pytest.mark.parametrize("settings", [
+    "{not json",
+    json.dumps({"algorithm": encryption.KDF_PBKDF2, "cost": 1_000}),
+    json.dumps({"algorithm": encryption.KDF_SCRYPT, "cost": 2 ** 30}),
+    json.dumps({"algorithm": encryption.KDF_PBKDF2, "rounds": 200_000}),
+    json.dumps([encryption.KDF_PBKDF2, 200_000]),
+])
+def test_bad_settings_file_fails_unlock(vault_path, write_vault, settings):
+    write_vault()
+    with open(vault_path + storage_handler.KDF_SETTINGS_SUFFIX, "w") as f:
+        f.write(settings)
+
+    store = vault_store.VaultStore(vault_path) # Not open_store: its KDF override skips the settings
+    with pytest.raises(storage_handler.SettingsError):
+        store.unlock(PASSWORD)
+    assert store.session is None
@@ -0,0 +1,58 @@
+"""Missing translations fall back to English, and a stale compiled catalog is rebuilt from locales.json."""
+import json
+import os
+
+import pytest
+
+from localization import catalog
+from localization.language_manager import LanguageManager
+
+LOCALES = {
+    "en": {"auth": {"title": "Unlock", "hello": "Hello {name}"}, "menu": {"exit": "Exit"}},
+    "it": {"auth": {"title": "Sblocca", "hello": "Ciao {nome}"}},
+}
+
+@pytest.fixture
+def locales(tmp_path) -> str:
+    path = tmp_path / "locales.json"
+    path.write_text(json.dumps(LOCALES), encoding="utf-8")
+    return str(path)
+
+def test_missing_keys_fall_back_to_english(locales):
+    manager = LanguageManager(locales)
+    assert manager.get_text("auth.title", "it") == "Sblocca"
+    assert manager.get_text("menu.exit", "it") == "Exit" # Not translated
+    assert manager.get_text("auth.hello", "it", name="Ada") == "Hello Ada" # {nome} was dropped at compile time
+    assert manager.get_text("menu.missing", "it") == "menu.missing"
+    assert sorted(manager.get_supported_languages()) == ["en", "it"]
+
+def test_unknown_language_is_resolved_once(locales, monkeypatch):
+    manager = LanguageManager(locales)
+    loads = []
+    load = manager.catalog.load
+    monkeypatch.setattr(manager.catalog, "load", lambda lang: loads.append(lang) or load(lang))
+    for _ in range(3):
+        assert manager.get_text("auth.title", "xx") == "Unlock"
+    assert loads == ["en", "xx"]
+    assert manager.table("xx") is manager.table("en")
+
+def test_stale_catalog_is_rebuilt(locales):
+    assert LanguageManager(locales).get_text("auth.title", "it") == "Sblocca"
+    assert os.path.exists(catalog.catalog_path(locales))
+
+    changed = json.loads(json.dumps(LOCALES))
+    changed["it"]["menu"] = {"exit": "Esci"}
+    with open(locales, "w", encoding="utf-8") as f:
+        json.dump(changed, f)
+    stat = os.stat(locales)
+    os.utime(locales, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000)) # Even on coarse clocks
+
+    manager = LanguageManager(locales)
+    assert manager.get_text("menu.exit", "it") == "Esci"
+    assert catalog.Catalog(locales).tables == {} # The rewritten cache is current: read lazily again
+
+def test_damaged_catalog_is_rebuilt(locales):
+    LanguageManager(locales)
+    with open(catalog.catalog_path(locales), "r+b") as f:
+        f.write(b"XXXX")
+    assert LanguageManager(locales).get_text("auth.title", "it") == "Sblocca"
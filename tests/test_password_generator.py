@@ -0,0 +1,31 @@
+"""Passphrases split back into their words, and policies keep their length and required classes."""
+import math
+
+import pytest
+
+from core import password_generator
+
+@pytest.mark.parametrize("separator", ["-", "_", " "])
+def test_passphrase_splits_into_its_words(separator):
+    policy = password_generator.PasswordPolicy(words=5, separator=separator)
+    wordlist = set(password_generator.load_wordlist())
+    for passphrase in password_generator.generate_batch(500, policy).passwords:
+        words = passphrase.split(separator)
+        assert len(words) == 5
+        assert wordlist.issuperset(words)
+
+def test_hyphenated_words_are_left_out_of_dashed_passphrases():
+    words = [word for word in password_generator.load_wordlist() if "-" not in word]
+    assert len(words) == 7772 # drop-down, felt-tip, t-shirt and yo-yo removed
+    assert password_generator.entropy_bits(password_generator.PASSPHRASE_POLICY) == pytest.approx(6 * math.log2(7772))
+
+@pytest.mark.parametrize("policy", [password_generator.HEX_POLICY, password_generator.STRONG_POLICY])
+def test_single_and_batch_follow_the_policy(policy):
+    separator = policy.separator if policy.group_size else ""
+    allowed = set(password_generator.alphabet(policy)) | set(separator)
+    passwords = [password_generator.generate(policy).password for _ in range(50)]
+    passwords += password_generator.generate_batch(50, policy).passwords
+    assert len(set(passwords)) == 100
+    for password in passwords:
+        assert set(password) <= allowed
+        assert len(password.replace(separator, "") if separator else password) == policy.length
@@ -0,0 +1,41 @@
+"""The binary record payload round-trips every entry shape and rejects damaged input."""
+import json
+
+import pytest
+
+from core import record_store
+
+ENTRIES = {
+    "plain": {"user": "me", "pass": "secret", "modified": 1_700_000_000},
+    "shared user": {"user": "me", "pass": "other"},
+    "no password": {"user": "you"},
+    "empty": {},
+    "ünïcödé ✓": {"user": "ユーザー", "pass": "пароль", "note": "extra field", "tags": ["a", "b"]},
+    "odd types": {"user": 5, "pass": None, "modified": "yesterday"},
+    "": {"user": "", "pass": ""},
+}
+
+def test_round_trip():
+    store = record_store.decode(record_store.encode(ENTRIES))
+    assert dict(store.items()) == ENTRIES
+    assert store.username("plain") == "me"
+    assert store.modified("plain") == 1_700_000_000
+    assert store.modified("odd types") is None
+
+def test_deletes_keep_the_columns_dense():
+    store = record_store.EntryStore.from_entries(ENTRIES.items())
+    del store["plain"]
+    del store["empty"]
+    store["new"] = {"user": "new", "pass": "new"}
+    expected = {service: entry for service, entry in ENTRIES.items() if service not in ("plain", "empty")}
+    assert dict(record_store.decode(record_store.encode(store)).items()) == expected | {"new": store["new"]}
+
+@pytest.mark.parametrize("cut", [1, 8, 40])
+def test_truncated_payload_is_rejected(cut):
+    payload = record_store.encode(ENTRIES)
+    with pytest.raises(ValueError):
+        record_store.decode(payload[:-cut])
+
+def test_json_payloads_still_load():
+    store = record_store.load_payload(json.dumps(ENTRIES).encode("utf-8"))
+    assert dict(store.items()) == ENTRIES
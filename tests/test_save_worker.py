@@ -0,0 +1,105 @@
+"""The background writer coalesces changes queued behind a running write and reports every outcome."""
+import threading
+
+import pytest
+
+from core import save_worker
+
+class FakeStore:
+    """Records writes; the first one blocks until `release` is set, to hold a write in flight."""
+    def __init__(self, fail: bool = False):
+        self.writes = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.fail = fail
+
+    def compaction_due(self) -> bool:
+        return False
+
+    def take_snapshot(self, vault_data) -> dict:
+        return {service: dict(entry) for service, entry in vault_data.items()}
+
+    def _write(self, write):
+        self.started.set()
+        self.release.wait(5.0)
+        if self.fail:
+            raise OSError("disk full")
+        self.writes.append(write)
+
+    def save_snapshot(self, snapshot):
+        self._write(("snapshot", snapshot))
+
+    def commit_entry(self, service, entry):
+        self._write((service, entry))
+
+@pytest.fixture
+def worker():
+    store = FakeStore()
+    worker = save_worker.SaveWorker(store)
+    yield worker
+    store.release.set()
+    worker.close()
+
+def held(worker, vault):
+    """Starts a write of "first" and returns once it is in flight."""
+    worker.submit(vault, "first")
+    assert worker.store.started.wait(5.0)
+
+def test_changes_to_one_service_are_coalesced_while_a_write_runs(worker):
+    vault = {"first": {"pass": "0"}, "mail": {"pass": "1"}, "bank": {"pass": "1"}}
+    held(worker, vault)
+    for n in range(2, 5):
+        vault["mail"] = {"pass": str(n)}
+        worker.submit(vault, "mail")
+    worker.submit(vault, "bank")
+    assert worker.pending == 2
+    worker.store.release.set()
+    assert worker.flush(5.0)
+    assert worker.store.writes == [("first", {"pass": "0"}), ("mail", {"pass": "4"}), ("bank", {"pass": "1"})]
+
+def test_snapshot_drops_the_entries_it_contains(worker):
+    vault = {"first": {"pass": "0"}, "mail": {"pass": "1"}}
+    held(worker, vault)
+    worker.submit(vault, "mail")
+    del vault["first"]
+    worker.submit(vault, "first")
+    worker.submit(vault) # Newer than both queued entries
+    assert worker.pending == 1
+    worker.store.release.set()
+    assert worker.flush(5.0)
+    assert worker.store.writes == [("first", {"pass": "0"}), ("snapshot", {"mail": {"pass": "1"}})]
+
+def test_entries_queued_after_a_snapshot_follow_it(worker):
+    vault = {"first": {"pass": "0"}}
+    held(worker, vault)
+    worker.submit(vault)
+    vault["mail"] = {"pass": "1"}
+    worker.submit(vault, "mail")
+    worker.store.release.set()
+    assert worker.flush(5.0)
+    assert worker.store.writes[1:] == [("snapshot", {"first": {"pass": "0"}}), ("mail", {"pass": "1"})]
+
+def test_errors_are_reported_through_the_results():
+    store = FakeStore(fail=True)
+    store.release.set()
+    worker = save_worker.SaveWorker(store)
+    worker.submit({"mail": {"pass": "1"}}, "mail")
+    worker.close()
+    ok, error = worker.results.get_nowait()
+    assert not ok and isinstance(error, OSError)
+    assert worker.results.empty()
+
+def test_close_flushes_queued_writes():
+    store = FakeStore()
+    worker = save_worker.SaveWorker(store)
+    vault = {"first": {"pass": "0"}, "mail": {"pass": "1"}}
+    held(worker, vault)
+    worker.submit(vault, "mail")
+    assert not worker.flush(0.05) # Still held
+    closer = threading.Thread(target=worker.close)
+    closer.start()
+    store.release.set()
+    closer.join(5.0)
+    assert not closer.is_alive()
+    assert store.writes == [("first", {"pass": "0"}), ("mail", {"pass": "1"})]
+    assert [worker.results.get_nowait() for _ in range(2)] == [(True, None)] * 2
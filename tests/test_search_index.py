@@ -0,0 +1,60 @@
+"""Search ranks prefix hits before substring hits, falls back to fuzzy matches and tombstones changed terms."""
+from core import search_index
+
+def index_of(services: dict) -> search_index.SearchIndex:
+    return search_index.SearchIndex({service: {"user": user} for service, user in services.items()})
+
+def test_prefix_matches_rank_before_substring_matches():
+    index = index_of({"my-mail": "me", "mailbox": "me", "webmail": "me", "bank": "mail.user"})
+    results = index.search("mail")
+    assert set(results[:2]) == {"mailbox", "bank"} # "bank" by its username's prefix
+    assert set(results[2:]) == {"my-mail", "webmail"}
+    assert index.search("MAIL ") == results
+
+def test_fuzzy_subsequence_is_the_fallback():
+    index = index_of({"service": "me", "github": "octocat", "gitlab": "me", "srv": "me"})
+    assert index.search("srvc") == ["service"]
+    assert index.search("gthb") == ["github"]
+    assert index.search("gl") == ["gitlab"] # Tighter first: "gl" spans 4 letters of gitlab, none of github
+    assert index.search("vc") == [] # Fuzzy matches start on a term's first letter
+    assert index.search("zzz") == []
+
+def test_fuzzy_is_not_used_when_substrings_match():
+    index = index_of({"service": "me", "srv": "me"})
+    assert index.search("srv") == ["srv"]
+
+def test_delete_and_modify_tombstone_old_terms():
+    vault = {"mail": {"user": "alice"}, "bank": {"user": "bob"}}
+    index = search_index.SearchIndex(vault)
+    assert index.search("alice") == ["mail"]
+
+    vault["mail"] = {"user": "carol"}
+    index.sync(vault, "mail")
+    assert index.search("alice") == []
+    assert index.search("carol") == ["mail"]
+
+    del vault["bank"]
+    index.sync(vault, "bank")
+    assert index.search("bank") == [] and index.search("bob") == []
+    assert len(index) == 1
+    assert index._dead == 4 # mail's old terms, bank and bob: still in the haystack, owned by nobody
+
+def test_haystack_is_repacked_once_half_of_it_is_dead():
+    count = 1500
+    vault = {f"service{n}": {"user": f"user{n}"} for n in range(count)}
+    index = search_index.SearchIndex(vault)
+    len(index)
+    for n in range(count // 2):
+        del vault[f"service{n}"]
+        index.sync(vault, f"service{n}")
+    assert index._dead == count # Exactly half of the 2 * count terms: not yet
+    size = len(index._haystack)
+
+    del vault["service1499"]
+    index.sync(vault, "service1499")
+    assert index._dead == 0
+    assert len(index._haystack) < size * 0.6
+    assert index.search("service1498") == ["service1498"]
+    assert index.search("user750") == ["service750"]
+    assert index.search("service149") == [f"service149{n}" for n in range(9)]
+    assert "service0" not in index.search("service0") # Only fuzzy matches are left
@@ -0,0 +1,56 @@
+"""Sharded vaults drop the shard files no manifest names, reject missing shards and decrypt shards in parallel."""
+import os
+import threading
+
+import pytest
+
+from core import sharded_vault
+from core import vault_store
+from tests.conftest import PASSWORD, entry
+
+def shard_files(vault_path) -> set:
+    return set(os.listdir(sharded_vault.shard_dir(vault_path)))
+
+def test_saves_remove_stale_shards(vault_path, open_store, write_vault):
+    write_vault(vault_store.FORMAT_SHARDED)
+    orphan = os.path.join(sharded_vault.shard_dir(vault_path), "000-00" + sharded_vault.SHARD_SUFFIX)
+    with open(orphan, "wb") as f: # Left behind by a crash before the manifest swap
+        f.write(sharded_vault.SHARD_MAGIC)
+    before = shard_files(vault_path)
+
+    store = open_store()
+    data = store.unlock(PASSWORD)
+    data["service3"] = entry(33)
+    store.save(data)
+    store.close()
+
+    after = shard_files(vault_path)
+    assert os.path.basename(orphan) not in after
+    assert len(before - after) == 2 # The orphan and the old copy of the changed shard
+    assert len(after - before) == 1
+
+def test_manifest_naming_a_missing_shard_is_rejected(vault_path, open_store, write_vault):
+    write_vault(vault_store.FORMAT_SHARDED)
+    missing = sorted(shard_files(vault_path))[0]
+    os.remove(os.path.join(sharded_vault.shard_dir(vault_path), missing))
+    with pytest.raises(FileNotFoundError) as raised:
+        open_store().unlock(PASSWORD)
+    assert os.path.basename(raised.value.filename) == missing
+
+def test_shards_are_unlocked_in_parallel(monkeypatch, open_store, write_vault):
+    contents = write_vault(vault_store.FORMAT_SHARDED, count=100)
+    load_shard = sharded_vault._load_shard
+    both_loading = threading.Barrier(2, timeout=5.0) # Times out unless two shards load at once
+    threads = set()
+
+    def waiting_load_shard(directory, session, index, name):
+        threads.add(threading.current_thread().name)
+        if index < 2:
+            both_loading.wait()
+        return load_shard(directory, session, index, name)
+
+    monkeypatch.setattr(sharded_vault, "_load_shard", waiting_load_shard)
+    store = open_store(workers=4)
+    data = store.unlock(PASSWORD)
+    assert {service: dict(data[service]) for service in data} == contents
+    assert len(threads) > 1 and all(name.startswith("shard") for name in threads)
@@ -0,0 +1,81 @@
+"""Every codec round-trips behind its PWZ header, streamed or not; legacy gzip still reads and unknown ids do not."""
+import gzip
+
+import pytest
+
+from core import storage_compression
+from core import vault_store
+from tests.conftest import PASSWORD
+
+DATA = b"".join(b'"service%d": {"user": "user%d", "pass": "password-%d"}, ' % (n, n, n) for n in range(2000))
+
+def pieces(data: bytes, size: int):
+    return [data[offset:offset + size] for offset in range(0, len(data), size)]
+
+@pytest.mark.parametrize("codec", storage_compression.available_codecs())
+def test_codec_round_trip(codec):
+    compressed = storage_compression.compress_bytes(DATA, codec)
+    codec_id = compressed[len(storage_compression.MAGIC)]
+    assert compressed[:len(storage_compression.MAGIC)] == storage_compression.MAGIC
+    assert storage_compression._CODECS_BY_ID[codec_id].name == codec
+    assert storage_compression.codec_of(compressed) == codec
+    assert storage_compression.decompress_bytes(compressed) == DATA
+
+@pytest.mark.parametrize("codec", storage_compression.available_codecs())
+def test_stream_round_trip(codec):
+    streamed = b"".join(storage_compression.compress_stream(pieces(DATA, 1000), codec))
+    assert storage_compression.decompress_bytes(streamed) == DATA
+    # Split anywhere, even inside the 4-byte header
+    assert b"".join(storage_compression.decompress_stream(pieces(streamed, 3))) == DATA
+
+def test_codec_is_chosen_by_size():
+    assert storage_compression.codec_of(storage_compression.compress_bytes(b"tiny")) == "none"
+    assert storage_compression.codec_of(storage_compression.compress_bytes(DATA)) == "zlib"
+
+def test_registered_codec_is_used_by_name_and_id():
+    reverse = storage_compression.Codec("reverse", 200, 0, lambda data, level: data[::-1], lambda data: data[::-1],
+                                        None, None)
+    storage_compression.register_codec(reverse)
+    try:
+        compressed = storage_compression.compress_bytes(DATA, "reverse")
+        assert compressed[len(storage_compression.MAGIC)] == 200
+        assert storage_compression.decompress_bytes(compressed) == DATA
+    finally:
+        del storage_compression._CODECS_BY_NAME["reverse"], storage_compression._CODECS_BY_ID[200]
+
+def test_legacy_gzip_is_read():
+    legacy = gzip.compress(DATA)
+    assert storage_compression.codec_of(legacy) == "gzip"
+    assert storage_compression.decompress_bytes(legacy) == DATA
+
+@pytest.mark.parametrize("compressed", [storage_compression.MAGIC + b"\xfe" + DATA, b"PK\x03\x04" + DATA])
+def test_unknown_codec_is_rejected(compressed):
+    with pytest.raises(ValueError):
+        storage_compression.decompress_bytes(compressed)
+    with pytest.raises(ValueError):
+        list(storage_compression.decompress_stream(pieces(compressed, 1000)))
+
+def test_truncated_stream_header_is_rejected():
+    with pytest.raises(ValueError):
+        list(storage_compression.decompress_stream([storage_compression.MAGIC]))
+
+@pytest.mark.parametrize("vault_format", vault_store.FORMATS)
+def test_store_codec_level(monkeypatch, open_store, write_vault, vault_format):
+    zlib_codec = storage_compression._CODECS_BY_NAME["zlib"]
+    levels = set()
+
+    def compress(data, level):
+        levels.add(level)
+        return zlib_codec.compress(data, level)
+
+    def compressor(level):
+        levels.add(level)
+        return zlib_codec.compressor(level)
+
+    monkeypatch.setitem(storage_compression._CODECS_BY_NAME, "zlib",
+                        zlib_codec._replace(compress=compress, compressor=compressor))
+    contents = write_vault(vault_format, count=200, codec="zlib", codec_level=9)
+    assert levels == {9}
+    store = open_store()
+    data = store.unlock(PASSWORD)
+    assert {service: dict(data[service]) for service in data} == contents
@@ -0,0 +1,123 @@
+"""Tampering with a stream vault's chunks is detected: truncation, dropping, reordering and the final-chunk flag."""
+import os
+
+import pytest
+from cryptography.exceptions import InvalidTag
+
+from core import encryption
+from core import storage_handler
+from core import stream_vault
+from tests.conftest import PASSWORD
+
+CHUNK_SIZE = 1024
+SEALED_SIZE = CHUNK_SIZE + 16 # AES-GCM tag
+TAMPERED = (InvalidTag, ValueError)
+
+@pytest.fixture
+def vault(vault_path, session):
+    """A stream vault of several small chunks. Returns (path, contents)."""
+    contents = {f"service{n}": {"user": f"user{n}", "pass": os.urandom(24).hex()} for n in range(150)}
+    temp_file, _ = stream_vault.write(contents, session, vault_path, chunk_size=CHUNK_SIZE)
+    storage_handler.commit_vault(temp_file, vault_path)
+    return vault_path, contents
+
+def split(path: str):
+    """(header, sealed chunks) of a stream vault file."""
+    with open(path, "rb") as f:
+        data = f.read()
+    body = data[stream_vault.HEADER_SIZE:]
+    chunks = [body[offset:offset + SEALED_SIZE] for offset in range(0, len(body), SEALED_SIZE)]
+    return data[:stream_vault.HEADER_SIZE], chunks
+
+def rewrite(path: str, header: bytes, chunks: list):
+    with open(path, "wb") as f:
+        f.write(header + b"".join(chunks))
+
+def test_untouched_vault_reads(vault):
+    path, contents = vault
+    assert len(split(path)[1]) >= 4
+    assert stream_vault.read(path, PASSWORD)[0] == contents
+
+@pytest.mark.parametrize("cut", [1, 16, 17])
+def test_truncated_final_chunk(vault, cut):
+    path, _ = vault
+    header, chunks = split(path)
+    chunks[-1] = chunks[-1][:-cut]
+    rewrite(path, header, chunks)
+    with pytest.raises(TAMPERED):
+        stream_vault.read(path, PASSWORD)
+
+def test_dropped_final_chunk(vault):
+    # The file now ends on a chunk that was sealed as not final
+    path, _ = vault
+    header, chunks = split(path)
+    rewrite(path, header, chunks[:-1])
+    with pytest.raises(TAMPERED):
+        stream_vault.read(path, PASSWORD)
+
+def test_dropped_middle_chunk(vault):
+    path, _ = vault
+    header, chunks = split(path)
+    del chunks[1]
+    rewrite(path, header, chunks)
+    with pytest.raises(TAMPERED):
+        stream_vault.read(path, PASSWORD)
+
+def test_reordered_chunks(vault):
+    path, _ = vault
+    header, chunks = split(path)
+    chunks[1], chunks[2] = chunks[2], chunks[1]
+    rewrite(path, header, chunks)
+    with pytest.raises(TAMPERED):
+        stream_vault.read(path, PASSWORD)
+
+def test_appended_chunk(vault):
+    # The real final chunk is no longer last, so it is opened as a middle chunk
+    path, _ = vault
+    header, chunks = split(path)
+    rewrite(path, header, chunks + chunks[-1:])
+    with pytest.raises(TAMPERED):
+        stream_vault.read(path, PASSWORD)
+
+@pytest.mark.parametrize("final", [False, True])
+def test_final_flag_is_authenticated(vault, final):
+    # Re-sealing a chunk under the right key and counter but the wrong flag is still rejected
+    path, _ = vault
+    header, chunks = split(path)
+    session = encryption.resume_session(PASSWORD, header[len(stream_vault.MAGIC):])
+    session = session.stream_key(header[stream_vault._SALT_OFFSET:stream_vault._PREFIX_OFFSET])
+    prefix = header[stream_vault._PREFIX_OFFSET:stream_vault._CHUNK_SIZE_OFFSET]
+    index = 0 if final else len(chunks) - 1
+    nonce = encryption._stream_nonce(prefix, index, index == len(chunks) - 1)
+    plaintext = session._aesgcm.decrypt(nonce, chunks[index], header)
+    chunks[index] = session._aesgcm.encrypt(encryption._stream_nonce(prefix, index, final), plaintext, header)
+    rewrite(path, header, chunks)
+    with pytest.raises(TAMPERED):
+        stream_vault.read(path, PASSWORD)
+
+def test_tampered_header(vault):
+    # The header is associated data of every chunk, so a changed chunk size is caught
+    path, _ = vault
+    header, chunks = split(path)
+    header = header[:-4] + (CHUNK_SIZE * 2).to_bytes(4, "big")
+    rewrite(path, header, chunks)
+    with pytest.raises(TAMPERED):
+        stream_vault.read(path, PASSWORD)
+
+def test_saves_seal_under_different_subkeys(vault_path, session):
+    # Same session key, same nonce prefix: the per-save salt still keeps the keystreams apart
+    contents = {"service": {"user": "user", "pass": "password"}}
+    headers, chunks = [], []
+    for _ in range(2):
+        temp_file, _ = stream_vault.write(contents, session, vault_path, chunk_size=CHUNK_SIZE)
+        storage_handler.commit_vault(temp_file, vault_path)
+        header, sealed = split(vault_path)
+        headers.append(header)
+        chunks.append(sealed)
+    salts = {header[stream_vault._SALT_OFFSET:stream_vault._PREFIX_OFFSET] for header in headers}
+    assert len(salts) == 2
+    assert session.stream_key(salts.pop()).key != session.key
+    # The first save's chunk does not open under the second save's header and salt
+    rewrite(vault_path, headers[1], chunks[0])
+    with pytest.raises(TAMPERED):
+        stream_vault.read(vault_path, PASSWORD)
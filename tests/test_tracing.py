@@ -0,0 +1,82 @@
+"""Spans nest into per-stage totals, cost nothing while tracing is off, and report tracemalloc figures."""
+import json
+import threading
+
+import pytest
+
+from core import tracing
+
+@pytest.fixture
+def tracer():
+    tracer = tracing.enable(allocations=False, keep_events=True)
+    yield tracer
+    tracing.disable()
+
+def test_nested_spans_split_self_time(tracer):
+    with tracing.span("outer", 10) as outer:
+        with tracing.span("inner", 4) as inner:
+            inner.bytes_out = 3
+        with tracing.span("inner", 6):
+            pass
+        outer.bytes_out = 9
+    calls, total, own, bytes_in, bytes_out, _, _ = tracer.stages["outer"]
+    inner_calls, inner_total = tracer.stages["inner"][:2]
+    assert (calls, bytes_in, bytes_out) == (1, 10, 9)
+    assert inner_calls == 2 and tracer.stages["inner"][3:5] == [10, 3]
+    assert own == total - inner_total
+    assert [event[0] for event in tracer.events] == ["inner", "inner", "outer"]
+
+def test_threads_keep_their_own_stacks(tracer):
+    def work():
+        with tracing.span("worker"):
+            pass
+
+    with tracing.span("main"):
+        worker = threading.Thread(target=work)
+        worker.start()
+        worker.join()
+    # The worker's span ran while "main" was open, but on another thread: not its child
+    assert tracer.stages["main"][2] == tracer.stages["main"][1]
+
+def test_traced_iter_times_each_pull(tracer):
+    chunks = list(tracing.traced_iter("read", iter([b"ab", b"cde"])))
+    assert chunks == [b"ab", b"cde"]
+    assert tracer.stages["read"][0] == 3 # Two chunks and the final, empty pull
+    assert tracer.stages["read"][4] == 5
+
+def test_disabled_tracing_is_a_no_op():
+    assert tracing.active_tracer is None
+    span = tracing.span("anything", 100, codec="zlib")
+    assert span is tracing.span("other")
+    with span as s:
+        s.bytes_out = 5
+        assert s.bytes_out == 0
+    chunks = iter([b"a"])
+    assert tracing.traced_iter("read", chunks) is chunks
+
+def test_allocations_are_measured():
+    tracer = tracing.enable(allocations=True)
+    try:
+        with tracing.span("outer"):
+            kept = bytearray(2 * 1024 * 1024)
+            with tracing.span("temporary"):
+                temporary = bytearray(4 * 1024 * 1024)
+                del temporary
+    finally:
+        tracing.disable()
+    alloc, peak = tracer.stages["outer"][5:7]
+    temporary_alloc, temporary_peak = tracer.stages["temporary"][5:7]
+    assert abs(temporary_alloc) < 64 * 1024 # Freed before the span ended
+    assert temporary_peak >= 4 * 1024 * 1024
+    assert alloc >= 2 * 1024 * 1024 # `kept` is still alive
+    assert peak >= 6 * 1024 * 1024 # The nested peak counts towards the outer one
+    del kept
+
+def test_chrome_trace(tracer, tmp_path):
+    with tracing.span("compress", 10, codec="zlib") as s:
+        s.bytes_out = 4
+    path = tmp_path / "trace.json"
+    tracer.write_chrome_trace(str(path))
+    (event,) = json.loads(path.read_text())["traceEvents"]
+    assert event["name"] == "compress" and event["ph"] == "X"
+    assert event["args"] == {"codec": "zlib", "bytes_in": 10, "bytes_out": 4}
@@ -0,0 +1,24 @@
+"""The agent's socket accepts clients from bind() on, before serve() runs (in the forked child for `agent start`)."""
+import asyncio
+import os
+import stat
+import threading
+
+from core import unlock_agent
+from tests.conftest import PASSWORD, entry
+
+def test_clients_connecting_before_serve_are_answered(tmp_path, open_store, write_vault):
+    write_vault(count=2)
+    reader = open_store(read_only=True)
+    agent = unlock_agent.UnlockAgent(reader, reader.unlock(PASSWORD), str(tmp_path / "agent" / "agent.sock"))
+
+    agent.bind()
+    assert stat.S_IMODE(os.stat(agent.path).st_mode) == 0o600
+    with unlock_agent.AgentClient(agent.path, timeout=5.0) as client: # Queued until serve() accepts it
+        server = threading.Thread(target=asyncio.run, args=(agent.serve(),))
+        server.start()
+        assert client.get("service1")["user"] == entry(1)["user"]
+        client.request("lock")
+    server.join(5.0)
+    assert not server.is_alive()
+    assert not os.path.exists(agent.path)
@@ -0,0 +1,90 @@
+"""Audit reruns skip entries whose "modified" is unchanged, without reading them."""
+import os
+import time
+
+import pytest
+
+from core import breach_check
+from core import encryption
+from core import record_store
+from core import vault_audit
+
+DAY = vault_audit.DAY
+
+class CountingStore(record_store.EntryStore):
+    """EntryStore that counts the entries read, as an indexed vault would count decryptions."""
+    reads = 0
+
+    def __getitem__(self, service):
+        self.reads += 1
+        return super().__getitem__(service)
+
+class FakeCorpus:
+    def __init__(self, path, breached: set):
+        self.path = str(path)
+        self.records = len(breached)
+        self.breached = {breach_check.password_digest(password) for password in breached}
+        self.lookups = 0
+        with open(self.path, "wb") as f:
+            f.write(b"corpus")
+
+    def count_digest(self, digest: bytes) -> int:
+        self.lookups += 1
+        return 42 if digest in self.breached else 0
+
+@pytest.fixture
+def vault():
+    now = int(time.time())
+    store = CountingStore()
+    for n in range(50):
+        store[f"service{n}"] = {"user": f"user{n}", "pass": f"password-{n % 40}", "modified": now - (n + 1) * DAY}
+    store["dragon"] = {"user": "me", "pass": "dragon", "modified": now - 3 * DAY}
+    return store
+
+def test_rerun_reads_no_unchanged_entry(session, vault):
+    audit = vault_audit.VaultAudit(session)
+    first = audit.run(vault)
+    assert vault.reads == len(vault)
+    vault.reads = 0
+    second = audit.run(vault, now=time.time() + 1)
+    assert vault.reads == 0
+    assert second.rescored == 0
+    assert second.reused == first.reused and second.weak == first.weak
+
+def test_changed_entries_are_read_again(session, vault):
+    audit = vault_audit.VaultAudit(session)
+    audit.run(vault)
+    vault["service3"] = {"user": "user3", "pass": "password-1", "modified": int(time.time()) + 1}
+    vault.reads = 0
+    report = audit.run(vault, now=time.time() + 2)
+    assert vault.reads == 1
+    assert report.rescored == 1
+    assert ["service1", "service3", "service41"] in [sorted(group) for group in report.reused]
+
+def test_breach_counts_are_reused_for_the_same_corpus(tmp_path, session, vault):
+    audit = vault_audit.VaultAudit(session)
+    corpus = FakeCorpus(tmp_path / "corpus", {"dragon"})
+    assert audit.run(vault, corpus=corpus).breached == {"dragon": 42}
+    corpus.lookups = vault.reads = 0
+    assert audit.run(vault, now=time.time() + 1, corpus=corpus).breached == {"dragon": 42}
+    assert corpus.lookups == vault.reads == 0
+
+    rebuilt = FakeCorpus(tmp_path / "rebuilt", {"dragon", "password-7"})
+    report = audit.run(vault, now=time.time() + 1, corpus=rebuilt)
+    assert report.breached == {"dragon": 42, "service7": 42, "service47": 42}
+    assert vault.reads == len(vault)
+
+def test_results_survive_save_and_load(tmp_path, session, vault):
+    path = str(tmp_path / "test.pwmanager")
+    audit = vault_audit.VaultAudit(session)
+    first = audit.run(vault)
+    audit.save(path)
+    assert os.listdir(tmp_path) == ["test.pwmanager" + vault_audit.AUDIT_SUFFIX]
+
+    vault.reads = 0
+    loaded = vault_audit.VaultAudit.load(path, session)
+    assert loaded.run(vault, now=time.time() + 1).reused == first.reused
+    assert vault.reads == 0
+
+    other = encryption.SessionKey(os.urandom(32), os.urandom(encryption.SALT_SIZE))
+    assert vault_audit.VaultAudit.load(path, other).results == {} # Sealed under another key
@@ -0,0 +1,72 @@
+"""The storage format is chosen per vault, and a vault is only migrated when another format is asked for."""
+import os
+
+import pytest
+
+from core import sharded_vault
+from core import storage_handler
+from core import vault_store
+from tests.conftest import PASSWORD
+
+@pytest.fixture
+def unlock(open_store):
+    """Unlocks the test vault and returns its contents as plain dicts."""
+    def unlock(**kwargs) -> dict:
+        store = open_store(**kwargs)
+        data = store.unlock(PASSWORD)
+        contents = {service: dict(data[service]) for service in data}
+        store.close()
+        return contents
+    return unlock
+
+def test_new_vault_uses_the_default_format(vault_path, write_vault):
+    write_vault()
+    assert vault_store.detect_format(vault_path) == vault_store.DEFAULT_FORMAT
+
+def test_new_vault_uses_the_configured_format(vault_path, write_vault):
+    vault_store.VaultStore(vault_path).set_format(vault_store.FORMAT_STREAM)
+    write_vault()
+    assert vault_store.detect_format(vault_path) == vault_store.FORMAT_STREAM
+
+@pytest.mark.parametrize("vault_format", vault_store.FORMATS)
+def test_unlock_keeps_the_vault_format(tmp_path, vault_path, write_vault, unlock, vault_format):
+    contents = write_vault(vault_format)
+    files = sorted(tmp_path.iterdir())
+    assert unlock() == contents
+    assert vault_store.detect_format(vault_path) == vault_format
+    assert sorted(tmp_path.iterdir()) == files # Nothing rewritten, no shard removed
+
+@pytest.mark.parametrize("found, wanted", [
+    (vault_store.FORMAT_SHARDED, vault_store.FORMAT_INDEXED),
+    (vault_store.FORMAT_INDEXED, vault_store.FORMAT_STREAM),
+    (vault_store.FORMAT_STREAM, vault_store.FORMAT_BLOB),
+    (vault_store.FORMAT_BLOB, vault_store.FORMAT_SHARDED),
+])
+def test_configured_format_is_migrated_once(vault_path, write_vault, unlock, found, wanted):
+    contents = write_vault(found)
+    vault_store.VaultStore(vault_path).set_format(wanted)
+    assert unlock() == contents
+    assert vault_store.detect_format(vault_path) == wanted
+    if found == vault_store.FORMAT_SHARDED:
+        assert not os.path.exists(sharded_vault.shard_dir(vault_path)) # The new snapshot no longer needs them
+    assert unlock() == contents
+
+def test_read_only_store_never_migrates(vault_path, write_vault, unlock):
+    contents = write_vault(vault_store.FORMAT_BLOB)
+    vault_store.VaultStore(vault_path).set_format(vault_store.FORMAT_INDEXED)
+    assert unlock(read_only=True) == contents
+    assert vault_store.detect_format(vault_path) == vault_store.FORMAT_BLOB
+
+@pytest.mark.parametrize("settings", ['{"format": "zip"}', '"indexed"', "{"])
+def test_bad_format_settings_fail_unlock(vault_path, write_vault, unlock, settings):
+    write_vault(vault_store.FORMAT_INDEXED)
+    with open(vault_path + storage_handler.FORMAT_SETTINGS_SUFFIX, "w") as f:
+        f.write(settings)
+    with pytest.raises(storage_handler.SettingsError):
+        unlock()
+
+def test_unknown_format_is_not_saved(tmp_path, vault_path):
+    store = vault_store.VaultStore(vault_path)
+    with pytest.raises(ValueError):
+        store.set_format("zip")
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,36 @@
+"""Indexed records are bound to their snapshot: a record of an older save cannot be swapped in."""
+import pytest
+
+from core import vault_index
+from core import vault_store
+from tests.conftest import PASSWORD
+
+def record_span(vault_path, service: str) -> slice:
+    vault = vault_index.read_index(vault_path, PASSWORD)[0]
+    offset, length, _ = vault._index[service]
+    return slice(vault.records_offset + offset, vault.records_offset + offset + length)
+
+def test_old_snapshot_record_is_refused(vault_path, open_store, write_vault):
+    write_vault(vault_store.FORMAT_INDEXED)
+    with open(vault_path, "rb") as f:
+        old = f.read()
+    old_record = old[record_span(vault_path, "service1")]
+
+    store = open_store()
+    data = store.unlock(PASSWORD)
+    data["service1"] = {"user": "user1", "pass": "password-X"} # Same length as "password-1"
+    store.save(data)
+    store.close()
+
+    with open(vault_path, "rb") as f:
+        new = bytearray(f.read())
+    span = record_span(vault_path, "service1")
+    assert span.stop - span.start == len(old_record)
+    new[span] = old_record
+    with open(vault_path, "wb") as f:
+        f.write(new)
+
+    data = open_store().unlock(PASSWORD)
+    assert data["service2"]["pass"] == "password-2"
+    with pytest.raises(ValueError):
+        data["service1"]